@@ -0,0 +1,9 @@
+"""
+Lets the project folder run as a program:
+    python path/to/digital-janitor-pro --yes /srv/inbox/alice
+"""
+import sys
+
+from main import main
+
+sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Hashing benchmark for Digital Janitor Pro
+Compares hash algorithms and read modes on generated files
+
+Usage (from the project root):
+    python -m benchmarks.bench_hashing --sizes 1,64,512 --repeat 3
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from core.file_operations import HASH_ALGORITHMS, get_file_hash, new_hasher
+
+
+def legacy_md5(file_path):
+    """The original implementation: 4096-byte reads through iter(lambda ...)"""
+    hash_md5 = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(4096), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+
+def available_algorithms():
+    """Algorithms from HASH_ALGORITHMS whose package is installed"""
+    names = []
+    for name in HASH_ALGORITHMS:
+        try:
+            new_hasher(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def generate_file(directory, size_mb):
+    """Write a file of random data and return its path"""
+    path = Path(directory) / f"bench_{size_mb}mb.bin"
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+    return path
+
+
+def time_call(func, repeat):
+    """Best wall time over repeat calls"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark file hashing modes")
+    parser.add_argument("--sizes", default="1,64,512", help="comma-separated file sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, best time is reported")
+    parser.add_argument("--dir", help="directory for generated files (default: temp dir)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    algorithms = available_algorithms()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        print(f"{'size':>8}  {'case':<22} {'seconds':>9} {'MB/s':>9}")
+        for size_mb in sizes:
+            path = generate_file(directory, size_mb)
+            cases = [("md5 legacy 4K loop", lambda: legacy_md5(path))]
+            for name in algorithms:
+                cases.append((f"{name} readinto", lambda name=name: get_file_hash(path, name, use_mmap=False)))
+                cases.append((f"{name} mmap", lambda name=name: get_file_hash(path, name, use_mmap=True)))
+
+            for label, func in cases:
+                seconds = time_call(func, args.repeat)
+                throughput = size_mb / seconds if seconds else float("inf")
+                print(f"{size_mb:>6}MB  {label:<22} {seconds:>9.4f} {throughput:>9.1f}")
+            path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+End-to-end organizer benchmark for Digital Janitor Pro
+Times a full run on a synthetic tree, split into phases, with syscall counts
+
+Usage (from the project root):
+    python -m benchmarks.bench_organizer --files 5000 --duplicates 0.2 --json results.json
+    python -m benchmarks.bench_organizer --files 5000 --compare results.json
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from benchmarks.treegen import add_spec_arguments, generate_tree, spec_from_args
+from config.config_manager import create_default_config
+from core.organizer import FileOrganizer
+from utils.logger import JanitorLogger, LOG_FILE_NAME, JSON_LOG_FILE_NAME
+
+# os functions whose Python-level calls are counted
+COUNTED_SYSCALLS = ('stat', 'lstat', 'scandir', 'listdir', 'mkdir', 'rename', 'replace',
+                    'unlink', 'rmdir', 'open', 'fsync', 'utime')
+
+
+class SyscallCounter:
+    """Counts calls to the os functions in COUNTED_SYSCALLS for the duration of a run
+
+    Phase timings come from the organizer's own metrics, so the benchmark
+    reports the same phases as a real run.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self._originals = {}
+
+    def __enter__(self):
+        for name in COUNTED_SYSCALLS:
+            self._originals[name] = getattr(os, name)
+            setattr(os, name, self._counted(name, self._originals[name]))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for name, original in self._originals.items():
+            setattr(os, name, original)
+        self._originals = {}
+
+    def _counted(self, name, func):
+        counts = self.counts
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+
+def read_proc_io():
+    """Kernel I/O counters of this process (Linux only, empty elsewhere)"""
+    try:
+        with open('/proc/self/io') as io_file:
+            return {key: int(value) for key, value in (line.split(':') for line in io_file)}
+    except OSError:
+        return {}
+
+
+def benchmark_config(tree_dir, args):
+    config = create_default_config(tree_dir / 'janitor_config.json')
+    features = config['features']
+    features['workers'] = args.workers
+    features['hash_algorithm'] = args.hash_algorithm
+    features['log_format'] = args.log_format
+    features['content_sniffing'] = args.sniffing
+    config['transfer']['progress'] = False
+    config['scan']['recursive'] = args.recursive if args.recursive is not None else args.depth > 0
+    return config
+
+
+def run_once(tree_dir, args):
+    """Generate a tree, organize it and return the measurements"""
+    spec = spec_from_args(args)
+    tree = generate_tree(tree_dir, spec)
+    config = benchmark_config(tree_dir, args)
+    json_lines = args.log_format == 'json'
+    logger = JanitorLogger(tree_dir / (JSON_LOG_FILE_NAME if json_lines else LOG_FILE_NAME), json_lines=json_lines)
+    organizer = FileOrganizer(tree_dir, config, logger)
+
+    io_before = read_proc_io()
+    with SyscallCounter() as syscalls:
+        start = time.perf_counter()
+        organizer.organize_files()
+        logger.close()
+        total = time.perf_counter() - start
+    io_after = read_proc_io()
+
+    return {
+        'tree': tree.to_dict(),
+        'seconds': round(total, 6),
+        'files_per_second': round(tree.files / total, 1) if total else None,
+        'mb_per_second': round(tree.bytes / (1024 * 1024) / total, 2) if total else None,
+        'phases': {phase: round(seconds, 6) for phase, seconds in organizer.metrics.phases().items()},
+        'syscalls': dict(sorted(syscalls.counts.items())),
+        'proc_io': {key: io_after[key] - io_before.get(key, 0) for key in io_after},
+        'operations': organizer.operations_done,
+        'duplicates': organizer.duplicate_count,
+        'errors': len(organizer.error_report()),
+        'metrics': organizer.metrics.to_dict(),
+    }
+
+
+def git_commit():
+    """Commit of the working tree being measured, if it is a git checkout"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def print_report(report):
+    best = report['best']
+    print(f"\n{report['spec']['files']} files, {best['tree']['bytes'] / (1024 * 1024):.1f}MB, "
+          f"{best['tree']['duplicates']} duplicates (commit {report['commit'] or 'unknown'})")
+    print(f"Total: {best['seconds']:.3f}s  {best['files_per_second']} files/s  {best['mb_per_second']} MB/s")
+    print(f"\n{'phase':<10} {'seconds':>9} {'share':>7}")
+    for phase, seconds in best['phases'].items():
+        share = seconds / best['seconds'] if best['seconds'] else 0
+        print(f"{phase:<10} {seconds:>9.4f} {share:>7.1%}")
+    print("\nsyscalls: " + ", ".join(f"{name}={count}" for name, count in best['syscalls'].items()))
+    if best['proc_io']:
+        io = best['proc_io']
+        print(f"kernel io: {io.get('syscr', 0)} reads, {io.get('syscw', 0)} writes, "
+              f"{io.get('rchar', 0) / (1024 * 1024):.1f}MB read, {io.get('wchar', 0) / (1024 * 1024):.1f}MB written")
+
+
+def print_comparison(report, baseline):
+    """Print how the best run compares with a saved result"""
+    new, old = report['best'], baseline['best']
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    rows = [('total', old['seconds'], new['seconds'])]
+    rows.extend((phase, old['phases'].get(phase, 0.0), seconds) for phase, seconds in new['phases'].items())
+    for name, before, after in rows:
+        change = (after - before) / before if before else 0.0
+        print(f"{name:<10} {before:>9.4f} -> {after:>9.4f}  {change:>+7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a full organizer run on a synthetic tree")
+    add_spec_arguments(parser)
+    parser.add_argument("--workers", type=int, default=1, help="features.workers for the run")
+    parser.add_argument("--hash-algorithm", default="md5", help="features.hash_algorithm for the run")
+    parser.add_argument("--log-format", choices=["text", "json"], default="text")
+    parser.add_argument("--sniffing", choices=["off", "unknown", "all"], default="unknown",
+                        help="features.content_sniffing for the run")
+    parser.add_argument("--recursive", action="store_true", default=None,
+                        help="organize nested files (default: on when --depth > 0)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs on fresh trees, best time is reported")
+    parser.add_argument("--dir", help="directory for generated trees (default: temp dir)")
+    parser.add_argument("--json", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="compare with results saved by --json")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for number in range(args.repeat):
+            tree_dir = Path(directory) / f"run_{number}"
+            runs.append(run_once(tree_dir, args))
+            shutil.rmtree(tree_dir)
+            print(f"run {number + 1}/{args.repeat}: {runs[-1]['seconds']:.3f}s")
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'spec': spec_from_args(args).to_dict(),
+        'options': {'workers': args.workers, 'hash_algorithm': args.hash_algorithm,
+                    'log_format': args.log_format, 'sniffing': args.sniffing,
+                    'recursive': args.recursive if args.recursive is not None else args.depth > 0},
+        'best': min(runs, key=lambda run: run['seconds']),
+        'runs': runs,
+    }
+    print_report(report)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            print_comparison(report, json.load(baseline_file))
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(report, json_file, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
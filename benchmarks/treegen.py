@@ -0,0 +1,175 @@
+"""
+Synthetic tree generator for Digital Janitor Pro benchmarks
+Builds reproducible messy folders: same seed, same files, sizes, contents and dates
+
+Usage (from the project root):
+    python -m benchmarks.treegen /tmp/messy --files 5000 --duplicates 0.2 --depth 2
+"""
+import argparse
+import math
+import os
+import random
+from pathlib import Path
+
+# Extensions and their relative frequency in generated trees
+EXTENSION_WEIGHTS = (
+    ('.txt', 12), ('.csv', 6), ('.jpg', 14), ('.png', 8), ('.gif', 2),
+    ('.pdf', 8), ('.docx', 5), ('.xlsx', 3), ('.mp4', 3), ('.mp3', 4),
+    ('.py', 6), ('.html', 4), ('.json', 4), ('.bin', 3), ('', 3),
+)
+
+POOL_SIZE = 1024 * 1024
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Newest generated mtime (2025-01-01 UTC), fixed so trees are identical on every day
+MTIME_END = 1735689600
+
+
+class TreeSpec:
+    """Parameters of a synthetic tree
+
+    Sizes follow a log-normal distribution around mean_kb (sigma sets the
+    spread), capped at max_mb. duplicate_ratio of the files are byte-for-byte
+    copies of earlier ones. Modification times are spread evenly over the
+    mtime_days days before MTIME_END. depth and fanout nest files into sub-folders.
+    """
+
+    def __init__(self, files=1000, mean_kb=64, sigma=1.5, max_mb=64, duplicate_ratio=0.1,
+                 mtime_days=730, depth=0, fanout=4, seed=42):
+        self.files = files
+        self.mean_kb = mean_kb
+        self.sigma = sigma
+        self.max_mb = max_mb
+        self.duplicate_ratio = duplicate_ratio
+        self.mtime_days = mtime_days
+        self.depth = depth
+        self.fanout = fanout
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class TreeStats:
+    """What generate_tree wrote"""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.duplicates = 0
+        self.directories = 0
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def generate_tree(root_dir, spec):
+    """Write the tree described by spec below root_dir and return TreeStats"""
+    rng = random.Random(spec.seed)
+    root_dir = Path(root_dir)
+    root_dir.mkdir(parents=True, exist_ok=True)
+    stats = TreeStats()
+
+    pool = rng.getrandbits(POOL_SIZE * 8).to_bytes(POOL_SIZE, 'little')
+    directories = _make_directories(root_dir, spec.depth, spec.fanout)
+    stats.directories = len(directories) - 1
+
+    extensions = [extension for extension, _ in EXTENSION_WEIGHTS]
+    weights = [weight for _, weight in EXTENSION_WEIGHTS]
+    mu = math.log(max(spec.mean_kb, 1) * 1024) - spec.sigma ** 2 / 2
+    max_bytes = int(spec.max_mb * 1024 * 1024)
+    written = []
+
+    for index in range(spec.files):
+        directory = rng.choice(directories)
+        extension = rng.choices(extensions, weights)[0]
+        path = directory / f"file_{index:07d}{extension}"
+
+        if written and rng.random() < spec.duplicate_ratio:
+            content = _read(rng.choice(written))
+            stats.duplicates += 1
+        else:
+            size = min(int(rng.lognormvariate(mu, spec.sigma)), max_bytes)
+            content = _content(pool, index, size, rng)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+        mtime = MTIME_END - rng.uniform(0, spec.mtime_days * SECONDS_PER_DAY)
+        os.utime(path, (mtime, mtime))
+        written.append(path)
+        stats.files += 1
+        stats.bytes += len(content)
+    return stats
+
+
+def _make_directories(root_dir, depth, fanout):
+    directories = [root_dir]
+    level = [root_dir]
+    for current_depth in range(depth):
+        next_level = []
+        for parent in level:
+            for number in range(fanout):
+                child = parent / f"folder_{current_depth}_{number}"
+                child.mkdir(exist_ok=True)
+                next_level.append(child)
+        directories.extend(next_level)
+        level = next_level
+    return directories
+
+
+def _content(pool, index, size, rng):
+    """Unique bytes for one file: its index, then data cut from the random pool"""
+    header = index.to_bytes(8, 'little')
+    if size <= len(header):
+        return header[:size]
+    remaining = size - len(header)
+    start = rng.randrange(POOL_SIZE)
+    parts = [header]
+    while remaining > 0:
+        piece = pool[start:start + remaining]
+        parts.append(piece)
+        remaining -= len(piece)
+        start = 0
+    return b''.join(parts)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def add_spec_arguments(parser):
+    """Add the TreeSpec options to an argparse parser"""
+    defaults = TreeSpec()
+    parser.add_argument("--files", type=int, default=defaults.files, help="number of files")
+    parser.add_argument("--mean-kb", type=float, default=defaults.mean_kb, help="mean file size in KB")
+    parser.add_argument("--sigma", type=float, default=defaults.sigma, help="spread of the log-normal sizes")
+    parser.add_argument("--max-mb", type=float, default=defaults.max_mb, help="largest file size in MB")
+    parser.add_argument("--duplicates", type=float, default=defaults.duplicate_ratio,
+                        help="fraction of files that copy an earlier file")
+    parser.add_argument("--mtime-days", type=float, default=defaults.mtime_days,
+                        help="modification times spread over this many days")
+    parser.add_argument("--depth", type=int, default=defaults.depth, help="folder nesting depth")
+    parser.add_argument("--fanout", type=int, default=defaults.fanout, help="sub-folders per folder")
+    parser.add_argument("--seed", type=int, default=defaults.seed, help="random seed")
+
+
+def spec_from_args(args):
+    return TreeSpec(files=args.files, mean_kb=args.mean_kb, sigma=args.sigma, max_mb=args.max_mb,
+                    duplicate_ratio=args.duplicates, mtime_days=args.mtime_days,
+                    depth=args.depth, fanout=args.fanout, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a reproducible messy folder")
+    parser.add_argument("target", help="directory to fill")
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+
+    stats = generate_tree(args.target, spec_from_args(args))
+    print(f"{stats.files} files ({stats.duplicates} duplicates, {stats.bytes / (1024 * 1024):.1f}MB) "
+          f"in {stats.directories + 1} folders")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,9 @@ import datetime
 from pathlib import Path
 
 
-def create_default_config(config_path):
-    """Create default config file"""
-    default_config = {
+def default_config():
+    """The default settings"""
+    return {
         "folder_names": {
             "text_files": "text_files",
             "images": "images",
@@ -23,26 +23,80 @@ def create_default_config(config_path):
         "features": {
             "delete_temp_folder": True,
             "sort_by_size": True,
-            "sort_by_date": True
+            "sort_by_date": True,
+            "workers": 1,
+            "hash_algorithm": "md5",
+            "log_format": "text",
+            "checkpoint_interval": 30,
+            "content_sniffing": "unknown",
+            "duplicate_policy": "move",
+            "backup_manifest": "off"
+        },
+        "scan": {
+            "recursive": False,
+            "max_depth": None,
+            "exclude": [],
+            "symlinks": "skip",
+            "batch_size": 5000
+        },
+        "transfer": {
+            "chunk_mb": 8,
+            "bandwidth_limit_mb": 0,
+            "progress": True
+        },
+        "watch": {
+            "backend": "auto",
+            "debounce_seconds": 1.0,
+            "batch_seconds": 1.0,
+            "batch_size": 500,
+            "poll_interval": 2.0
+        },
+        "metrics": {
+            "output": None,
+            "format": "json"
+        },
+        "verify": {
+            "mode": "quick",
+            "workers": 4,
+            "io_budget_mb": 0,
+            "record_hashes": False
+        },
+        "tiering": {
+            "workers": 4,
+            "rules": []
         }
     }
 
+
+def create_default_config(config_path):
+    """Create default config file"""
+    config = default_config()
     with open(config_path, "w") as config_file:
-        json.dump(default_config, config_file, indent=4)
+        json.dump(config, config_file, indent=4)
+
+    return config
 
-    return default_config
 
+def load_config(config_path, create=True):
+    """Load configuration from file or create default
 
-def load_config(config_path):
-    """Load configuration from file or create default"""
+    With create=False (dry runs) a missing or corrupted file is not
+    written; the defaults are only used in memory.
+    """
     if config_path.exists():
         try:
             with open(config_path, "r") as config_file:
                 config = json.load(config_file)
                 return config
         except json.JSONDecodeError:
+            if not create:
+                print("Configuration file corrupted, using default settings")
+                return default_config()
             print("Configuration file corrupted, creating new default config")
             return create_default_config(config_path)
+    elif not create:
+        print("No config file found, using default settings")
+        return default_config()
     else:
         print("No config file found, creating new default config")
         return create_default_config(config_path)
@@ -61,24 +115,12 @@ def interactive_config_setup(config_path):
     sort_by_date = input("Sort files by date? (y/n, default y): ").strip().lower()
     sort_by_date = True if sort_by_date != 'n' else False
 
-    custom_config = {
-        "folder_names": {
-            "text_files": "text_files",
-            "images": "images",
-            "documents": "documents",
-            "media": "media",
-            "code": "code"
-        },
-        "size_thresholds": {
-            "large_mb": large_mb,
-            "huge_mb": huge_mb
-        },
-        "features": {
-            "delete_temp_folder": True,
-            "sort_by_size": True,
-            "sort_by_date": sort_by_date
-        }
-    }
+    workers = input("Parallel hashing workers (default 1): ").strip()
+    workers = int(workers) if workers else 1
+
+    custom_config = default_config()
+    custom_config["size_thresholds"].update(large_mb=large_mb, huge_mb=huge_mb)
+    custom_config["features"].update(sort_by_date=sort_by_date, workers=workers)
 
     with open(config_path, 'w') as config_file:
         json.dump(custom_config, config_file, indent=4)
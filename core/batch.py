@@ -0,0 +1,233 @@
+"""
+Multi-root batch runs for Digital Janitor Pro
+Organizes many sibling folders in one process over a shared worker pool
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from core.checkpoint import INTERRUPTED, COMPLETE
+from core.duplicates import DuplicateFinder
+from core.file_operations import resolve_hash_algorithm
+from core.hash_index import IndexGroup
+from core.organizer import FileOrganizer
+from core.sniffer import SNIFF_BYTES
+from utils.metrics import Metrics
+
+# 'root': duplicates are only looked for inside each root; 'global': across all roots
+DUPLICATE_SCOPES = ('root', 'global')
+
+# Roots worked on at the same time
+DEFAULT_PARALLEL_ROOTS = 4
+
+
+class RootResult:
+    """Outcome of one root of a batch"""
+    __slots__ = ('root_dir', 'organizer', 'error')
+
+    def __init__(self, root_dir, organizer=None, error=None):
+        self.root_dir = root_dir
+        self.organizer = organizer
+        self.error = error
+
+    @property
+    def status(self):
+        if self.error is not None:
+            return 'failed'
+        return 'errors' if self.organizer.error_report() else 'ok'
+
+
+class BatchReport:
+    """Combined outcome of a batch: per-root results plus totals"""
+
+    def __init__(self, results, metrics, scope):
+        self.results = results
+        self.metrics = metrics
+        self.scope = scope
+
+    def to_dict(self):
+        statuses = [result.status for result in self.results]
+        return {
+            'roots': len(self.results),
+            'ok': statuses.count('ok'),
+            'with_errors': statuses.count('errors'),
+            'failed': statuses.count('failed'),
+            'duplicate_scope': self.scope,
+            'metrics': self.metrics.to_dict(),
+        }
+
+    def lines(self):
+        summary = self.to_dict()
+        counters = self.metrics.counters
+        elapsed = self.metrics.elapsed
+        hashed_mb = counters['bytes_hashed'] / (1024 * 1024)
+        rate = hashed_mb / elapsed if elapsed else 0.0
+        lines = [
+            f"{summary['roots']} folders in {elapsed:.1f}s ({self.scope} duplicates): "
+            f"{summary['ok']} ok, {summary['with_errors']} with errors, {summary['failed']} failed",
+            f"{counters['files_scanned']} files scanned, "
+            f"{counters['moves_rename'] + counters['moves_copy']} moved, {counters['duplicates']} duplicates",
+            f"{hashed_mb:.1f}MB hashed ({rate:.1f}MB/s)",
+        ]
+        if counters['bytes_reclaimed']:
+            lines.append(f"{counters['bytes_reclaimed'] / (1024 * 1024):.1f}MB reclaimed from duplicates")
+        lines.extend(f"   FAILED {result.root_dir}: {result.error}"
+                     for result in self.results if result.error is not None)
+        return lines
+
+
+class BatchScheduler:
+    """Organizes several roots over one shared worker pool
+
+    Every root keeps its own date tree, hash index, journal, checkpoint
+    and log, so each can be restored or resumed on its own. Stat calls,
+    hashing and sniffing of all roots go into one pool of workers
+    threads, with hashing split into tasks of about equal bytes, so the
+    disks stay busy whatever mix of small and big folders is in the batch.
+
+    With the 'root' duplicate scope each root is organized exactly as a
+    run of its own would, parallel_roots of them at a time, each driven
+    by its own thread.
+
+    With the 'global' scope a file is also a duplicate of an identical
+    file in another root. The hash indexes of all roots are searched as
+    one (IndexGroup) by a single duplicate finder. Roots are taken a
+    scan batch at a time, parallel_roots at once: the batches are hashed
+    together in the pool, then planned and applied root by root. Within
+    a wave the root given first keeps the original; across waves the
+    copy organized first does.
+    """
+
+    def __init__(self, roots, workers=None, scope='root', parallel_roots=DEFAULT_PARALLEL_ROOTS,
+                 resume=False):
+        """roots is a list of (root_dir, config, logger); workers defaults to the ThreadPoolExecutor default"""
+        if scope not in DUPLICATE_SCOPES:
+            raise ValueError(f"Unknown duplicate scope: {scope}")
+        self.roots = roots
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.scope = scope
+        self.parallel_roots = max(1, parallel_roots)
+        self.resume = resume
+        # The shared duplicate finder's work; the totals of all roots once run() returns
+        self.metrics = Metrics()
+
+    def run(self):
+        """Organize every root and return a BatchReport"""
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = []
+            organizers = []
+            for root_dir, config, logger in self.roots:
+                # Size hashing tasks for the shared pool, not for the root's own setting
+                config.setdefault('features', {})['workers'] = self.workers
+                try:
+                    organizer = FileOrganizer(root_dir, config, logger, pool=pool)
+                except (OSError, ValueError) as e:
+                    results.append(RootResult(root_dir, error=e))
+                    continue
+                result = RootResult(root_dir, organizer)
+                results.append(result)
+                organizers.append(result)
+
+            if self.scope == 'global':
+                self._run_global(organizers, pool)
+            else:
+                self._run_per_root(organizers)
+
+        for result in results:
+            if result.organizer is not None:
+                self.metrics.merge(result.organizer.metrics)
+        self.metrics.elapsed = time.perf_counter() - started
+        return BatchReport(results, self.metrics, self.scope)
+
+    def _run_per_root(self, results):
+        with ThreadPoolExecutor(max_workers=self.parallel_roots) as drivers:
+            futures = [drivers.submit(self._organize, result.organizer) for result in results]
+            for result, future in zip(results, futures):
+                result.error = future.result()
+
+    def _organize(self, organizer):
+        """Organize one root in a driver thread; returns the error that stopped it, if any"""
+        try:
+            organizer.organize_files(resume=self.resume)
+        except Exception as e:
+            return e
+        return None
+
+    def _run_global(self, results, pool):
+        started = []
+        status = {}
+        try:
+            for result in results:
+                try:
+                    result.organizer.begin_run(self.resume)
+                except Exception as e:
+                    result.error = e
+                    continue
+                started.append(result)
+                status[result.root_dir] = INTERRUPTED
+
+            algorithms = {resolve_hash_algorithm(result.organizer.config.get('features', {}).get('hash_algorithm'))
+                          for result in started}
+            if len(algorithms) > 1:
+                raise ValueError(f"Global duplicate detection needs one hash algorithm, got {sorted(algorithms)}")
+
+            finder = DuplicateFinder(IndexGroup(result.organizer.hash_index for result in started),
+                                     workers=self.workers, algorithm=algorithms.pop() if algorithms else None,
+                                     head_bytes=SNIFF_BYTES if any(result.organizer.sniff_mode != 'off'
+                                                                   for result in started) else 0,
+                                     metrics=self.metrics, pool=pool)
+            for result in started:
+                result.organizer.duplicate_finder = finder
+
+            for result in self._run_waves(started, finder):
+                status[result.root_dir] = COMPLETE
+        finally:
+            # Indexes stay open until the end: later roots look up earlier roots' files
+            for result in started:
+                try:
+                    result.organizer.finish_run(status[result.root_dir])
+                except Exception as e:
+                    result.error = result.error or e
+        for result in started:
+            if result.error is None:
+                result.organizer.log_summary()
+
+    def _run_waves(self, results, finder):
+        """Plan and apply the roots batch by batch; yields each root once it is done"""
+        waiting = deque((result, result.organizer.scan_batches()) for result in results)
+        window = []
+        while waiting or window:
+            while waiting and len(window) < self.parallel_roots:
+                window.append(waiting.popleft())
+
+            wave = []
+            for entry in list(window):
+                result, batches = entry
+                try:
+                    plan, records = next(batches)
+                except StopIteration:
+                    window.remove(entry)
+                    yield result
+                    continue
+                except Exception as e:
+                    result.error = e
+                    window.remove(entry)
+                    continue
+                wave.append((result, plan, records))
+
+            records = [record for _, _, batch in wave for record in batch]
+            with self.metrics.phase('hash'):
+                duplicates = finder.find_duplicates(records)
+            # The finder is shared, so its batch state is only dropped once every root is done with it
+            for result, plan, batch in wave:
+                try:
+                    result.organizer.plan_batch(batch, plan, duplicates)
+                    result.organizer.executor.execute(plan)
+                except Exception as e:
+                    result.error = e
+                    window[:] = [entry for entry in window if entry[0] is not result]
+            for result, _, _ in wave:
+                if result.error is None:
+                    result.organizer.end_batch()
+            finder.clear()
@@ -0,0 +1,68 @@
+"""
+Run checkpoints for Digital Janitor Pro
+Periodically saves the progress of a run to .janitor/checkpoint.json so it can be resumed
+"""
+import datetime
+import json
+import os
+import time
+from pathlib import Path
+from core.hash_index import INDEX_DIR_NAME
+
+CHECKPOINT_FILE_NAME = 'checkpoint.json'
+
+# Seconds between two checkpoints of a running job
+DEFAULT_CHECKPOINT_INTERVAL = 30.0
+
+# Checkpoint states
+RUNNING = 'running'
+INTERRUPTED = 'interrupted'
+COMPLETE = 'complete'
+
+
+class Checkpoint:
+    """Progress of one organizing run, saved at most every interval seconds
+
+    Work that is done is kept elsewhere: moved files have left the scanned
+    folders, their moves are in the journal and computed digests are in
+    the hash index, which is committed with every checkpoint. The
+    checkpoint itself carries the run's counters and the errors seen so
+    far. It is replaced atomically, so a crash leaves
+    either the old or the new checkpoint, never a torn one.
+    """
+
+    def __init__(self, root_dir, interval=DEFAULT_CHECKPOINT_INTERVAL):
+        self.root_dir = Path(root_dir)
+        self.path = self.root_dir / INDEX_DIR_NAME / CHECKPOINT_FILE_NAME
+        self.interval = interval
+        self._last_save = time.monotonic()
+
+    @classmethod
+    def load(cls, root_dir):
+        """Return the saved checkpoint state of root_dir, or None if there is none"""
+        path = Path(root_dir) / INDEX_DIR_NAME / CHECKPOINT_FILE_NAME
+        try:
+            with open(path) as checkpoint_file:
+                return json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return None
+
+    def due(self):
+        """True once interval seconds have passed since the last save"""
+        return time.monotonic() - self._last_save >= self.interval
+
+    def save(self, state, status=RUNNING):
+        """Atomically write the run state"""
+        self._last_save = time.monotonic()
+        state = dict(state, status=status, saved=datetime.datetime.now().isoformat(timespec='seconds'))
+        temp = self.path.with_name(self.path.name + '.tmp')
+        with open(temp, 'w') as checkpoint_file:
+            json.dump(state, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temp, self.path)
+
+
+def is_unfinished(state):
+    """True for a checkpoint left by a run that did not complete"""
+    return state is not None and state.get('status') != COMPLETE
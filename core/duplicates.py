@@ -0,0 +1,332 @@
+"""
+Duplicate detection for Digital Janitor Pro
+Multi-stage: size buckets -> partial (head + tail) hash -> full hash
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from core.file_operations import (DEFAULT_HASH_ALGORITHM, MMAP_THRESHOLD, FileRecord,
+                                  get_file_hash, hash_stream, new_hasher)
+from utils.metrics import Metrics
+
+# Bytes read from each end of a file for the partial hash
+PARTIAL_HASH_BYTES = 64 * 1024
+
+# Small files are bundled into pool tasks of up to this many bytes
+HASH_TASK_BYTES = 8 * 1024 * 1024
+
+
+def get_partial_hash(file_path, size, chunk_size=PARTIAL_HASH_BYTES, algorithm=DEFAULT_HASH_ALGORITHM):
+    """Hash the head and tail of a file
+
+    Files small enough to be covered by head + tail are hashed in full,
+    so their partial hash is the same digest get_file_hash would return.
+    """
+    return read_partial_hash(file_path, size, chunk_size, algorithm)[0]
+
+
+def read_partial_hash(file_path, size, chunk_size=PARTIAL_HASH_BYTES, algorithm=DEFAULT_HASH_ALGORITHM,
+                      head_bytes=0):
+    """Partial hash of a file plus its first head_bytes bytes, from a single open
+
+    Returns (digest, head); both are None when the file cannot be read.
+    The head comes out of the same sequential read that feeds the hash,
+    so content sniffing costs no extra I/O.
+    """
+    hasher = new_hasher(algorithm)
+    try:
+        with open(file_path, "rb", buffering=0) as f:
+            head = f.read(min(head_bytes, chunk_size)) if head_bytes else None
+            if head:
+                hasher.update(head)
+            if size <= 2 * chunk_size:
+                hash_stream(f, hasher)
+            else:
+                hash_stream(f, hasher, chunk_size - len(head or b''))
+                f.seek(size - chunk_size)
+                hash_stream(f, hasher, chunk_size)
+        return hasher.hexdigest(), head
+    except Exception as e:
+        print(f"Error hashing {file_path}: {e}")
+        return None, None
+
+
+class DuplicateFinder:
+    """Finds duplicate files while reading as little data as possible
+
+    Files are grouped by size first; a file whose size is unique is never
+    opened. Colliding files are compared by a partial hash of their head
+    and tail, and only files that still collide get a full content hash.
+
+    With a HashIndex, files organized in earlier runs take part in the
+    comparison and known digests are reused instead of re-reading files.
+    With more than one worker, hashing runs in a thread pool (a shared
+    pool when one is given), balanced by bytes rather than file count;
+    the index and metrics are only touched from the calling thread.
+    """
+
+    def __init__(self, index=None, partial_bytes=PARTIAL_HASH_BYTES, workers=1,
+                 algorithm=DEFAULT_HASH_ALGORITHM, head_bytes=0, metrics=None, pool=None):
+        """head_bytes > 0 keeps that many leading bytes of every file read for a partial hash
+
+        pool is a ThreadPoolExecutor shared with other work; workers is then its size.
+        """
+        self.index = index
+        self.pool = pool
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.head_bytes = head_bytes
+        self.algorithm = algorithm
+        self.partial_bytes = partial_bytes
+        self.workers = max(1, workers)
+        self.records = {}         # path -> FileRecord
+        self.partial_hashes = {}  # path -> head/tail digest
+        self.full_hashes = {}     # path -> full content digest
+        self.unreadable = set()   # paths that could not be hashed
+        self.heads = {}           # path -> leading bytes kept from the partial hash read
+        self.planned = {}         # path -> planned destination of a possible original in this batch
+        self.remembered = defaultdict(list)  # size -> FileRecords treated like indexed originals
+        self._remembered_paths = set()
+        self._batch_paths = []    # paths added to records since the last clear()
+        self._executor = None
+
+    def find_duplicates(self, records):
+        """Return {duplicate_path: original_path} for the given FileRecords
+
+        The first file of each identical group (in input order) is treated
+        as the original, matching the order files are processed in.
+        Already indexed files always come first, so the original may be a
+        file organized by an earlier run.
+        """
+        return self._pooled(self._find_duplicates, records)
+
+    def hash_files(self, records):
+        """Give every record a full digest in full_hashes, from the index or by reading the file
+
+        Files that cannot be read end up in unreadable, as in find_duplicates.
+        """
+        for record in records:
+            if record.path not in self.records:
+                self.records[record.path] = record
+                self._batch_paths.append(record.path)
+        self._pooled(self._hash_all, [record.path for record in records], False)
+
+    def _pooled(self, func, *args):
+        """Call func with the worker pool (shared or per call) available to _map"""
+        if self.pool is not None:
+            self._executor = self.pool
+            try:
+                return func(*args)
+            finally:
+                self._executor = None
+        if self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                self._executor = executor
+                try:
+                    return func(*args)
+                finally:
+                    self._executor = None
+        return func(*args)
+
+    def remember(self, record):
+        """Treat a file like an indexed original in later batches
+
+        Used by dry runs, where planned files are never recorded in the
+        index because nothing is moved.
+        """
+        self.remembered[record.size].append(record)
+        self._remembered_paths.add(record.path)
+
+    def clear(self):
+        """Forget per-file state, e.g. between batches of a streaming run
+
+        Remembered files and their digests are kept.
+        """
+        for path in self._batch_paths:
+            if path not in self._remembered_paths:
+                self.records.pop(path, None)
+                self.partial_hashes.pop(path, None)
+                self.full_hashes.pop(path, None)
+        self._batch_paths = []
+        self.unreadable = set()
+        self.heads = {}
+        self.planned = {}
+
+    def _find_duplicates(self, records):
+        # Stage 1: size buckets, straight from the scan's stat results
+        by_size = defaultdict(list)
+        new_keys = set()
+        for record in records:
+            self.records[record.path] = record
+            self._batch_paths.append(record.path)
+            if record.key in new_keys:
+                # Another name (hard link, or symlink followed by the scan) for a file already
+                # in the batch; the same data is never its own duplicate
+                continue
+            new_keys.add(record.key)
+            by_size[record.size].append(record.path)
+
+        # Indexed files sort before new arrivals so they stay the originals
+        candidates_by_size = {}
+        known = set()
+        for size, paths in by_size.items():
+            indexed = self._indexed_files(size, new_keys)
+            if len(indexed) + len(paths) >= 2:
+                candidates_by_size[size] = indexed + paths
+                known.update(indexed)
+
+        # Stage 2: partial hash of head and tail
+        all_candidates = [path for paths in candidates_by_size.values() for path in paths]
+        self._hash_all(all_candidates, partial=True)
+
+        groups = []
+        needs_full_hash = []
+        for size, paths in candidates_by_size.items():
+            for group in _group_by(paths, self.partial_hashes).values():
+                if size <= 2 * self.partial_bytes:
+                    # The partial hash already covered the whole file
+                    for path in group:
+                        self.full_hashes[path] = self.partial_hashes[path]
+                    if len(group) > 1:
+                        groups.append(group)
+                elif len(group) > 1:
+                    needs_full_hash.append(group)
+
+        # Stage 3: full hash only for files that still collide
+        self._hash_all([path for group in needs_full_hash for path in group], partial=False)
+        for group in needs_full_hash:
+            groups.extend(g for g in _group_by(group, self.full_hashes).values() if len(g) > 1)
+
+        duplicates = {}
+        order = {path: rank for paths in candidates_by_size.values() for rank, path in enumerate(paths)}
+        for group in groups:
+            group.sort(key=order.get)
+            original = group[0]
+            for path in group[1:]:
+                if path not in known:
+                    duplicates[path] = original
+
+        return duplicates
+
+    def _indexed_files(self, size, exclude_keys):
+        """Return still-valid indexed (or remembered) files of a given size"""
+        known = [record.path for record in self.remembered.get(size, ())
+                 if record.key not in exclude_keys]
+        if self.index is None:
+            return known
+
+        for path, dev, inode, mtime_ns in self.index.files_with_size(size):
+            if (dev, inode) in exclude_keys:
+                continue
+            self.metrics.count('stat_calls')
+            try:
+                record = FileRecord.from_path(path)
+            except OSError:
+                self.index.forget(dev, inode)
+                continue
+            if (record.dev, record.inode, record.mtime_ns) != (dev, inode, mtime_ns):
+                # File was replaced or modified since it was indexed
+                self.index.forget(dev, inode)
+                self.index.store(record, organized=True)
+                if record.size != size:
+                    continue
+            self.records[path] = record
+            self._batch_paths.append(path)
+            known.append(path)
+        return known
+
+    def _hash_all(self, paths, partial):
+        """Hash files, reusing digests from the index when the file is unchanged"""
+        results = self.partial_hashes if partial else self.full_hashes
+
+        missing = []
+        for path in paths:
+            if path in results:
+                continue
+            cached = None
+            if self.index is not None:
+                cached = self.index.get_hashes(self.records[path])[0 if partial else 1]
+            if cached is not None:
+                results[path] = cached
+            else:
+                missing.append(path)
+
+        if partial:
+            hash_func = self._compute_partial_hash
+            costs = [min(self.records[path].size, 2 * self.partial_bytes) for path in missing]
+        else:
+            hash_func = self._compute_full_hash
+            costs = [self.records[path].size for path in missing]
+
+        for path, cost, digest in zip(missing, costs, self._map(hash_func, missing, costs)):
+            size = self.records[path].size
+            self.metrics.count('files_hashed')
+            self.metrics.count('bytes_hashed', cost)
+            if partial:
+                digest, head = digest
+                if head is not None:
+                    self.heads[path] = head
+            if digest is None:
+                self.unreadable.add(path)
+                continue
+            results[path] = digest
+            if self.index is not None:
+                record = self.records[path]
+                if not partial:
+                    self.index.store(record, digest=digest)
+                elif size <= 2 * self.partial_bytes:
+                    self.index.store(record, partial=digest, digest=digest)
+                else:
+                    self.index.store(record, partial=digest)
+
+    def _compute_partial_hash(self, path):
+        """(digest, head) of a file; head is None unless head_bytes is set"""
+        return read_partial_hash(path, self.records[path].size, self.partial_bytes, self.algorithm,
+                                 self.head_bytes)
+
+    def _compute_full_hash(self, path):
+        return get_file_hash(path, self.algorithm, use_mmap=self.records[path].size >= MMAP_THRESHOLD)
+
+    def _map(self, func, items, costs):
+        """Apply func to items in order, in the worker pool when there is one
+
+        Pool tasks are balanced by cost (bytes to read): the largest files
+        are submitted first and small files are bundled into tasks of
+        about equal size, so workers finish together instead of one of
+        them hashing a big file at the end while the others idle.
+        """
+        if self._executor is None or len(items) < 2:
+            return map(func, items)
+
+        target = max(1, min(HASH_TASK_BYTES, sum(costs) // (self.workers * 4)))
+        tasks = []
+        task = []
+        task_bytes = 0
+        for index in sorted(range(len(items)), key=costs.__getitem__, reverse=True):
+            task.append(index)
+            task_bytes += costs[index]
+            if task_bytes >= target:
+                tasks.append(task)
+                task = []
+                task_bytes = 0
+        if task:
+            tasks.append(task)
+
+        futures = [self._executor.submit(_run_task, func, [items[index] for index in task]) for task in tasks]
+        results = [None] * len(items)
+        for task, future in zip(tasks, futures):
+            for index, result in zip(task, future.result()):
+                results[index] = result
+        return results
+
+
+def _run_task(func, items):
+    return [func(item) for item in items]
+
+
+def _group_by(paths, digests):
+    """Group paths by their digest, leaving out paths without one"""
+    groups = defaultdict(list)
+    for path in paths:
+        digest = digests.get(path)
+        if digest is not None:
+            groups[digest].append(path)
+    return groups
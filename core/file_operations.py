@@ -2,137 +2,184 @@
 File operation utilities for Digital Janitor Pro
 """
 import hashlib
+import mmap
+import os
+import threading
 from pathlib import Path
 
+# Buffer size for readinto-based hashing
+HASH_BUFFER_SIZE = 1024 * 1024
 
-def get_file_size_mb(file_path):
-    """Returns file size in MB"""
-    size_bytes = Path(file_path).stat().st_size
-    size_mb = size_bytes / (1024 * 1024)
-    return size_mb
+# Files at least this large are hashed through mmap
+MMAP_THRESHOLD = 64 * 1024 * 1024
 
+DEFAULT_HASH_ALGORITHM = 'md5'
 
-def get_file_hash(file_path):
-    """Generate MD5 hash for file content"""
-    hash_md5 = hashlib.md5()
+# Algorithm used when a requested optional one is not installed
+FALLBACK_HASH_ALGORITHM = 'blake2b'
+
+_buffers = threading.local()
+
+
+def _xxhash_factory():
+    import xxhash
+    return xxhash.xxh3_128()
+
+
+def _blake3_factory():
+    import blake3
+    return blake3.blake3()
+
+
+HASH_ALGORITHMS = {
+    'md5': hashlib.md5,
+    'sha1': hashlib.sha1,
+    'sha256': hashlib.sha256,
+    'blake2b': hashlib.blake2b,
+    'xxhash': _xxhash_factory,
+    'blake3': _blake3_factory,
+}
+
+
+def resolve_hash_algorithm(algorithm):
+    """Return the algorithm that will actually be used for a configured name
+
+    Optional algorithms (xxhash, blake3) fall back to the stdlib blake2b
+    when their package is not installed.
+    """
+    algorithm = (algorithm or DEFAULT_HASH_ALGORITHM).lower()
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(f"Unknown hash algorithm: {algorithm}")
+    try:
+        HASH_ALGORITHMS[algorithm]()
+    except ImportError:
+        print(f"Hash algorithm '{algorithm}' is not installed, using {FALLBACK_HASH_ALGORITHM}")
+        return FALLBACK_HASH_ALGORITHM
+    return algorithm
+
+
+def new_hasher(algorithm=DEFAULT_HASH_ALGORITHM):
+    """Create a hash object for a resolved algorithm name"""
+    return HASH_ALGORITHMS[algorithm]()
+
+
+def _get_buffer():
+    """Per-thread reusable read buffer"""
+    buffer = getattr(_buffers, 'buffer', None)
+    if buffer is None:
+        buffer = _buffers.buffer = bytearray(HASH_BUFFER_SIZE)
+    return buffer
+
+
+def hash_stream(f, hasher, limit=None):
+    """Feed a binary file object into hasher using readinto on a reusable buffer
+
+    Reads to EOF, or at most limit bytes when given.
+    """
+    buffer = _get_buffer()
+    view = memoryview(buffer)
+    remaining = limit
+    while remaining is None or remaining > 0:
+        if remaining is not None and remaining < len(buffer):
+            count = f.readinto(view[:remaining])
+        else:
+            count = f.readinto(buffer)
+        if not count:
+            break
+        hasher.update(view[:count])
+        if remaining is not None:
+            remaining -= count
+
+
+class FileRecord:
+    """Metadata for one file, taken from a single stat call
+
+    Built from an os.DirEntry during the scan and passed through hashing,
+    date bucketing, size classification and moving, so no later step has
+    to stat the file again.
+    """
+    __slots__ = ('path', 'suffix', 'size', 'mtime', 'mtime_ns', 'inode', 'dev')
+
+    def __init__(self, path, stat_result):
+        self.path = Path(path)
+        self.suffix = self.path.suffix.lower()
+        self.size = stat_result.st_size
+        self.mtime = stat_result.st_mtime
+        self.mtime_ns = stat_result.st_mtime_ns
+        self.inode = stat_result.st_ino
+        self.dev = stat_result.st_dev
+
+    @classmethod
+    def from_entry(cls, entry):
+        """Build a record from an os.scandir entry"""
+        return cls(entry.path, entry.stat())
+
+    @classmethod
+    def from_path(cls, path):
+        """Build a record by stat'ing a path"""
+        return cls(path, os.stat(path))
+
+    @property
+    def name(self):
+        return self.path.name
+
+    @property
+    def size_mb(self):
+        return self.size / (1024 * 1024)
+
+    @property
+    def key(self):
+        """(device, inode) identity of the file"""
+        return self.dev, self.inode
+
+    def __repr__(self):
+        return f"FileRecord({str(self.path)!r}, size={self.size})"
+
+
+def get_file_hash(file_path, algorithm=DEFAULT_HASH_ALGORITHM, use_mmap=None):
+    """Generate a content hash for a file
+
+    Large files are hashed through mmap, everything else with readinto
+    into a reusable buffer. use_mmap forces one mode or the other.
+    """
+    hasher = new_hasher(algorithm)
     try:
-        with open(file_path, "rb") as f:
-            # Read file in chunks to handle large files
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        with open(file_path, "rb", buffering=0) as f:
+            if use_mmap is None:
+                use_mmap = os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD
+            if use_mmap:
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        hasher.update(mapped)
+                    return hasher.hexdigest()
+                except (ValueError, OSError):
+                    # Empty files and some filesystems cannot be mapped
+                    f.seek(0)
+            hash_stream(f, hasher)
+        return hasher.hexdigest()
     except Exception as e:
         print(f"Error hashing {file_path}: {e}")
         return None
 
-import datetime
-import json
-
-
-def create_backup_manifest(root_dir, backup_dir):
-    """Create detailed backup of current directory state"""
-    manifest = {
-        "timestamp": datetime.datetime.now().isoformat(),
-        "root_directory": str(root_dir),
-        "files": [],
-        "folders": []
-    }
-
-    # Scan all files and folders
-    for item in root_dir.iterdir():
-        if item.name.startswith('.janitor'):
-            continue
-
-        if item.is_file():
-            manifest["files"].append({
-                "name": item.name,
-                "path": str(item),
-                "size": item.stat().st_size,
-                "modified": item.stat().st_mtime
-            })
-        elif item.is_dir():
-            manifest["folders"].append({
-                "name": item.name,
-                "path": str(item)
-            })
-
-    # Save manifest
-    manifest_file = backup_dir / 'backup_manifest.json'
-    with open(manifest_file, 'w') as f:
-        json.dump(manifest, f, indent=4)
-
-    return manifest
-
-
-def generate_restore_script(backup_manifest, root_dir):
-    """Generate Python script that can restore original state"""
-    restore_code = f'''#!/usr/bin/env python3
-"""
-DIGITAL JANITOR PRO - RESTORE SCRIPT
-Generated: {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-Restores files to original state before Digital Janitor Pro ran.
-"""
-
-import shutil
-from pathlib import Path
 
-def restore_files():
-    """Restore all files to original locations"""
-    print("Starting restore process...")
-
-    root_dir = Path("{root_dir}")
-    closet_dir = root_dir / "closet"
-
-    if not closet_dir.exists():
-        print("ERROR: No closet directory found - nothing to restore!")
-        return
-
-    restored_count = 0
-
-    # Restore files from all subdirectories
-    for subdir in closet_dir.iterdir():
-        if subdir.is_dir():
-            print(f"Processing {{subdir.name}}/")
-            for file_item in subdir.iterdir():
-                if file_item.is_file():
-                    # Move back to root directory
-                    destination = root_dir / file_item.name
-
-                    # Handle name conflicts
-                    counter = 1
-                    while destination.exists():
-                        stem = file_item.stem
-                        suffix = file_item.suffix
-                        destination = root_dir / f"{{stem}}_restored_{{counter}}{{suffix}}"
-                        counter += 1
-
-                    try:
-                        shutil.move(file_item, destination)
-                        print(f"SUCCESS: Restored {{file_item.name}} -> {{destination.name}}")
-                        restored_count += 1
-                    except Exception as e:
-                        print(f"ERROR: Failed to restore {{file_item.name}}: {{e}}")
-
-    # Remove empty closet directory
-    try:
-        shutil.rmtree(closet_dir)
-        print("SUCCESS: Removed closet directory")
-    except Exception as e:
-        print(f"WARNING: Could not remove closet directory: {{e}}")
+BACKUP_MANIFEST_NAME = 'backup_manifest.jsonl'
 
-    print(f"\\nRestore complete! Restored {{restored_count}} files.")
 
-if __name__ == "__main__":
-    confirm = input("WARNING: This will restore all files to root directory. Continue? (y/n): ")
-    if confirm.lower() == 'y':
-        restore_files()
-    else:
-        print("Restore cancelled.")
-'''
+def create_backup_manifest(root_dir, backup_dir, compression='gzip', algorithm=None,
+                           name=BACKUP_MANIFEST_NAME, skip=None):
+    """Record the current state of root_dir (recursively) in backup_dir; returns the manifest path
 
-    # Save restore script
-    restore_script_path = root_dir / 'restore_original_structure.py'
-    with open(restore_script_path, 'w') as f:
-        f.write(restore_code)
+    The manifest is streamed to disk entry by entry (see core.manifest),
+    so memory use stays flat however large the tree is; read it back with
+    core.manifest.ManifestReader. It used to be built in memory and
+    returned as a dict. skip(name) leaves top-level entries out; by
+    default only the janitor's own .janitor folder is.
+    """
+    from core.manifest import COMPRESSION_SUFFIXES, resolve_compression, write_manifest
 
-    return restore_script_path
+    if skip is None:
+        skip = lambda entry_name: entry_name.startswith('.janitor')
+    compression = resolve_compression(compression)
+    manifest_path = Path(backup_dir) / (name + COMPRESSION_SUFFIXES[compression])
+    write_manifest(root_dir, manifest_path, compression, algorithm, skip=skip)
+    return manifest_path
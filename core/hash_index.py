@@ -0,0 +1,227 @@
+"""
+Persistent content-hash index for Digital Janitor Pro
+Remembers digests of organized files across runs in .janitor/hash_index.db
+"""
+import os
+import sqlite3
+from pathlib import Path
+from core.file_operations import DEFAULT_HASH_ALGORITHM, FileRecord
+
+INDEX_DIR_NAME = '.janitor'
+INDEX_FILE_NAME = 'hash_index.db'
+
+# Folders inside a month directory whose files are not canonical originals
+NON_CANONICAL_FOLDERS = ('duplicates', 'folders')
+
+
+class HashIndex:
+    """SQLite-backed index of file digests
+
+    Entries are keyed by (device, inode) and are only trusted while the
+    file's size and mtime still match, so a changed file is re-hashed.
+    Paths are stored relative to the organized root directory. Digests
+    are dropped when the index was built with a different hash algorithm.
+
+    Only entries marked organized (files filed into the date tree) are
+    offered as duplicate originals; other entries just cache digests.
+
+    A read_only index (used by dry runs) never writes: stores are ignored
+    and digests made with another algorithm are simply not returned.
+    Opened with algorithm=None (by restore), the stored digests are kept
+    whatever algorithm made them.
+    """
+
+    def __init__(self, root_dir, algorithm=DEFAULT_HASH_ALGORITHM, read_only=False):
+        self.root_dir = Path(root_dir)
+        self.read_only = read_only
+        index_dir = self.root_dir / INDEX_DIR_NAME
+        self.db_path = index_dir / INDEX_FILE_NAME
+        self.is_new = not self.db_path.exists()
+
+        if read_only:
+            self.connection = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True)
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'algorithm'").fetchone()
+            self.digests_valid = bool(row) and row[0] == algorithm
+            return
+
+        index_dir.mkdir(exist_ok=True)
+        self.digests_valid = True
+        self.connection = sqlite3.connect(str(self.db_path))
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                dev INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                partial TEXT,
+                digest TEXT,
+                organized INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dev, inode)
+            )
+        """)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(files)")]
+        if 'organized' not in columns:
+            # Indexes from before the organized flag only held organized files
+            self.connection.execute("ALTER TABLE files ADD COLUMN organized INTEGER NOT NULL DEFAULT 1")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS files_by_size ON files (size)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if algorithm is not None:
+            self._check_algorithm(algorithm)
+
+    def _check_algorithm(self, algorithm):
+        """Invalidate stored digests if they were made with another algorithm"""
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'algorithm'").fetchone()
+        if row and row[0] != algorithm:
+            self.connection.execute("UPDATE files SET partial = NULL, digest = NULL")
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('algorithm', ?)", (algorithm,))
+        self.connection.commit()
+
+    def _relative(self, path):
+        return os.path.relpath(path, self.root_dir)
+
+    @classmethod
+    def open_existing(cls, root_dir, algorithm=DEFAULT_HASH_ALGORITHM, read_only=True):
+        """Open an existing index (read-only by default), or return None if there is none"""
+        if not (Path(root_dir) / INDEX_DIR_NAME / INDEX_FILE_NAME).exists():
+            return None
+        return cls(root_dir, algorithm, read_only=read_only)
+
+    def get_hashes(self, record):
+        """Return (partial, digest) for a FileRecord if its entry is still valid"""
+        if not self.digests_valid:
+            return None, None
+        row = self.connection.execute(
+            "SELECT partial, digest FROM files WHERE dev = ? AND inode = ? AND size = ? AND mtime_ns = ?",
+            (record.dev, record.inode, record.size, record.mtime_ns)
+        ).fetchone()
+        return row if row else (None, None)
+
+    def store(self, record, path=None, partial=None, digest=None, organized=False):
+        """Insert or update the entry for a FileRecord
+
+        path is where the file lives now, defaulting to record.path.
+        Known digests are kept when the file is unchanged and no new
+        digest is given; a changed size or mtime drops them. Once an
+        entry is marked organized it stays so until it is forgotten.
+        """
+        if self.read_only:
+            return
+        self.connection.execute("""
+            INSERT INTO files (dev, inode, size, mtime_ns, path, partial, digest, organized)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (dev, inode) DO UPDATE SET
+                path = excluded.path,
+                organized = MAX(organized, excluded.organized),
+                partial = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns
+                          THEN COALESCE(excluded.partial, partial) ELSE excluded.partial END,
+                digest = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns
+                         THEN COALESCE(excluded.digest, digest) ELSE excluded.digest END,
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns
+        """, (record.dev, record.inode, record.size, record.mtime_ns,
+              self._relative(path or record.path), partial, digest, int(organized)))
+
+    def forget(self, dev, inode):
+        """Remove a file entry"""
+        if self.read_only:
+            return
+        self.connection.execute("DELETE FROM files WHERE dev = ? AND inode = ?", (dev, inode))
+
+    def unorganize(self, dev, inode, path):
+        """Stop offering a file as a duplicate original; it now lives at path, outside the date tree
+
+        Its digests stay cached, so organizing it again does not re-read it.
+        """
+        if self.read_only:
+            return
+        self.connection.execute("UPDATE files SET organized = 0, path = ? WHERE dev = ? AND inode = ?",
+                                (self._relative(path), dev, inode))
+
+    def files_with_size(self, size):
+        """Yield (path, dev, inode, mtime_ns) for organized files of a given size, oldest entry first"""
+        rows = self.connection.execute(
+            "SELECT path, dev, inode, mtime_ns FROM files WHERE size = ? AND organized = 1 ORDER BY rowid",
+            (size,)
+        ).fetchall()
+        for path, dev, inode, mtime_ns in rows:
+            yield self.root_dir / path, dev, inode, mtime_ns
+
+    def seed(self, year_dirs):
+        """Index files already filed in YYYY/MM/type folders (stat only, no hashing)"""
+        count = 0
+        for year_dir in year_dirs:
+            for month_entry in _subdirectories(year_dir):
+                for type_entry in _subdirectories(month_entry.path):
+                    if type_entry.name in NON_CANONICAL_FOLDERS:
+                        continue
+                    with os.scandir(type_entry.path) as entries:
+                        for entry in entries:
+                            if entry.is_file(follow_symlinks=False):
+                                self.store(FileRecord(entry.path, entry.stat(follow_symlinks=False)),
+                                           organized=True)
+                                count += 1
+        self.commit()
+        return count
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        if not self.read_only:
+            self.connection.commit()
+        self.connection.close()
+
+
+class IndexGroup:
+    """The hash indexes of several roots, used as one for duplicate detection
+
+    Looking up files by size searches every root's index, in root order,
+    so an organized file in any root can be the original of a new
+    arrival. Entries are read and written in the index of the root the
+    file lives under, so each root's index still only describes its own
+    files and keeps working on its own.
+    """
+
+    def __init__(self, indexes):
+        self.indexes = list(indexes)
+        self._by_root = {index.root_dir: index for index in self.indexes}
+
+    def owner(self, path):
+        """The index of the root path lies under"""
+        for parent in Path(path).parents:
+            index = self._by_root.get(parent)
+            if index is not None:
+                return index
+        raise ValueError(f"{path} is not under any indexed root")
+
+    def get_hashes(self, record):
+        return self.owner(record.path).get_hashes(record)
+
+    def store(self, record, path=None, partial=None, digest=None, organized=False):
+        self.owner(path or record.path).store(record, path, partial, digest, organized)
+
+    def forget(self, dev, inode):
+        """Drop a stale entry; only the root it was found in has it, the others ignore the delete"""
+        for index in self.indexes:
+            index.forget(dev, inode)
+
+    def unorganize(self, dev, inode, path):
+        self.owner(path).unorganize(dev, inode, path)
+
+    def files_with_size(self, size):
+        for index in self.indexes:
+            yield from index.files_with_size(size)
+
+    def commit(self):
+        for index in self.indexes:
+            index.commit()
+
+
+def _subdirectories(path):
+    """List directory entries that are real directories"""
+    with os.scandir(path) as entries:
+        return [entry for entry in entries if entry.is_dir(follow_symlinks=False)]
@@ -0,0 +1,360 @@
+"""
+Operation journal and restore for Digital Janitor Pro
+Every applied operation is recorded in .janitor/journal.jsonl so a run can be undone exactly
+"""
+import datetime
+import json
+import os
+import threading
+from pathlib import Path
+from core.hash_index import HashIndex, INDEX_DIR_NAME
+from core.manifest import find_run_manifest, changed_files
+from core.mover import MoveEngine
+from core.planner import DELETE_FOLDER, MOVE_FILE
+from core.reclaim import LINKED, CLONED
+from core.scanner import iter_batches
+from core.verify import ExpectedFiles
+
+JOURNAL_FILE_NAME = 'journal.jsonl'
+
+# Restored entries marked in the journal per fsync
+RESTORE_BATCH_SIZE = 1000
+
+# Run ids handed out by this process, so two journals opened in the same second differ
+_run_ids = set()
+_run_ids_lock = threading.Lock()
+
+
+class Journal:
+    """Append-only, write-ahead record of the operations of a run
+
+    Each plan's operations are appended and fsync'd together before the
+    plan is applied, so the journal never misses a move that happened.
+    An entry whose move never happened is harmless: restore finds its
+    destination missing and skips it. Paths are stored relative to the
+    organized root directory.
+    """
+
+    def __init__(self, root_dir, event='run'):
+        """event names the journal session: 'run' for organizing, 'restore' for restores"""
+        self.root_dir = Path(root_dir)
+        journal_dir = self.root_dir / INDEX_DIR_NAME
+        journal_dir.mkdir(exist_ok=True)
+        self.path = journal_dir / JOURNAL_FILE_NAME
+        self.run_id = _new_run_id()
+        self.seq = 0
+        self._file = open(self.path, 'a')
+        self._write([{'event': event, 'run': self.run_id,
+                      'time': datetime.datetime.now().isoformat(timespec='seconds')}])
+
+    def record(self, operations):
+        """Append entries for operations that are about to be applied
+
+        A duplicate that may be deleted also records its original and
+        modification time, which is all restore needs to bring it back.
+        Returns the sequence numbers given to the operations, in order.
+        """
+        entries = []
+        for op in operations:
+            self.seq += 1
+            entry = {
+                'event': 'op',
+                'run': self.run_id,
+                'seq': self.seq,
+                'action': op.action,
+                'source': os.path.relpath(op.source, self.root_dir),
+                'destination': os.path.relpath(op.destination, self.root_dir) if op.destination else None,
+            }
+            if op.original is not None:
+                entry['original'] = os.path.relpath(op.original, self.root_dir)
+                if op.record is not None:
+                    entry['mtime_ns'] = op.record.mtime_ns
+            entries.append(entry)
+        self._write(entries)
+        return [entry['seq'] for entry in entries]
+
+    def record_methods(self, operations, seqs):
+        """Append how duplicates were linked or cloned once applied
+
+        Restore gives such a duplicate its own copy again instead of
+        moving the link back. seqs are the numbers record() returned.
+        """
+        self._write([{'event': 'applied', 'run': self.run_id, 'seq': seq, 'method': op.method}
+                     for op, seq in zip(operations, seqs) if op.method in (LINKED, CLONED)])
+
+    def mark_restored(self, entries):
+        """Append markers for entries that restore has undone"""
+        self._write([{'event': 'restored', 'run': entry['run'], 'seq': entry['seq']}
+                     for entry in entries])
+
+    def _write(self, entries):
+        if not entries:
+            return
+        self._file.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _new_run_id():
+    """'YYYYMMDD-HHMMSS-pid', with -2, -3 ... for later journals of this process in the same second"""
+    base = f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    with _run_ids_lock:
+        run_id = base
+        counter = 2
+        while run_id in _run_ids:
+            run_id = f"{base}-{counter}"
+            counter += 1
+        _run_ids.add(run_id)
+    return run_id
+
+
+def read_journal(root_dir):
+    """Return (operations, restored keys) from the journal of root_dir
+
+    operations are the 'op' entries in the order they were written, with
+    a 'method' for duplicates that were linked or cloned; restored is the
+    set of (run, seq) pairs already undone. A line torn by a crash while
+    it was written is ignored.
+    """
+    path = Path(root_dir) / INDEX_DIR_NAME / JOURNAL_FILE_NAME
+    operations = []
+    restored = set()
+    methods = {}
+    if not path.exists():
+        return operations, restored
+    with open(path) as journal_file:
+        for line in journal_file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('event') == 'op':
+                operations.append(entry)
+            elif entry.get('event') == 'restored':
+                restored.add((entry['run'], entry['seq']))
+            elif entry.get('event') == 'applied':
+                methods[(entry['run'], entry['seq'])] = entry['method']
+    if methods:
+        for entry in operations:
+            method = methods.get((entry['run'], entry['seq']))
+            if method is not None:
+                entry['method'] = method
+    return operations, restored
+
+
+class RestoreResult:
+    """Counts of what a restore did"""
+
+    def __init__(self):
+        self.restored = 0
+        self.already_restored = 0
+        self.missing = []       # organized paths no longer there
+        self.conflicts = []     # original paths taken by another file
+        self.deleted = []       # temp folders that were deleted and cannot come back
+        self.changed = []       # files that differ from the manifest taken before the run
+
+    def to_dict(self):
+        return {
+            'restored': self.restored,
+            'already_restored': self.already_restored,
+            'missing': [str(path) for path in self.missing],
+            'conflicts': [str(path) for path in self.conflicts],
+            'deleted': [str(path) for path in self.deleted],
+            'changed': [str(path) for path in self.changed],
+        }
+
+    def lines(self):
+        lines = [f"Restored {self.restored} items"]
+        if self.already_restored:
+            lines.append(f"{self.already_restored} items were already back in place")
+        if self.missing:
+            lines.append(f"{len(self.missing)} organized items are missing")
+        if self.conflicts:
+            lines.append(f"{len(self.conflicts)} original paths are taken by other files (left alone)")
+        if self.deleted:
+            lines.append(f"{len(self.deleted)} deleted temp folders cannot be restored")
+        if self.changed:
+            lines.append(f"{len(self.changed)} files are missing or differ from the manifest taken before the run")
+        return lines
+
+
+class JournalRestorer:
+    """Replays the journal in reverse, moving everything back to its original path
+
+    Every undone entry is marked in the journal (fsync'd once per batch),
+    so an interrupted restore picks up where it stopped when run again.
+    Entries whose file is already back at its original path count as
+    restored, which covers an interruption between a rename and its marker.
+    Restored items are no longer expected by verify, and restored files
+    are no longer offered as duplicate originals. When the earliest
+    undone run took a backup manifest, the restored tree is checked
+    against it.
+    """
+
+    def __init__(self, root_dir, logger=None, mover=None, batch_size=RESTORE_BATCH_SIZE):
+        self.root_dir = Path(os.path.normpath(root_dir))
+        self.logger = logger
+        self.mover = mover if mover is not None else MoveEngine()
+        self.batch_size = batch_size
+        self.created_dirs = set()
+        self.emptied_dirs = set()
+        self.expected = None
+        self.hash_index = None
+
+    def restore(self, run_id=None):
+        """Undo all not yet restored operations (of one run when run_id is given)"""
+        operations, restored = read_journal(self.root_dir)
+        pending = [entry for entry in operations
+                   if (entry['run'], entry['seq']) not in restored
+                   and (run_id is None or entry['run'] == run_id)]
+
+        result = RestoreResult()
+        self.expected = ExpectedFiles.open_existing(self.root_dir)
+        self.hash_index = HashIndex.open_existing(self.root_dir, algorithm=None, read_only=False)
+        try:
+            with Journal(self.root_dir, event='restore') as journal:
+                for batch in iter_batches(reversed(pending), self.batch_size):
+                    undone = [entry for entry in batch if self._undo(entry, result)]
+                    if self.expected is not None:
+                        for entry in undone:
+                            if entry['destination']:
+                                self.expected.discard(entry['destination'])
+                        self.expected.commit()
+                    if self.hash_index is not None:
+                        self.hash_index.commit()
+                    journal.mark_restored(undone)
+                    if self.logger is not None:
+                        self.logger.flush()
+        finally:
+            if self.expected is not None:
+                self.expected.close()
+                self.expected = None
+            if self.hash_index is not None:
+                self.hash_index.close()
+                self.hash_index = None
+
+        self._remove_empty_dirs()
+        if pending:
+            self._check_manifest(pending[0]['run'], result)
+        return result
+
+    def _check_manifest(self, run_id, result):
+        """List the files that are not as the manifest of run_id recorded them (files of deleted temp folders aside)"""
+        path = find_run_manifest(self.root_dir, run_id)
+        if path is None:
+            return
+        try:
+            result.changed = list(changed_files(path, self.root_dir, skip=result.deleted))
+        except (OSError, ValueError) as e:
+            if self.logger is not None:
+                self.logger.log(f"Could not check the restore against {path.name}: {e}")
+            return
+        if self.logger is not None:
+            for changed in result.changed:
+                self.logger.log(f"CHANGED: {changed} differs from the manifest taken before the run",
+                                event="changed", source=changed)
+
+    def _undo(self, entry, result):
+        """Move one entry back; returns True when it can be marked restored"""
+        if entry['action'] == DELETE_FOLDER:
+            result.deleted.append(entry['source'])
+            return True
+
+        source = self.root_dir / entry['source']
+        # Tiering moves folders out of the root ('../cold/2024/05/images'); resolve the '..' parts
+        # so empty-folder cleanup knows the destination is outside the root
+        destination = Path(os.path.normpath(self.root_dir / entry['destination']))
+        if not os.path.lexists(destination):
+            if os.path.lexists(source):
+                result.already_restored += 1
+                return True
+            if entry.get('original') and os.path.exists(self.root_dir / entry['original']):
+                # A deleted duplicate: its verified-equal original is copied back
+                return self._recreate(entry, source, result)
+            result.missing.append(entry['destination'])
+            return False
+        if os.path.lexists(source):
+            result.conflicts.append(entry['source'])
+            return False
+        if entry.get('original') and self._shares_original(entry, destination):
+            # Moving a hard link or clone back would leave it tied to the original
+            return self._recreate(entry, source, result, replaces=destination)
+
+        if entry['action'] == MOVE_FILE and self.hash_index is not None:
+            # The index knows the organized file by its identity at the destination
+            filed = os.lstat(destination)
+        else:
+            filed = None
+        self._make_parent(source)
+        self.mover.move(destination, source)
+        if filed is not None:
+            self.hash_index.unorganize(filed.st_dev, filed.st_ino, source)
+        self.emptied_dirs.add(destination.parent)
+        result.restored += 1
+        if self.logger is not None:
+            self.logger.log(f"RESTORED: {entry['destination']} -> {entry['source']}",
+                            event="restored", source=entry['destination'], destination=entry['source'])
+        return True
+
+    def _shares_original(self, entry, destination):
+        """True when a duplicate was replaced by a hard link or clone of its (still present) original
+
+        A link whose 'applied' marker was lost to a crash is still found by its inode.
+        """
+        original = self.root_dir / entry['original']
+        if entry.get('method') in (LINKED, CLONED):
+            return os.path.exists(original)
+        try:
+            destination_stat = os.lstat(destination)
+            original_stat = os.lstat(original)
+        except OSError:
+            return False
+        return (destination_stat.st_dev, destination_stat.st_ino) == (original_stat.st_dev, original_stat.st_ino)
+
+    def _recreate(self, entry, source, result, replaces=None):
+        """Copy a deleted, linked or cloned duplicate's original back to the duplicate's path
+
+        replaces is the link or clone left in the tree, removed once the copy is in place.
+        """
+        self._make_parent(source)
+        self.mover.copy(self.root_dir / entry['original'], source)
+        if entry.get('mtime_ns') is not None:
+            os.utime(source, ns=(entry['mtime_ns'], entry['mtime_ns']))
+        if replaces is not None:
+            os.unlink(replaces)
+            self.emptied_dirs.add(replaces.parent)
+        result.restored += 1
+        if self.logger is not None:
+            self.logger.log(f"RECREATED: {entry['source']} from {entry['original']}",
+                            event="restored", source=entry['original'], destination=entry['source'])
+        return True
+
+    def _make_parent(self, path):
+        parent = path.parent
+        if parent not in self.created_dirs:
+            parent.mkdir(parents=True, exist_ok=True)
+            self.created_dirs.add(parent)
+
+    def _remove_empty_dirs(self):
+        """Remove organized folders left empty, deepest first, up to the root"""
+        candidates = set()
+        for directory in self.emptied_dirs:
+            while directory != self.root_dir and self.root_dir in directory.parents:
+                candidates.add(directory)
+                directory = directory.parent
+        for directory in sorted(candidates, key=lambda path: len(path.parts), reverse=True):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                continue
@@ -0,0 +1,304 @@
+"""
+Backup manifests for Digital Janitor Pro
+Streams a record of every file and folder below a root to JSON lines, optionally compressed
+"""
+import datetime
+import gzip
+import io
+import json
+import os
+import stat
+from pathlib import Path
+from core.file_operations import get_file_hash
+from core.hash_index import INDEX_DIR_NAME
+
+MANIFEST_VERSION = 1
+
+# Columns of an entry line, named once in the header
+MANIFEST_FIELDS = ('type', 'path', 'size', 'mtime_ns', 'mode', 'digest')
+
+# Entry types
+FILE = 'f'
+DIRECTORY = 'd'
+SYMLINK = 'l'
+
+MANIFEST_COMPRESSIONS = ('none', 'gzip', 'zstd')
+
+# File name suffix for each compression
+COMPRESSION_SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+# Compression used when zstd is asked for but the zstandard package is not installed
+FALLBACK_COMPRESSION = 'gzip'
+
+# Folder (in .janitor) of the manifests organize runs take before they start, named after the run id
+RUN_MANIFEST_DIR_NAME = 'manifests'
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'(\xb5/\xfd'
+
+_COMPACT = (',', ':')
+
+
+class ManifestEntry:
+    """One file, folder or symlink of a manifest; path is relative to the root, with '/' separators"""
+    __slots__ = MANIFEST_FIELDS
+
+    def __init__(self, type, path, size=0, mtime_ns=0, mode=0, digest=None):
+        self.type = type
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.mode = mode
+        self.digest = digest
+
+    @classmethod
+    def from_stat(cls, path, stat_result, digest=None):
+        if stat.S_ISDIR(stat_result.st_mode):
+            entry_type, size = DIRECTORY, 0
+        elif stat.S_ISLNK(stat_result.st_mode):
+            entry_type, size = SYMLINK, 0
+        else:
+            entry_type, size = FILE, stat_result.st_size
+        return cls(entry_type, path, size, stat_result.st_mtime_ns, stat.S_IMODE(stat_result.st_mode), digest)
+
+    def to_row(self):
+        return [self.type, self.path, self.size, self.mtime_ns, self.mode, self.digest]
+
+    def __repr__(self):
+        return f"ManifestEntry({self.type!r}, {self.path!r}, size={self.size})"
+
+
+def resolve_compression(compression):
+    """Return the compression that will actually be used for a configured name
+
+    zstd needs the optional zstandard package and falls back to gzip
+    without it.
+    """
+    compression = (compression or 'none').lower()
+    if compression not in MANIFEST_COMPRESSIONS:
+        raise ValueError(f"Unknown manifest compression: {compression}")
+    if compression == 'zstd':
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            print(f"Compression 'zstd' is not installed, using {FALLBACK_COMPRESSION}")
+            return FALLBACK_COMPRESSION
+    return compression
+
+
+class ManifestWriter:
+    """Writes a manifest one entry at a time
+
+    The file starts with a header line naming the root and the columns,
+    has one compact JSON array per entry, and ends with a summary line.
+    It is written under a temp name and renamed into place on close(),
+    so a reader never sees a half-written manifest. Nothing but the
+    compressor's buffer is held in memory, whatever the number of entries.
+    """
+
+    def __init__(self, path, root_dir, compression='none', algorithm=None):
+        """algorithm is the hash algorithm of the digest column (None when files are not hashed)"""
+        self.path = Path(path)
+        self.compression = resolve_compression(compression)
+        self.temp_path = self.path.with_name(self.path.name + '.tmp')
+        self._file = _open_write(self.temp_path, self.compression)
+        self.files = 0
+        self.folders = 0
+        self.bytes = 0
+        self._write({
+            'manifest': MANIFEST_VERSION,
+            'root': str(root_dir),
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'fields': list(MANIFEST_FIELDS),
+            'algorithm': algorithm,
+        })
+
+    def add(self, entry):
+        if entry.type == DIRECTORY:
+            self.folders += 1
+        else:
+            self.files += 1
+            self.bytes += entry.size
+        self._write(entry.to_row())
+
+    def _write(self, value):
+        self._file.write(json.dumps(value, separators=_COMPACT) + "\n")
+
+    def summary(self):
+        return {'files': self.files, 'folders': self.folders, 'bytes': self.bytes}
+
+    def close(self):
+        """Write the summary line and move the manifest into place"""
+        if self._file is None:
+            return
+        self._write({'summary': self.summary()})
+        self._file.close()
+        self._file = None
+        os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        """Drop a manifest that could not be completed"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            os.unlink(self.temp_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ManifestReader:
+    """Iterates the entries of a manifest in constant memory
+
+    Compression is detected from the file's first bytes. header holds the
+    manifest's header; summary is filled in once iteration reaches the end
+    and stays None for a manifest that was cut short.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = _open_read(self.path)
+        first = self._file.readline()
+        try:
+            self.header = json.loads(first)
+        except ValueError:
+            self.header = None
+        if not isinstance(self.header, dict) or self.header.get('manifest') != MANIFEST_VERSION:
+            self._file.close()
+            raise ValueError(f"Not a janitor manifest: {self.path}")
+        self.root_dir = Path(self.header['root'])
+        self.algorithm = self.header.get('algorithm')
+        self.summary = None
+
+    def __iter__(self):
+        for line in self._file:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                # A line torn by a crash; nothing after it can be trusted
+                break
+            if isinstance(row, dict):
+                self.summary = row.get('summary')
+                break
+            yield ManifestEntry(*row)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_manifest(root_dir, path, compression='none', algorithm=None, skip=None):
+    """Record every file, folder and symlink below root_dir; returns the summary
+
+    Each entry is stat'd exactly once (without following symlinks) during
+    a recursive scandir walk. With algorithm, the digest column holds each
+    file's content hash. skip(name) leaves top-level entries out.
+    """
+    root_dir = Path(root_dir)
+    with ManifestWriter(path, root_dir, compression, algorithm) as writer:
+        # The manifest itself (and the one it replaces) may be inside the tree
+        own = {_file_key(candidate) for candidate in (writer.temp_path, writer.path)} - {None}
+        stack = [(os.fspath(root_dir), '')]
+        while stack:
+            directory, prefix = stack.pop()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not prefix and skip is not None and skip(entry.name):
+                        continue
+                    stat_result = entry.stat(follow_symlinks=False)
+                    relative = prefix + entry.name
+                    digest = None
+                    if stat.S_ISDIR(stat_result.st_mode):
+                        stack.append((entry.path, relative + '/'))
+                    elif stat.S_ISREG(stat_result.st_mode):
+                        if (stat_result.st_dev, stat_result.st_ino) in own:
+                            continue
+                        if algorithm is not None:
+                            digest = get_file_hash(entry.path, algorithm)
+                    writer.add(ManifestEntry.from_stat(relative, stat_result, digest))
+        return writer.summary()
+
+
+def read_manifest(path):
+    """Shortcut: iterate the entries of a manifest file"""
+    with ManifestReader(path) as reader:
+        yield from reader
+
+
+def run_manifest_dir(root_dir):
+    """Folder holding the manifests taken before organize runs"""
+    return Path(root_dir) / INDEX_DIR_NAME / RUN_MANIFEST_DIR_NAME
+
+
+def find_run_manifest(root_dir, run_id):
+    """Path of the manifest taken before run run_id, or None if it has none"""
+    directory = run_manifest_dir(root_dir)
+    for suffix in COMPRESSION_SUFFIXES.values():
+        path = directory / f"{run_id}.jsonl{suffix}"
+        if path.exists():
+            return path
+    return None
+
+
+def changed_files(path, root_dir, skip=()):
+    """Yield the relative paths of files in a manifest that are missing or differ below root_dir now
+
+    A file differs when its size or modification time changed. Entries
+    below the folders in skip are not checked.
+    """
+    skip = tuple(folder.rstrip('/') + '/' for folder in skip)
+    with ManifestReader(path) as reader:
+        for entry in reader:
+            if entry.type != FILE or entry.path.startswith(skip):
+                continue
+            try:
+                stat_result = os.lstat(Path(root_dir) / entry.path)
+            except OSError:
+                yield entry.path
+                continue
+            if stat_result.st_size != entry.size or stat_result.st_mtime_ns != entry.mtime_ns:
+                yield entry.path
+
+
+def _file_key(path):
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    return stat_result.st_dev, stat_result.st_ino
+
+
+def _open_write(path, compression):
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+    if compression == 'zstd':
+        import zstandard
+        raw = open(path, 'wb')
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw, closefd=True), encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def _open_read(path):
+    with open(path, 'rb') as probe:
+        magic = probe.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if magic.startswith(ZSTD_MAGIC):
+        import zstandard
+        raw = open(path, 'rb')
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
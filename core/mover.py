@@ -0,0 +1,264 @@
+"""
+Move engine for Digital Janitor Pro
+Renames within a filesystem, streams a copy across filesystems
+"""
+import errno
+import os
+import shutil
+import stat
+import sys
+import time
+from pathlib import Path
+
+# Bytes handed to one copy_file_range/sendfile call
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Suffix of the partial copy written next to the destination
+TEMP_SUFFIX = '.janitor-part'
+
+# Seconds between two progress callbacks for the same move
+PROGRESS_INTERVAL = 0.5
+
+# Move methods reported by MoveEngine.move()
+RENAMED = 'rename'
+COPIED = 'copy'
+
+
+class MoveProgress:
+    """Progress of one cross-device move, passed to the progress callback"""
+    __slots__ = ('source', 'destination', 'total_bytes', 'copied_bytes', 'started', 'done')
+
+    def __init__(self, source, destination, total_bytes):
+        self.source = source
+        self.destination = destination
+        self.total_bytes = total_bytes
+        self.copied_bytes = 0
+        self.started = time.monotonic()
+        self.done = False
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def bytes_per_second(self):
+        elapsed = self.elapsed
+        return self.copied_bytes / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def fraction(self):
+        return self.copied_bytes / self.total_bytes if self.total_bytes else 1.0
+
+
+class MoveEngine:
+    """Moves files and folders, choosing rename or copy from st_dev
+
+    A move within one filesystem is a single os.rename. A move to another
+    filesystem copies the data in large chunks with os.copy_file_range
+    (or os.sendfile, or plain reads where neither is available) into a
+    temp file beside the destination, fsyncs it, renames it into place and
+    only then removes the source. An interrupted copy never leaves a
+    half-written file under the final name, and the source stays intact.
+
+    Device numbers of destination directories are cached, so a run stats
+    each destination folder once.
+    """
+
+    def __init__(self, chunk_size=COPY_CHUNK_SIZE, bandwidth_limit=None, progress=None):
+        """
+        bandwidth_limit - maximum bytes per second for cross-device copies (None = unlimited)
+        progress        - callable(MoveProgress) called while a cross-device copy runs
+        """
+        self.chunk_size = chunk_size
+        self.bandwidth_limit = bandwidth_limit or None
+        self.progress = progress
+        self.device_cache = {}
+        self.renamed = 0
+        self.copied = 0
+        self.copied_bytes = 0
+        self.copy_seconds = 0.0
+
+    @classmethod
+    def from_config(cls, config, progress=None):
+        """Build an engine from the 'transfer' config section"""
+        transfer = config.get('transfer', {})
+        limit_mb = transfer.get('bandwidth_limit_mb') or 0
+        if progress is None and transfer.get('progress', True):
+            progress = print_progress
+        return cls(chunk_size=int(transfer.get('chunk_mb', 8) * 1024 * 1024),
+                   bandwidth_limit=int(limit_mb * 1024 * 1024) or None,
+                   progress=progress)
+
+    def _device_of(self, directory):
+        device = self.device_cache.get(directory)
+        if device is None:
+            device = self.device_cache[directory] = os.stat(directory).st_dev
+        return device
+
+    def move(self, source, destination, source_dev=None):
+        """Move source to destination and return RENAMED or COPIED
+
+        source_dev is the source's st_dev when already known (FileRecord.dev),
+        saving a stat. The destination's parent directory must exist.
+        """
+        source = Path(source)
+        destination = Path(destination)
+        if source_dev is None:
+            source_dev = os.lstat(source).st_dev
+
+        if source_dev == self._device_of(destination.parent):
+            try:
+                os.rename(source, destination)
+                self.renamed += 1
+                return RENAMED
+            except OSError as e:
+                # Bind mounts and some union filesystems share st_dev but refuse renames
+                if e.errno != errno.EXDEV:
+                    raise
+
+        started = time.monotonic()
+        source_stat = os.lstat(source)
+        if stat.S_ISDIR(source_stat.st_mode):
+            self._copy_tree(source, destination)
+            shutil.rmtree(source)
+        else:
+            self._copy_entry(source, destination, source_stat)
+            os.unlink(source)
+        self.copied += 1
+        self.copy_seconds += time.monotonic() - started
+        return COPIED
+
+    def copy(self, source, destination):
+        """Copy a file to destination through a temp name, leaving the source in place"""
+        source = Path(source)
+        destination = Path(destination)
+        self._copy_entry(source, destination, os.lstat(source))
+
+    def _copy_tree(self, source, destination):
+        """Copy a folder into a temp folder beside destination, then rename it into place"""
+        temp = _temp_path(destination)
+        try:
+            stack = [(source, temp)]
+            while stack:
+                source_dir, target_dir = stack.pop()
+                os.mkdir(target_dir)
+                with os.scandir(source_dir) as entries:
+                    for entry in entries:
+                        target = Path(target_dir) / entry.name
+                        entry_stat = entry.stat(follow_symlinks=False)
+                        if stat.S_ISDIR(entry_stat.st_mode):
+                            stack.append((entry.path, target))
+                        else:
+                            self._write_entry(entry.path, target, entry_stat)
+            _copy_directory_times(source, temp)
+            os.rename(temp, destination)
+        except BaseException:
+            shutil.rmtree(temp, ignore_errors=True)
+            raise
+
+    def _copy_entry(self, source, destination, source_stat):
+        """Copy one file or symlink through a temp name beside destination"""
+        temp = _temp_path(destination)
+        try:
+            self._write_entry(source, temp, source_stat)
+            os.rename(temp, destination)
+        except BaseException:
+            try:
+                os.unlink(temp)
+            except OSError:
+                pass
+            raise
+
+    def _write_entry(self, source, target, source_stat):
+        if stat.S_ISLNK(source_stat.st_mode):
+            os.symlink(os.readlink(source), target)
+            return
+        with open(source, 'rb') as src, open(target, 'wb') as dst:
+            progress = MoveProgress(source, target, source_stat.st_size)
+            self._copy_data(src.fileno(), dst.fileno(), source_stat.st_size, progress)
+            shutil.copystat(source, target)
+            os.fsync(dst.fileno())
+
+    def _copy_data(self, in_fd, out_fd, size, progress):
+        """Copy size bytes between descriptors with the fastest available call"""
+        copy = _kernel_copy
+        last_report = progress.started
+        offset = 0
+        while offset < size:
+            count = min(self.chunk_size, size - offset)
+            try:
+                written = copy(in_fd, out_fd, offset, count)
+            except OSError as e:
+                if copy is _read_write_copy or e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL,
+                                                                errno.EOPNOTSUPP, errno.EBADF):
+                    raise
+                # The kernel cannot copy between these filesystems, fall back to reads
+                copy = _read_write_copy
+                continue
+            if not written:
+                break
+            offset += written
+            progress.copied_bytes = offset
+            self.copied_bytes += written
+
+            if self.bandwidth_limit:
+                ahead = offset / self.bandwidth_limit - progress.elapsed
+                if ahead > 0:
+                    time.sleep(ahead)
+            if self.progress is not None and time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                last_report = time.monotonic()
+                self.progress(progress)
+
+        if self.progress is not None and last_report != progress.started:
+            progress.done = True
+            self.progress(progress)
+
+    @property
+    def bytes_per_second(self):
+        """Average cross-device copy throughput of this run"""
+        return self.copied_bytes / self.copy_seconds if self.copy_seconds > 0 else 0.0
+
+
+def _temp_path(destination):
+    return destination.with_name(f".{destination.name}{TEMP_SUFFIX}")
+
+
+def _copy_directory_times(source, target):
+    try:
+        shutil.copystat(source, target)
+    except OSError:
+        pass
+
+
+def _copy_file_range(in_fd, out_fd, offset, count):
+    return os.copy_file_range(in_fd, out_fd, count, offset, offset)
+
+
+def _sendfile(in_fd, out_fd, offset, count):
+    return os.sendfile(out_fd, in_fd, offset, count)
+
+
+def _read_write_copy(in_fd, out_fd, offset, count):
+    data = os.pread(in_fd, count, offset)
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(out_fd, view, offset)
+        view = view[written:]
+        offset += written
+    return len(data)
+
+
+if hasattr(os, 'copy_file_range'):
+    _kernel_copy = _copy_file_range
+elif hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+    _kernel_copy = _sendfile
+else:
+    _kernel_copy = _read_write_copy
+
+
+def print_progress(progress):
+    """Default progress callback: one updating line per cross-device copy"""
+    mb_per_second = progress.bytes_per_second / (1024 * 1024)
+    line = (f"\rCopying {Path(progress.source).name}: {progress.fraction:.0%} "
+            f"({mb_per_second:.1f}MB/s)")
+    print(line, end="\n" if progress.done else "", flush=True)
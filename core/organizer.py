@@ -2,29 +2,86 @@
 Main organization logic for Digital Janitor Pro
 PURE DATE-FIRST ORGANIZATION: Year/Month/Type structure
 """
-import shutil
+import os
+import stat
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from utils.logger import write_to_log
-from core.file_operations import get_file_size_mb, get_file_hash
+from utils.logger import JanitorLogger, LOG_FILE_NAME, JSON_LOG_FILE_NAME
+from utils.metrics import Metrics
+from core.file_operations import FileRecord, resolve_hash_algorithm, create_backup_manifest
+from core.duplicates import DuplicateFinder
+from core.hash_index import HashIndex
+from core.scanner import TreeScanner, iter_batches
+from core.mover import MoveEngine, COPIED, TEMP_SUFFIX
+from core.journal import Journal
+from core.rules import RuleSet
+from core.sniffer import ContentSniffer, SNIFF_BYTES, SNIFF_MODES
+from core.checkpoint import (Checkpoint, is_unfinished, DEFAULT_CHECKPOINT_INTERVAL,
+                              RUNNING, INTERRUPTED, COMPLETE)
+from core.reclaim import SpaceReclaimer, LINKED, DELETED
+from core.verify import ExpectedFiles, DIRECTORY
+from core.tiering import MonthIndex
+from core.manifest import MANIFEST_COMPRESSIONS, run_manifest_dir
+from core.planner import (MovePlan, Operation, PlanExecutor, folder_size,
+                          MOVE_FILE, MOVE_DUPLICATE, MOVE_FOLDER, DELETE_FOLDER)
 
 
 class FileOrganizer:
-    """Main class that handles file organization logic"""
+    """Main class that handles file organization logic
 
-    def __init__(self, root_dir, config, log_file):
+    Every batch of files is first turned into a MovePlan (all decisions,
+    including duplicate numbering and name clashes, are made there) and
+    then applied by a PlanExecutor. A dry run only builds the plans.
+    Counters and per-phase timings of the run are collected in metrics.
+
+    pool is an optional ThreadPoolExecutor shared with other organizers
+    (see core.batch); stat calls, hashing and sniffing then run in it
+    instead of in a pool of features.workers threads per step.
+    """
+
+    def __init__(self, root_dir, config, logger, pool=None):
         self.root_dir = Path(root_dir)
         self.config = config
-        self.log_file = log_file
-        self.file_hashes = {}
+        self.pool = pool
+        # Accept a plain log file path for scripts that don't build a logger
+        if not isinstance(logger, JanitorLogger):
+            logger = JanitorLogger(logger)
+        self.logger = logger
+        self.log_file = logger.path
         self.duplicate_count = 0
+        self.hash_index = None
+        self.expected = None
+        self.months = None
+        self.record_hashes = config.get('verify', {}).get('record_hashes', False)
+        self.dir_names = {}
+        self.dry_run = False
+        self.skipped = []
+        self.resumed_errors = []
+        self.operations_done = 0
+        self.checkpoint = None
+        self.metrics = Metrics()
+        self.duplicate_finder = DuplicateFinder(metrics=self.metrics)
+        self.rules = RuleSet.from_config(config)
+        self.delete_temp_folders = config.get('features', {}).get('delete_temp_folder', True)
+        self.sniff_mode = config.get('features', {}).get('content_sniffing', 'unknown')
+        if self.sniff_mode not in SNIFF_MODES:
+            raise ValueError(f"Unknown content sniffing mode: {self.sniff_mode}")
+        self.sniffer = ContentSniffer()
+        self.backup_manifest = config.get('features', {}).get('backup_manifest', 'off')
+        if self.backup_manifest not in ('off',) + MANIFEST_COMPRESSIONS:
+            raise ValueError(f"Unknown backup manifest compression: {self.backup_manifest}")
+        self.mover = MoveEngine.from_config(config)
+        self.reclaimer = SpaceReclaimer.from_config(config, self.mover, self.metrics, self.logger)
+        self.executor = PlanExecutor(self.root_dir, self.logger, on_applied=self._on_applied,
+                                     mover=self.mover, metrics=self.metrics, reclaimer=self.reclaimer)
+        self._pending_operations = []
 
         # NO pre-created structure - everything is dynamic based on file dates!
 
-    def _get_date_structure_for_file(self, file_path):
-        """Get year/month structure for file based on its date"""
-        # Get file modification time
-        mod_time = datetime.datetime.fromtimestamp(file_path.stat().st_mtime)
+    def _get_date_structure_for_file(self, mtime):
+        """Get year/month structure for a file or folder modification time"""
+        mod_time = datetime.datetime.fromtimestamp(mtime)
         year = str(mod_time.year)
         month = f"{mod_time.month:02d}"  # 01, 02, 03... 12
 
@@ -33,147 +90,624 @@ class FileOrganizer:
 
         return date_base, year, month
 
-    def _create_type_directories_in_month(self, month_dir):
-        """Create all type subdirectories within a month directory"""
-        type_dirs = {
-            'text_files': month_dir / 'text_files',
-            'csv_files': month_dir / 'csv_files',
-            'images': month_dir / 'images',
-            'documents': month_dir / 'documents',
-            'media': month_dir / 'media',
-            'code': month_dir / 'code',
-            'large_files': month_dir / 'large_files',
-            'huge_files': month_dir / 'huge_files',
-            'empty_files': month_dir / 'empty_files',
-            'duplicates': month_dir / 'duplicates',
-            'folders': month_dir / 'folders',
-            'other_files': month_dir / 'other_files'
-        }
-
-        # Create month directory first
-        month_dir.mkdir(parents=True, exist_ok=True)
-
-        # Create type directories on demand
-        for dir_path in type_dirs.values():
-            dir_path.mkdir(exist_ok=True)
-
-        return type_dirs
-
-    def organize_files(self):
-        """Main method to organize all files"""
-        write_to_log("Starting DATE-FIRST organization (Year/Month/Type)...", self.log_file)
-
-        large_threshold = self.config['size_thresholds']['large_mb']
-        huge_threshold = self.config['size_thresholds']['huge_mb']
-
-        for item in self.root_dir.iterdir():
-            # Skip already organized year directories
-            if item.is_dir() and item.name.isdigit() and len(item.name) == 4:
-                continue
-            # Skip system files AND Python cache
-            elif (item.name.startswith('.janitor') or
-                  item.name == 'digital_janitor_log.txt' or
-                  item.name == 'janitor_config.json' or
-                  item.name.startswith('restore_') or
-                  item.name == '__pycache__'):
-                continue
-            elif item.is_file():
-                self._process_file(item, large_threshold, huge_threshold)
-            elif item.is_dir() and 'temp' in item.name:
-                self._delete_temp_folder(item)
-            elif item.is_dir():
-                self._move_folder(item)
+    def _free_destination(self, directory, name):
+        """Return a path in directory that does not clash with an existing entry
+
+        Names are tracked per destination directory (listed once, the first
+        time it is used), so no per-file existence check is needed. A clash
+        gets a _1, _2, ... suffix instead of overwriting the existing file.
+        """
+        names = self.dir_names.get(directory)
+        if names is None:
+            self.metrics.count('dir_listings')
+            try:
+                names = set(os.listdir(directory))
+            except (FileNotFoundError, NotADirectoryError):
+                # Created when the plan is applied (or reported then, if it cannot be)
+                names = set()
+            self.dir_names[directory] = names
+
+        if name in names:
+            stem, suffix = os.path.splitext(name)
+            counter = 1
+            while f"{stem}_{counter}{suffix}" in names:
+                counter += 1
+            name = f"{stem}_{counter}{suffix}"
+
+        names.add(name)
+        return directory / name
+
+    def organize_files(self, resume=False):
+        """Main method to organize all files
+
+        Progress is checkpointed every features.checkpoint_interval seconds.
+        With resume=True the counters and errors of an interrupted run are
+        picked up again; files it already moved are gone from the scan and
+        digests it computed come from the hash index, so only the remaining
+        work is done.
+        """
+        self.begin_run(resume)
+        status = INTERRUPTED
+        try:
+            for plan in self._iter_plans():
+                self.executor.execute(plan)
+            status = COMPLETE
+        finally:
+            self.finish_run(status)
+        self.log_summary()
+
+    def begin_run(self, resume=False):
+        """Open the hash index, checkpoint and journal of a run
+
+        With features.backup_manifest the tree is recorded as it is before
+        anything moves, so a restore can check it got back to that state.
+        """
+        self.logger.log("Starting DATE-FIRST organization (Year/Month/Type)...")
+        self.metrics.start()
+        self._open_hash_index()
+        self.expected = ExpectedFiles(self.root_dir, self.duplicate_finder.algorithm)
+        self._open_month_index()
+        self._start_checkpointing(resume)
+        self.executor.journal = Journal(self.root_dir)
+        if self.backup_manifest != 'off':
+            self._write_run_manifest()
+
+    def _write_run_manifest(self):
+        """Record the tree in .janitor/manifests/<run id>.jsonl.gz before the run changes it"""
+        directory = run_manifest_dir(self.root_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self.metrics.phase('scan'):
+            path = create_backup_manifest(self.root_dir, directory, self.backup_manifest,
+                                          name=f"{self.executor.journal.run_id}.jsonl", skip=_is_system_name)
+        self.logger.log(f"Manifest of the tree before this run: {path.relative_to(self.root_dir)}")
+
+    def finish_run(self, status):
+        """Save the final checkpoint and close what begin_run opened"""
+        self._save_checkpoint(status)
+        self.executor.journal.close()
+        self.hash_index.close()
+        self.expected.close()
+        self.months.close()
+        self.metrics.stop()
+
+    def log_summary(self):
+        """Log the errors and statistics of a finished run"""
+        errors = self.error_report()
+        if errors:
+            self.logger.log(f"{len(errors)} files could not be organized (see FAILED/SKIPPED entries)")
 
         # Log final statistics
-        write_to_log(f"DATE-FIRST organization complete. Found {self.duplicate_count} duplicates", self.log_file)
-
-    def _process_file(self, file_path, large_threshold, huge_threshold):
-        """Process a single file - organize by date then type"""
-
-        # Get file hash for duplicate detection
-        file_hash = get_file_hash(file_path)
-        if file_hash is None:
-            write_to_log(f"SKIPPED file (hash error): {file_path.name}", self.log_file)
-            return
+        if self.mover.copied:
+            rate = self.mover.bytes_per_second / (1024 * 1024)
+            self.logger.log(f"Cross-device moves: {self.mover.copied} "
+                            f"({self.mover.copied_bytes / (1024 * 1024):.1f}MB at {rate:.1f}MB/s)")
+        self.logger.log(f"DATE-FIRST organization complete. Found {self.duplicate_count} duplicates")
+        for line in self.metrics.summary_lines():
+            self.logger.log(line)
+
+    def _start_checkpointing(self, resume):
+        features = self.config.get('features', {})
+        state = Checkpoint.load(self.root_dir)
+        if resume and is_unfinished(state):
+            self.duplicate_count = state.get('duplicate_count', 0)
+            self.resumed_errors = [tuple(error) for error in state.get('errors', [])]
+            self.logger.log(f"Resuming interrupted run from checkpoint saved {state.get('saved')} "
+                            f"({state.get('operations_done', 0)} operations were done)")
+        elif resume:
+            self.logger.log("No interrupted run to resume, starting a new run")
+        elif is_unfinished(state):
+            print("The previous run did not finish; use --resume to continue its numbering and state.")
+
+        self.checkpoint = Checkpoint(self.root_dir, features.get('checkpoint_interval', DEFAULT_CHECKPOINT_INTERVAL))
+        self.executor.checkpoint = self._checkpoint_if_due
+
+    def _checkpoint_if_due(self):
+        if self.checkpoint.due():
+            self._save_checkpoint(RUNNING)
+
+    def _save_checkpoint(self, status):
+        """Commit the hash index and save the run state"""
+        with self.metrics.phase('index'):
+            self.hash_index.commit()
+        with self.metrics.phase('expected'):
+            self.expected.commit()
+        with self.metrics.phase('months'):
+            self.months.commit()
+        with self.metrics.phase('log'):
+            self.logger.flush()
+        with self.metrics.phase('checkpoint'):
+            self.checkpoint.save({
+                'operations_done': self.operations_done,
+                'duplicate_count': self.duplicate_count,
+                'errors': self.error_report(),
+            }, status)
+
+    def error_report(self):
+        """(file, reason) pairs for everything skipped or failed in this run
+
+        A resumed run also reports the errors of the run it continues,
+        except for files it tried again: those it reported anew, and failed
+        files that are gone because they were organized this time.
+        """
+        failed = [(str(op.source), str(error)) for op, error in self.executor.errors]
+        current = self.skipped + failed
+        retried = {name for name, _ in current}
+        earlier = [(name, reason) for name, reason in self.resumed_errors
+                   if name not in retried and (not os.path.isabs(name) or os.path.lexists(name))]
+        return earlier + current
+
+    def watch_files(self, watcher, debounce=1.0, batch_delay=1.0, batch_size=500, stop=None):
+        """Organize what is already there, then file new arrivals as the watcher reports them
+
+        Only the files a watcher reports are stat'd and hashed; earlier
+        arrivals are matched as duplicates through the hash index. Runs
+        until stop (a threading.Event) is set or the user interrupts.
+        """
+        from core.watcher import iter_arrivals
+
+        self.logger.log("Starting DATE-FIRST organization in watch mode...")
+        self.metrics.start()
+        self._open_hash_index()
+        self.expected = ExpectedFiles(self.root_dir, self.duplicate_finder.algorithm)
+        self._open_month_index()
+        self.executor.journal = Journal(self.root_dir)
+        try:
+            for plan in self._iter_plans():
+                self.executor.execute(plan)
+            self.logger.flush()
+
+            for paths in iter_arrivals(watcher, debounce, batch_delay, batch_size, stop):
+                plan = MovePlan(self.root_dir)
+                with self.metrics.phase('scan'):
+                    records = self._stat_paths(paths)
+                self.plan_batch(records, plan)
+                self.executor.execute(plan)
+                self.end_batch()
+                if len(plan):
+                    self.logger.log(f"Watch batch: {len(plan)} new files organized")
+                self.logger.flush()
+        except KeyboardInterrupt:
+            self.logger.log("Watch mode stopped by user")
+        finally:
+            watcher.close()
+            self.executor.journal.close()
+            self.hash_index.close()
+            self.expected.close()
+            self.months.close()
+            self.metrics.stop()
+
+        self.logger.log(f"DATE-FIRST organization complete. Found {self.duplicate_count} duplicates")
+        for line in self.metrics.summary_lines():
+            self.logger.log(line)
+
+    def create_watcher(self):
+        """Watcher for the root directory, configured from the 'watch' and 'scan' sections"""
+        from core.watcher import create_watcher
+
+        scan = self.config.get('scan', {})
+        watch = self.config.get('watch', {})
+        return create_watcher(self.root_dir,
+                              backend=watch.get('backend', 'auto'),
+                              recursive=scan.get('recursive', False),
+                              max_depth=scan.get('max_depth'),
+                              enter_directory=self._watch_directory,
+                              poll_interval=watch.get('poll_interval', 2.0))
+
+    def plan_files(self):
+        """Dry run: yield the MovePlan of every batch without touching the disk
+
+        An existing hash index is read but never written, and no directory
+        is created. Folder sizes are measured so plans report the bytes
+        a real run would move.
+        """
+        self.dry_run = True
+        features = self.config.get('features', {})
+        algorithm = resolve_hash_algorithm(features.get('hash_algorithm'))
+        self.hash_index = HashIndex.open_existing(self.root_dir, algorithm)
+        self.duplicate_finder = self._new_duplicate_finder(algorithm)
+        try:
+            for plan in self._iter_plans():
+                yield plan
+        finally:
+            if self.hash_index is not None:
+                self.hash_index.close()
+            self.dry_run = False
+
+    def _iter_plans(self):
+        for plan, records in self.scan_batches():
+            self.plan_batch(records, plan)
+            yield plan
+            self.end_batch()
+
+    def scan_batches(self):
+        """Yield (plan, records) per batch: a plan holding the batch's folder
+        operations and the FileRecords still to be planned into it"""
+        if self.config.get('scan', {}).get('recursive', False):
+            return self._scan_recursive()
+        return self._scan_root()
+
+    def _is_year_directory(self, item):
+        """Check if a path or scandir entry is an already organized year directory"""
+        return item.name.isdigit() and len(item.name) == 4 and item.is_dir()
+
+    def _is_system_entry(self, entry):
+        """Check if a root-level entry is organized output or belongs to the janitor itself"""
+        # Skip already organized year directories
+        if self._is_year_directory(entry):
+            return True
+        return _is_system_name(entry.name)
+
+    def _open_hash_index(self):
+        """Load the persistent hash index, seeding it from the existing tree on first use"""
+        features = self.config.get('features', {})
+        algorithm = resolve_hash_algorithm(features.get('hash_algorithm'))
+        self.hash_index = HashIndex(self.root_dir, algorithm)
+        if self.hash_index.is_new:
+            year_dirs = [item for item in self.root_dir.iterdir() if self._is_year_directory(item)]
+            seeded = self.hash_index.seed(year_dirs)
+            self.logger.log(f"Hash index created, {seeded} organized files indexed")
+        self.duplicate_finder = self._new_duplicate_finder(algorithm)
+
+    def _open_month_index(self):
+        """Load the per-month counts, counting the existing tree on first use"""
+        self.months = MonthIndex(self.root_dir)
+        if self.months.is_new:
+            with self.metrics.phase('months'):
+                counted = self.months.rebuild()
+            if counted:
+                self.logger.log(f"Month index created, {counted} organized files counted")
+
+    def _new_duplicate_finder(self, algorithm):
+        """Duplicate finder over the hash index; keeps file heads for sniffing when it is on"""
+        return DuplicateFinder(self.hash_index, workers=self.config.get('features', {}).get('workers', 1),
+                               algorithm=algorithm,
+                               head_bytes=SNIFF_BYTES if self.sniff_mode != 'off' else 0,
+                               metrics=self.metrics, pool=self.pool)
+
+    def _scan_root(self):
+        """Scan the top-level entries of the root directory
+
+        Files are planned in batches of scan.batch_size, like the recursive
+        scan, so hashing progress is committed as the run goes.
+        """
+        plan = MovePlan(self.root_dir)
+        file_entries = []
+        with self.metrics.phase('scan'), os.scandir(self.root_dir) as entries:
+            for entry in entries:
+                if self._is_system_entry(entry):
+                    continue
+                elif entry.is_file():
+                    file_entries.append(entry)
+                elif entry.is_dir() and self._is_temp_folder(entry.name):
+                    plan.add(self._plan_temp_folder_delete(Path(entry.path)))
+                elif entry.is_dir():
+                    self.metrics.count('stat_calls')
+                    plan.add(self._plan_folder_move(Path(entry.path), entry.stat().st_mtime))
+
+        for batch in iter_batches(file_entries, self.config.get('scan', {}).get('batch_size', 5000)):
+            with self.metrics.phase('scan'):
+                records = self._stat_entries(batch)
+            yield plan, records
+            plan = MovePlan(self.root_dir)
+        if len(plan):
+            yield plan, []
+
+    def _scan_recursive(self):
+        """Scan every file in the tree below the root directory, one batch at a time
+
+        Files are streamed from the scanner and handled in bounded batches;
+        directories stay in place (temp folders in the root are still deleted).
+        Files from earlier batches are matched as duplicates through the
+        hash index they are recorded in once moved.
+        """
+        scan = self.config.get('scan', {})
+        scanner = TreeScanner(self.root_dir,
+                              max_depth=scan.get('max_depth'),
+                              exclude=scan.get('exclude', ()),
+                              symlinks=scan.get('symlinks', 'skip'),
+                              skip_entry=self._skip_in_tree,
+                              enter_directory=self._enter_directory)
+
+        batches = iter_batches(scanner.iter_files(), scan.get('batch_size', 5000))
+        for batch in self.metrics.timed('scan', batches):
+            plan = self._take_pending_plan()
+            with self.metrics.phase('scan'):
+                records = self._stat_entries(batch)
+            yield plan, records
+
+        if self._pending_operations:
+            yield self._take_pending_plan(), []
+
+    def end_batch(self):
+        """Drop the finished batch's state and make its digests durable"""
+        self.duplicate_finder.clear()
+        if not self.dry_run:
+            with self.metrics.phase('index'):
+                self.hash_index.commit()
+            with self.metrics.phase('expected'):
+                self.expected.commit()
+            with self.metrics.phase('months'):
+                self.months.commit()
+
+    def _take_pending_plan(self):
+        """Start a plan holding the operations queued while scanning"""
+        plan = MovePlan(self.root_dir)
+        plan.extend(self._pending_operations)
+        self._pending_operations = []
+        return plan
+
+    def _skip_in_tree(self, entry, depth):
+        """Entries the recursive scan never looks at"""
+        if depth == 0 and self._is_system_entry(entry):
+            return True
+        return entry.name.startswith('.janitor') or entry.name == '__pycache__'
+
+    def _is_temp_folder(self, name):
+        """Root-level folders that are deleted instead of organized (features.delete_temp_folder)"""
+        return self.delete_temp_folders and 'temp' in name
+
+    def _enter_directory(self, entry, depth):
+        """Plan deleting temp folders in the root instead of descending into them
+
+        Deeper folders are always descended into, whatever their name
+        (templates/, attempts/ ...).
+        """
+        if depth == 0 and self._is_temp_folder(entry.name):
+            self._pending_operations.append(self._plan_temp_folder_delete(Path(entry.path)))
+            return False
+        return True
+
+    def _watch_directory(self, path, depth):
+        """Sub-directories watch mode listens in (never output, janitor or temp folders)"""
+        name = os.path.basename(path)
+        if depth == 0 and (_is_system_name(name) or (name.isdigit() and len(name) == 4)):
+            return False
+        if depth == 0 and self._is_temp_folder(name):
+            return False
+        return not (name.startswith('.janitor') or name == '__pycache__')
+
+    def _stat_paths(self, paths):
+        """FileRecords for the reported paths that are still files the janitor should organize"""
+        follow_links = self.config.get('scan', {}).get('symlinks', 'skip') != 'skip'
+        records = []
+        for path in paths:
+            relative = os.path.relpath(path, self.root_dir)
+            if _is_system_name(relative.split(os.sep, 1)[0]) or relative.endswith(TEMP_SUFFIX):
+                continue
+            self.metrics.count('stat_calls')
+            try:
+                file_stat = os.lstat(path)
+                if stat.S_ISLNK(file_stat.st_mode) and follow_links:
+                    self.metrics.count('stat_calls')
+                    file_stat = os.stat(path)
+            except FileNotFoundError:
+                # Already moved by an earlier batch or deleted again
+                continue
+            except OSError:
+                self._log_skip(f"SKIPPED file (stat error): {os.path.basename(path)}", os.path.basename(path))
+                continue
+            if stat.S_ISREG(file_stat.st_mode):
+                records.append(FileRecord(path, file_stat))
+        self.metrics.count('files_scanned', len(records))
+        return records
+
+    def plan_batch(self, records, plan, duplicates=None):
+        """Detect duplicates within a batch of FileRecords and plan their moves in order
+
+        duplicates ({path: original}) is passed in when the caller already
+        looked for duplicates across several roots at once.
+        """
+        # Only files whose size collides with another file get read; hashing
+        # may run in a pool, names and numbering are fixed here in scan order
+        if duplicates is None:
+            with self.metrics.phase('hash'):
+                duplicates = self.duplicate_finder.find_duplicates(records)
+        if self.record_hashes and not self.dry_run:
+            # Digests for verify --full; files hashed for duplicates are not read again
+            with self.metrics.phase('hash'):
+                self.duplicate_finder.hash_files(records)
+        with self.metrics.phase('classify'):
+            rules = self._classify_contents(records, duplicates)
+            for record in records:
+                operation = self._plan_file(record, duplicates.get(record.path), rules.get(record.path))
+                if operation is None:
+                    continue
+                plan.add(operation)
+                if self.dry_run and operation.action == MOVE_FILE:
+                    # Nothing reaches the index in a dry run, so later batches
+                    # need to be told about this file directly
+                    self.duplicate_finder.remember(record)
+
+    def _classify_contents(self, records, duplicates):
+        """Classify the files whose content classification should look into
+
+        In 'unknown' mode only files no rule matches by name are sniffed,
+        in 'all' mode every file is and its content wins over its name.
+        Heads read for the partial hash are reused; other files get one
+        small read of their first bytes.
+        Returns {path: Rule} for every file already classified here (by
+        name in 'unknown' mode, or by content), so none is classified twice.
+        """
+        if self.sniff_mode == 'off':
+            return {}
+        rules = {}
+        needed = []
+        for record in records:
+            if record.path in duplicates or record.path in self.duplicate_finder.unreadable:
+                continue
+            if self.sniff_mode == 'unknown':
+                rule = self.rules.classify(record)
+                rules[record.path] = rule
+                if rule is not self.rules.fallback:
+                    continue
+            needed.append(record)
+
+        heads = self.duplicate_finder.heads
+        reads = self.sniffer.reads
+        results = self._map(lambda record: self.sniffer.sniff(record, heads.get(record.path)), needed)
+        self.metrics.count('files_sniffed', self.sniffer.reads - reads)
+        for record, content_type in zip(needed, results):
+            if content_type is not None:
+                rules[record.path] = self.rules.classify(record, *content_type)
+        return rules
+
+    def _stat_entries(self, entries):
+        """Build one FileRecord per scanned file, stat'ing in parallel when workers > 1"""
+        results = self._map(_record_or_error, entries)
+
+        records = []
+        for entry, result in zip(entries, results):
+            if isinstance(result, OSError):
+                self._log_skip(f"SKIPPED file (stat error): {entry.name}", entry.name)
+                continue
+            records.append(result)
+        self.metrics.count('stat_calls', len(entries))
+        self.metrics.count('files_scanned', len(records))
+        return records
+
+    def _map(self, func, items):
+        """func over items in order: in the shared pool, a pool of features.workers, or inline"""
+        if len(items) < 2:
+            return [func(item) for item in items]
+        if self.pool is not None:
+            return list(self.pool.map(func, items))
+        workers = self.config.get('features', {}).get('workers', 1)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(func, items))
+        return [func(item) for item in items]
+
+    def _log_skip(self, message, name):
+        if not self.dry_run:
+            self.skipped.append((name, message))
+            self.metrics.count('files_skipped')
+            self.logger.log(message, event="skipped", source=name)
+
+    def _plan_file(self, record, original=None, rule=None):
+        """Plan a single file - organize by date then type
+
+        original is the path of the file this one duplicates, if any;
+        rule is its classification, if it was already made.
+        Returns the Operation, or None when the file is skipped.
+        """
+        file_path = record.path
+        if file_path in self.duplicate_finder.unreadable:
+            self._log_skip(f"SKIPPED file (hash error): {file_path.name}", file_path.name)
+            return None
 
         # Get date structure for this file
-        month_dir, year, month = self._get_date_structure_for_file(file_path)
-
-        # Create type directories within this month
-        type_dirs = self._create_type_directories_in_month(month_dir)
+        month_dir, year, month = self._get_date_structure_for_file(record.mtime)
 
         # Check for duplicates
-        if file_hash in self.file_hashes:
-            self._move_duplicate_to_month(file_path, type_dirs['duplicates'], year, month)
-            return
-
-        # Add to hash tracker
-        self.file_hashes[file_hash] = str(file_path)
-
-        # Organize by size first, then by type
-        file_size = get_file_size_mb(file_path)
-
-        if file_size == 0:
-            self._move_file_to_month(file_path, type_dirs['empty_files'], "empty file", year, month)
-        elif file_size > huge_threshold:
-            self._move_file_to_month(file_path, type_dirs['huge_files'], f"huge file ({file_size:.1f}MB)", year, month)
-        elif file_size > large_threshold:
-            self._move_file_to_month(file_path, type_dirs['large_files'], f"large file ({file_size:.1f}MB)", year, month)
-        else:
-            self._organize_by_type_in_month(file_path, type_dirs, year, month)
-
-    def _move_duplicate_to_month(self, file_path, destination_dir, year, month):
-        """Handle duplicate file in month structure"""
+        if original is not None:
+            self.metrics.count('duplicates')
+            return self._plan_duplicate_move(record, month_dir / 'duplicates', original)
+
+        # Type folder from the configured rules (created lazily on move)
+        if rule is None:
+            rule = self.rules.classify(record)
+        self.metrics.count_category(rule.folder)
+        return self._plan_file_move(record, month_dir / rule.folder, rule.describe(record))
+
+    def _plan_duplicate_move(self, record, destination_dir, original):
+        """Plan moving a duplicate file into the month's duplicates folder
+
+        The destination is kept even when duplicates are linked or deleted:
+        links go there, and so does a duplicate that fails verification.
+        """
+        file_path = record.path
         self.duplicate_count += 1
         duplicate_name = f"{file_path.stem}_duplicate_{self.duplicate_count}{file_path.suffix}"
-        shutil.move(file_path, destination_dir / duplicate_name)
-
-        write_to_log(f"MOVED duplicate: {file_path.name} -> {year}/{month}/duplicates/{duplicate_name}", self.log_file)
-
-    def _organize_by_type_in_month(self, file_path, type_dirs, year, month):
-        """Organize file by type within month structure"""
-        suffix = file_path.suffix.lower()
-
-        if suffix == '.txt':
-            self._move_file_to_month(file_path, type_dirs['text_files'], ".txt file", year, month)
-        elif suffix == '.csv':
-            self._move_file_to_month(file_path, type_dirs['csv_files'], ".csv file", year, month)
-        elif suffix in ['.jpg', '.jpeg', '.png', '.gif', '.bmp']:
-            self._move_file_to_month(file_path, type_dirs['images'], "image", year, month)
-        elif suffix in ['.pdf', '.docx', '.xlsx', '.pptx', '.rtf']:
-            self._move_file_to_month(file_path, type_dirs['documents'], "document", year, month)
-        elif suffix in ['.mp4', '.avi', '.mp3', '.wav', '.mov']:
-            self._move_file_to_month(file_path, type_dirs['media'], "media", year, month)
-        elif suffix in ['.py', '.js', '.html', '.css', '.java']:
-            self._move_file_to_month(file_path, type_dirs['code'], "code file", year, month)
+        destination = self._free_destination(destination_dir, duplicate_name)
+        if self.reclaimer.reclaims:
+            # An original organized in this batch is linked to where it is going
+            original = self.duplicate_finder.planned.get(original, original)
         else:
-            self._move_file_to_month(file_path, type_dirs['other_files'], "other file", year, month)
-
-    def _move_file_to_month(self, file_path, destination_dir, file_type, year, month):
-        """Move file to month-based destination and log"""
-        shutil.move(file_path, destination_dir / file_path.name)
-
-        # Create readable path for logging
-        folder_name = destination_dir.name
-        write_to_log(f"MOVED {file_type}: {file_path.name} -> {year}/{month}/{folder_name}/", self.log_file)
-
-    def _delete_temp_folder(self, folder_path):
-        """Delete temporary folder"""
-        shutil.rmtree(folder_path)
-        write_to_log(f"DELETED temp folder: {folder_path.name}", self.log_file)
-
-    def _move_folder(self, folder_path):
-        """Move regular folder to appropriate month structure"""
-        # Get folder modification time
-        mod_time = datetime.datetime.fromtimestamp(folder_path.stat().st_mtime)
-        year = str(mod_time.year)
-        month = f"{mod_time.month:02d}"
-
-        # Create month structure
-        month_base = self.root_dir / year / month
-        folders_dir = month_base / 'folders'
-        folders_dir.mkdir(parents=True, exist_ok=True)
+            original = None
+        return Operation(MOVE_DUPLICATE, file_path, destination, record.size, "duplicate", record, original)
+
+    def _plan_file_move(self, record, destination_dir, file_type):
+        """Plan moving a file to its month-based destination"""
+        destination = self._free_destination(destination_dir, record.path.name)
+        if self.reclaimer.reclaims and record.path in self.duplicate_finder.partial_hashes:
+            self.duplicate_finder.planned[record.path] = destination
+        return Operation(MOVE_FILE, record.path, destination, record.size, file_type, record)
+
+    def _plan_temp_folder_delete(self, folder_path):
+        """Plan deleting a temporary folder"""
+        size = folder_size(folder_path) if self.dry_run else 0
+        return Operation(DELETE_FOLDER, folder_path, size=size, label="temp folder")
+
+    def _plan_folder_move(self, folder_path, mtime):
+        """Plan moving a regular folder to the appropriate month structure"""
+        month_base, year, month = self._get_date_structure_for_file(mtime)
+        destination = self._free_destination(month_base / 'folders', folder_path.name)
+        size = folder_size(folder_path) if self.dry_run else 0
+        return Operation(MOVE_FOLDER, folder_path, destination, size, "folder")
+
+    def _on_applied(self, operation):
+        """Keep the hash index, verify expectations and month counts in step with each applied operation"""
+        self.operations_done += 1
+        with self.metrics.phase('expected'):
+            self._expect(operation)
+        with self.metrics.phase('months'):
+            self._count(operation)
+        if operation.record is not None:
+            with self.metrics.phase('index'):
+                self._index_applied(operation, operation.record)
+
+    def _expect(self, operation):
+        """Record what an applied operation left in the tree, from the file as it was before the move"""
+        if operation.action == DELETE_FOLDER or operation.method == DELETED:
+            return
+        if operation.action == MOVE_FOLDER:
+            self.expected.add(operation.destination, kind=DIRECTORY)
+            return
+        record = operation.record
+        # A hard link shares its original's mtime, not the duplicate's
+        mtime_ns = None if operation.method == LINKED else record.mtime_ns
+        self.expected.add(operation.destination, record.size, mtime_ns,
+                          self.duplicate_finder.full_hashes.get(record.path))
+
+    def _count(self, operation):
+        """Add an applied move to its month's counts, which tiering decides from"""
+        if operation.action == DELETE_FOLDER or operation.method == DELETED:
+            return
+        record = operation.record
+        if record is None:
+            self.months.add(operation.destination, 0)
+        else:
+            self.months.add(operation.destination, record.size, record.mtime_ns)
 
-        # Move folder
-        shutil.move(folder_path, folders_dir / folder_path.name)
-        write_to_log(f"MOVED folder: {folder_path.name} -> {year}/{month}/folders/", self.log_file)
+    def _index_applied(self, operation, record):
+        if operation.action == MOVE_DUPLICATE:
+            # Duplicates are never used as originals for later arrivals
+            self.hash_index.forget(record.dev, record.inode)
+        else:
+            partial = self.duplicate_finder.partial_hashes.get(record.path)
+            digest = self.duplicate_finder.full_hashes.get(record.path)
+            if operation.method == COPIED:
+                # A copy across devices is a new inode; index it under its new identity
+                self.hash_index.forget(record.dev, record.inode)
+                self.metrics.count('stat_calls')
+                record = FileRecord.from_path(operation.destination)
+            # Remember an organized file so later runs can match duplicates against it
+            self.hash_index.store(record, operation.destination, partial, digest, organized=True)
+
+
+def _is_system_name(name):
+    """Names of root-level entries that belong to the janitor itself"""
+    # System files AND Python cache
+    return (name.startswith('.janitor') or
+            name in (LOG_FILE_NAME, JSON_LOG_FILE_NAME) or
+            name == 'janitor_config.json' or
+            name.startswith('restore_') or
+            name == '__pycache__')
+
+
+def _record_or_error(entry):
+    """FileRecord for a scandir entry, or the OSError raised by stat"""
+    try:
+        return FileRecord.from_entry(entry)
+    except OSError as e:
+        return e
@@ -0,0 +1,339 @@
+"""
+Move planning for Digital Janitor Pro
+Decisions are collected into a plan first, then applied by an executor
+"""
+import csv
+import json
+import os
+import shutil
+import sys
+from collections import Counter
+from pathlib import Path
+from core.mover import MoveEngine, RENAMED, COPIED
+from core.reclaim import SpaceReclaimer, LINKED, CLONED, DELETED
+from utils.metrics import Metrics
+
+# Operation actions
+MOVE_FILE = 'move'
+MOVE_DUPLICATE = 'duplicate'
+MOVE_FOLDER = 'move_folder'
+DELETE_FOLDER = 'delete_folder'
+
+PLAN_FORMATS = ('text', 'json', 'csv')
+PLAN_FIELDS = ('action', 'source', 'destination', 'size', 'label')
+
+
+class Operation:
+    """One planned change: move a file or folder, or delete a temp folder
+
+    A duplicate handled by a space-reclaiming policy also carries the
+    path its original will have once the plan is applied.
+    """
+    __slots__ = ('action', 'source', 'destination', 'size', 'label', 'record', 'method', 'original')
+
+    def __init__(self, action, source, destination=None, size=0, label='', record=None, original=None):
+        self.action = action
+        self.source = Path(source)
+        self.destination = Path(destination) if destination is not None else None
+        self.size = size
+        self.label = label
+        self.record = record
+        self.original = Path(original) if original is not None else None
+        # How the move was done once applied (core.mover.RENAMED or COPIED,
+        # or core.reclaim.LINKED, CLONED or DELETED for a duplicate)
+        self.method = None
+
+    def describe(self, root_dir):
+        """Log line for this operation, relative to the organized root"""
+        if self.action == DELETE_FOLDER:
+            return f"DELETED temp folder: {self.source.name}"
+
+        folder = self.destination.parent.relative_to(root_dir).as_posix()
+        if self.method == DELETED:
+            return f"DELETED duplicate: {self.source.name} (same as {_relative(self.original, root_dir)})"
+        if self.method in (LINKED, CLONED):
+            return (f"{'LINKED' if self.method == LINKED else 'CLONED'} duplicate: {self.source.name} -> "
+                    f"{folder}/{self.destination.name} (shares data with {_relative(self.original, root_dir)})")
+        if self.action == MOVE_DUPLICATE:
+            return f"MOVED duplicate: {self.source.name} -> {folder}/{self.destination.name}"
+        if self.action == MOVE_FOLDER:
+            return f"MOVED folder: {self.source.name} -> {folder}/"
+        return f"MOVED {self.label}: {self.source.name} -> {folder}/"
+
+    def to_dict(self, root_dir):
+        """Plain dict with root-relative paths, for JSON/CSV export"""
+        return {
+            'action': self.action,
+            'source': _relative(self.source, root_dir),
+            'destination': _relative(self.destination, root_dir) if self.destination else '',
+            'size': self.size,
+            'label': self.label,
+        }
+
+
+class MovePlan:
+    """Ordered list of operations plus running totals"""
+
+    def __init__(self, root_dir):
+        self.root_dir = Path(root_dir)
+        self.operations = []
+
+    def add(self, operation):
+        self.operations.append(operation)
+
+    def extend(self, operations):
+        self.operations.extend(operations)
+
+    def __iter__(self):
+        return iter(self.operations)
+
+    def __len__(self):
+        return len(self.operations)
+
+    @property
+    def total_bytes(self):
+        """Bytes that will be moved (deleted temp folders are not counted)"""
+        return sum(op.size for op in self.operations if op.action != DELETE_FOLDER)
+
+
+class PlanSummary:
+    """Operation counts and byte totals, accumulated across plans"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.bytes = Counter()
+
+    def add(self, plan):
+        for op in plan:
+            self.counts[op.action] += 1
+            self.bytes[op.action] += op.size
+
+    @property
+    def total_bytes(self):
+        return sum(size for action, size in self.bytes.items() if action != DELETE_FOLDER)
+
+    def to_dict(self):
+        return {
+            'operations': sum(self.counts.values()),
+            'total_bytes': self.total_bytes,
+            'by_action': {action: {'count': self.counts[action], 'bytes': self.bytes[action]}
+                          for action in sorted(self.counts)},
+        }
+
+    def lines(self):
+        lines = [f"{sum(self.counts.values())} operations, {format_bytes(self.total_bytes)} to move"]
+        for action in sorted(self.counts):
+            lines.append(f"  {action}: {self.counts[action]} ({format_bytes(self.bytes[action])})")
+        return lines
+
+
+class PlanWriter:
+    """Streams plans to a text, JSON or CSV output as they are produced
+
+    Operations are written as each batch is planned, so a dry run over a
+    huge tree never holds the whole plan in memory. The JSON document ends
+    with a summary object once close() is called.
+    """
+
+    def __init__(self, root_dir, output=None, plan_format='text'):
+        if plan_format not in PLAN_FORMATS:
+            raise ValueError(f"Unknown plan format: {plan_format}")
+        self.root_dir = Path(root_dir)
+        self.format = plan_format
+        self.summary = PlanSummary()
+        self._owns_stream = output is not None
+        self.stream = open(output, 'w', newline='') if output is not None else sys.stdout
+        self._first = True
+
+        if self.format == 'json':
+            self.stream.write('{"root": %s, "operations": [' % json.dumps(str(self.root_dir)))
+        elif self.format == 'csv':
+            self._csv = csv.DictWriter(self.stream, fieldnames=PLAN_FIELDS)
+            self._csv.writeheader()
+
+    def write(self, plan):
+        self.summary.add(plan)
+        for op in plan:
+            if self.format == 'json':
+                self.stream.write(('\n  ' if self._first else ',\n  ') + json.dumps(op.to_dict(self.root_dir)))
+                self._first = False
+            elif self.format == 'csv':
+                self._csv.writerow(op.to_dict(self.root_dir))
+            else:
+                size = f" ({format_bytes(op.size)})" if op.action != DELETE_FOLDER else ""
+                self.stream.write(f"{op.describe(self.root_dir)}{size}\n")
+
+    def close(self):
+        """Finish the output and return the summary"""
+        if self.format == 'json':
+            self.stream.write('\n], "summary": %s}\n' % json.dumps(self.summary.to_dict()))
+        elif self.format == 'text':
+            self.stream.write("\n".join(self.summary.lines()) + "\n")
+        if self._owns_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+        return self.summary
+
+
+class PlanExecutor:
+    """Applies a MovePlan to the disk
+
+    All destination directories of a plan are created up front, each at
+    most once per run. Temp folder deletions and folder moves run first,
+    then file moves grouped by destination directory. Every operation's
+    name was fixed while planning, so the order moves run in does not
+    change the result.
+
+    Duplicates go last, after the originals they may be linked to have
+    reached their destination; the reclaimer decides how each is handled.
+    An operation that fails with an OSError (permissions, a vanished file,
+    a destination directory that cannot be created) is logged and
+    collected in errors; the rest of the plan still runs.
+    Time spent creating directories, journaling, moving and logging is
+    charged to the matching phases of metrics.
+    """
+
+    def __init__(self, root_dir, logger, on_applied=None, mover=None, journal=None, checkpoint=None,
+                 metrics=None, reclaimer=None):
+        """on_applied(operation) is called after each operation succeeds
+
+        With a journal, each plan's operations are recorded before they are applied,
+        and how reclaimed duplicates were linked or cloned once they are.
+        checkpoint() is called after every operation and decides itself when to save.
+        """
+        self.root_dir = Path(root_dir)
+        self.logger = logger
+        self.on_applied = on_applied
+        self.mover = mover if mover is not None else MoveEngine()
+        self.journal = journal
+        self.checkpoint = checkpoint
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.reclaimer = reclaimer if reclaimer is not None else SpaceReclaimer(mover=self.mover,
+                                                                                metrics=self.metrics)
+        self.errors = []
+        self.created_dirs = set()
+
+    def execute(self, plan):
+        with self.metrics.phase('mkdir'):
+            failed_dirs = self._create_directories(plan)
+        operations = self._ordered(plan)
+        if failed_dirs:
+            # Only the operations into a directory that could not be made fail
+            for op in operations:
+                if op.destination is not None and op.destination.parent in failed_dirs:
+                    self._fail(op, failed_dirs[op.destination.parent])
+            operations = [op for op in operations
+                          if op.destination is None or op.destination.parent not in failed_dirs]
+        if self.journal is not None:
+            with self.metrics.phase('journal'):
+                seqs = self.journal.record(operations)
+        for op in operations:
+            try:
+                self.apply(op)
+            except OSError as e:
+                self._fail(op, e)
+            if self.checkpoint is not None:
+                self.checkpoint()
+        if self.journal is not None and self.reclaimer.reclaims:
+            with self.metrics.phase('journal'):
+                self.journal.record_methods(operations, seqs)
+
+    def _fail(self, op, error):
+        self.errors.append((op, error))
+        self.metrics.count('operations_failed')
+        with self.metrics.phase('log'):
+            self.logger.log(f"FAILED {op.describe(self.root_dir)}: {error}", event="error",
+                            source=op.source.name, error=str(error))
+
+    def _create_directories(self, plan):
+        """Create every destination directory of the plan, parents first
+
+        Returns {directory: OSError} for the directories that could not be created.
+        """
+        needed = {op.destination.parent for op in plan if op.destination is not None and not self._deletes(op)}
+        failed = {}
+        for directory in sorted(needed - self.created_dirs):
+            try:
+                directory.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                failed[directory] = e
+                continue
+            self.created_dirs.add(directory)
+        return failed
+
+    def _deletes(self, op):
+        """True for a duplicate that will be deleted, so its duplicates folder is not needed"""
+        return op.original is not None and self.reclaimer.policy == 'delete'
+
+    def _ordered(self, plan):
+        folders = [op for op in plan if op.action in (DELETE_FOLDER, MOVE_FOLDER)]
+        files = [op for op in plan if op.action not in (DELETE_FOLDER, MOVE_FOLDER)]
+        files.sort(key=lambda op: (op.action == MOVE_DUPLICATE, str(op.destination.parent)))
+        return folders + files
+
+    def apply(self, op):
+        """Apply a single operation and log it"""
+        metrics = self.metrics
+        if op.action == DELETE_FOLDER:
+            with metrics.phase('move'):
+                shutil.rmtree(op.source)
+            metrics.count('folders_deleted')
+            with metrics.phase('log'):
+                self.logger.log(op.describe(self.root_dir), event="deleted", source=op.source.name)
+        else:
+            source_dev = op.record.dev if op.record is not None else None
+            with metrics.phase('move'):
+                if op.action == MOVE_DUPLICATE:
+                    op.method = self.reclaimer.apply(op, source_dev)
+                else:
+                    op.method = self.mover.move(op.source, op.destination, source_dev)
+            if op.action == MOVE_FOLDER:
+                metrics.count('folders_moved')
+            elif op.method in (RENAMED, COPIED):
+                metrics.count(f"moves_{op.method}")
+                if op.method == COPIED:
+                    metrics.count('bytes_copied', op.size)
+            fields = {'kind': op.label, 'source': op.source.name}
+            if op.method != DELETED:
+                fields['destination'] = _relative(op.destination, self.root_dir)
+            fields['method'] = op.method
+            if op.original is not None:
+                fields['original'] = _relative(op.original, self.root_dir)
+            with metrics.phase('log'):
+                self.logger.log(op.describe(self.root_dir),
+                                event="duplicate" if op.action == MOVE_DUPLICATE else "moved", **fields)
+        if self.on_applied is not None:
+            self.on_applied(op)
+
+
+def folder_size(path):
+    """Total size of the files below a folder (used for dry-run estimates)"""
+    total = 0
+    stack = [os.fspath(path)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue
+    return total
+
+
+def format_bytes(size):
+    """Human readable byte count"""
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if size < 1024 or unit == 'TB':
+            return f"{size:.1f}{unit}" if unit != 'B' else f"{size}B"
+        size /= 1024
+
+
+def _relative(path, root_dir):
+    try:
+        return Path(path).relative_to(root_dir).as_posix()
+    except ValueError:
+        return str(path)
@@ -0,0 +1,177 @@
+"""
+Space reclaiming for Digital Janitor Pro
+Replaces verified duplicates with a hardlink or reflink to the original, or deletes them
+"""
+import errno
+import os
+import shutil
+import stat
+from pathlib import Path
+from core.mover import MoveEngine, TEMP_SUFFIX
+from utils.metrics import Metrics
+
+# What happens to a duplicate (features.duplicate_policy)
+DUPLICATE_POLICIES = ('move', 'hardlink', 'reflink', 'delete')
+
+# How a duplicate was handled, reported like core.mover's RENAMED / COPIED
+LINKED = 'hardlink'
+CLONED = 'reflink'
+DELETED = 'delete'
+
+# Bytes compared per read when verifying a duplicate against its original
+VERIFY_CHUNK_SIZE = 1024 * 1024
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# Errors meaning the file system cannot link or clone here; the duplicate is moved instead
+UNSUPPORTED_ERRORS = (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP, errno.ENOTTY,
+                      errno.EINVAL, errno.ENOSYS)
+
+
+def files_identical(path, other, chunk_size=VERIFY_CHUNK_SIZE):
+    """Byte-for-byte comparison of two files, stopping at the first difference
+
+    Both files are streamed through two reusable buffers, so memory use
+    does not depend on the file size.
+    """
+    with open(path, 'rb', buffering=0) as first, open(other, 'rb', buffering=0) as second:
+        if os.fstat(first.fileno()).st_size != os.fstat(second.fileno()).st_size:
+            return False
+        first_buffer = bytearray(chunk_size)
+        second_buffer = bytearray(chunk_size)
+        first_view = memoryview(first_buffer)
+        second_view = memoryview(second_buffer)
+        while True:
+            count = first.readinto(first_buffer)
+            if not count:
+                return not second.read(1)
+            if _read_exactly(second, second_view[:count]) != count or first_view[:count] != second_view[:count]:
+                return False
+
+
+def _read_exactly(stream, view):
+    """Fill view from stream (a raw file may return short reads); returns the bytes read"""
+    total = 0
+    while total < len(view):
+        count = stream.readinto(view[total:])
+        if not count:
+            break
+        total += count
+    return total
+
+
+class SpaceReclaimer:
+    """Applies the duplicate policy to one duplicate at a time
+
+    'move' files duplicates into the month's duplicates folder as before.
+    'hardlink' leaves a hard link to the original there instead, and
+    'reflink' a copy-on-write clone (FICLONE, on Btrfs, XFS and similar),
+    so restore can still move a file back. 'delete' removes the duplicate;
+    its journal entry names the original, which restore copies back.
+
+    A duplicate is only linked, cloned or deleted after a byte-for-byte
+    comparison with its original. When the comparison fails, the original
+    is gone, either is a symlink or both are the same inode, or the file
+    system cannot link or clone, the duplicate is moved as with 'move',
+    so no data is ever lost to the policy.
+    """
+
+    def __init__(self, policy='move', mover=None, metrics=None, logger=None):
+        if policy not in DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown duplicate policy: {policy}")
+        self.policy = policy
+        self.mover = mover if mover is not None else MoveEngine()
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.logger = logger
+
+    @classmethod
+    def from_config(cls, config, mover=None, metrics=None, logger=None):
+        policy = config.get('features', {}).get('duplicate_policy', 'move')
+        return cls(policy, mover, metrics, logger)
+
+    @property
+    def reclaims(self):
+        """True when duplicates are linked, cloned or deleted rather than moved"""
+        return self.policy != 'move'
+
+    def apply(self, op, source_dev=None):
+        """Handle one duplicate Operation and return how it was done
+
+        op.original is the path of the verified-equal original; the
+        result is LINKED, CLONED, DELETED, or the mover's method when the
+        duplicate was moved after all.
+        """
+        if not self.reclaims or op.original is None:
+            return self.mover.move(op.source, op.destination, source_dev)
+
+        source_stat = os.lstat(op.source)
+        try:
+            original_stat = os.lstat(op.original)
+        except FileNotFoundError:
+            return self._keep(op, source_dev, "its original is gone")
+        if stat.S_ISLNK(source_stat.st_mode) or stat.S_ISLNK(original_stat.st_mode):
+            # Comparing would follow the link, and reclaiming could remove the only real copy
+            return self._keep(op, source_dev, "it or its original is a symlink")
+        if (source_stat.st_dev, source_stat.st_ino) == (original_stat.st_dev, original_stat.st_ino):
+            return self._keep(op, source_dev, "it is the same file as its original")
+
+        with self.metrics.phase('verify'):
+            try:
+                same = files_identical(op.source, op.original)
+            except FileNotFoundError:
+                if not os.path.exists(op.source):
+                    raise
+                same = False
+            self.metrics.count('bytes_verified', source_stat.st_size)
+        if not same:
+            return self._keep(op, source_dev, "it differs from its original or the original is gone")
+
+        try:
+            if self.policy == 'hardlink':
+                os.link(op.original, op.destination)
+            elif self.policy == 'reflink':
+                _clone(op.original, op.source, op.destination)
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_ERRORS:
+                raise
+            return self._keep(op, source_dev, f"{self.policy} is not possible here ({e.strerror})")
+        os.unlink(op.source)
+
+        method = {'hardlink': LINKED, 'reflink': CLONED, 'delete': DELETED}[self.policy]
+        self.metrics.count(f"duplicates_{method}")
+        if source_stat.st_nlink == 1:
+            # Other hard links to the duplicate keep its blocks in use
+            self.metrics.count('bytes_reclaimed', source_stat.st_size)
+        return method
+
+    def _keep(self, op, source_dev, reason):
+        """Move a duplicate into the duplicates folder instead of reclaiming it"""
+        self.metrics.count('duplicates_kept')
+        if self.logger is not None:
+            self.logger.log(f"KEPT duplicate {op.source.name}: {reason}", event="kept",
+                            source=op.source.name, reason=reason)
+        # Not created up front when duplicates were to be deleted
+        op.destination.parent.mkdir(parents=True, exist_ok=True)
+        return self.mover.move(op.source, op.destination, source_dev)
+
+
+def _clone(original, source, destination):
+    """Reflink original to destination (through a temp name), with the duplicate's own times and mode"""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.ENOSYS, "reflinks are not supported on this platform")
+
+    temp = Path(destination).with_name(f".{Path(destination).name}{TEMP_SUFFIX}")
+    try:
+        with open(original, 'rb') as src, open(temp, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        shutil.copystat(source, temp)
+        os.rename(temp, destination)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,223 @@
+"""
+Classification rules for Digital Janitor Pro
+Decides which type folder of a month a file goes into
+"""
+import fnmatch
+import mimetypes
+import re
+import time
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Built-in categories: (folder_names key, log label, extensions)
+DEFAULT_TYPE_RULES = (
+    ('text_files', '.txt file', ('.txt',)),
+    ('csv_files', '.csv file', ('.csv',)),
+    ('images', 'image', ('.jpg', '.jpeg', '.png', '.gif', '.bmp')),
+    ('documents', 'document', ('.pdf', '.docx', '.xlsx', '.pptx', '.rtf')),
+    ('media', 'media', ('.mp4', '.avi', '.mp3', '.wav', '.mov')),
+    ('code', 'code file', ('.py', '.js', '.html', '.css', '.java')),
+)
+
+DEFAULT_FALLBACK = {'folder': 'other_files', 'label': 'other file'}
+
+
+class Rule:
+    """One classification rule: where matching files go and how they are logged
+
+    A rule matches a file when one of its name conditions (extensions,
+    glob, regex, mimetypes) holds, or when it has none, and all of its
+    size and age limits hold. Sizes are in MB, checked as min_mb < size
+    <= max_mb; ages are in days since the file was modified.
+    """
+    __slots__ = ('index', 'folder', 'label', 'min_mb', 'max_mb', 'min_age', 'max_age', 'keyed')
+
+    def __init__(self, index, spec):
+        self.index = index
+        self.folder = spec['folder']
+        self.label = spec.get('label', self.folder)
+        self.min_mb = spec.get('min_mb')
+        self.max_mb = spec.get('max_mb')
+        min_age = spec.get('min_age_days')
+        max_age = spec.get('max_age_days')
+        self.min_age = min_age * SECONDS_PER_DAY if min_age is not None else None
+        self.max_age = max_age * SECONDS_PER_DAY if max_age is not None else None
+        self.keyed = any(spec.get(key) for key in ('extensions', 'glob', 'regex', 'mimetypes'))
+
+    def accepts(self, record, now):
+        """Check the size and age limits of the rule"""
+        if self.min_mb is not None and not record.size_mb > self.min_mb:
+            return False
+        if self.max_mb is not None and not record.size_mb <= self.max_mb:
+            return False
+        if self.min_age is not None and now - record.mtime < self.min_age:
+            return False
+        if self.max_age is not None and now - record.mtime >= self.max_age:
+            return False
+        return True
+
+    def describe(self, record):
+        """Log label, with {size_mb} filled in"""
+        if '{' not in self.label:
+            return self.label
+        return self.label.format(size_mb=record.size_mb)
+
+    def __repr__(self):
+        return f"Rule({self.index}, {self.folder!r})"
+
+
+class RuleSet:
+    """Ordered rules compiled once for constant-cost lookups
+
+    The first rule (in config order) that matches a file wins; files no
+    rule matches go to the fallback folder. Extensions, and the MIME types
+    the mimetypes module maps extensions to, become one suffix -> rules
+    dict; all glob and regex name patterns become one combined regex.
+    Only rules without name conditions (typically size or age rules) are
+    checked one by one, so adding extension or pattern rules does not slow
+    classification down. Patterns with capturing groups (which would
+    clash or be renumbered once combined) turn the combined regex off,
+    and each rule's patterns are then tried in turn.
+    """
+
+    def __init__(self, specs, fallback=None, now=None):
+        self.now = time.time() if now is None else now
+        self.rules = [Rule(index, spec) for index, spec in enumerate(specs)]
+        self.fallback = Rule(len(self.rules), fallback or DEFAULT_FALLBACK)
+        self.unkeyed = [rule for rule in self.rules if not rule.keyed]
+        self.by_suffix = {}
+        name_patterns = []
+        mime_patterns = []
+
+        mimetypes.init()
+        for rule, spec in zip(self.rules, specs):
+            suffixes = [_normalize_suffix(ext) for ext in spec.get('extensions', ())]
+            types = spec.get('mimetypes', ())
+            if types:
+                compiled = _compile_each(rule, [fnmatch.translate(pattern) for pattern in types])
+                mime_patterns.append((rule, compiled))
+                suffixes.extend(suffix for suffix, mime_type in mimetypes.types_map.items()
+                                if _matches(compiled, mime_type))
+            for suffix in suffixes:
+                candidates = self.by_suffix.setdefault(suffix, [])
+                if rule not in candidates:
+                    candidates.append(rule)
+
+            patterns = [fnmatch.translate(pattern) for pattern in spec.get('glob', ())]
+            patterns.extend(spec.get('regex', ()))
+            if patterns:
+                name_patterns.append((rule, _compile_each(rule, patterns)))
+
+        self.name_patterns = name_patterns
+        self.mime_patterns = mime_patterns
+        self.name_regex = _compile_groups(name_patterns)
+        self.mime_regex = _compile_groups(mime_patterns)
+
+    @classmethod
+    def from_config(cls, config):
+        """Rules from the 'rules' config section, or the built-in categories
+
+        Without a 'rules' section the classic behaviour is kept: empty,
+        huge and large files by size (when features.sort_by_size is on),
+        then the built-in extension categories, with folders renamed
+        through folder_names.
+        """
+        if 'rules' in config:
+            return cls(config['rules'], config.get('fallback_rule'))
+        return cls(default_rule_specs(config))
+
+    def classify(self, record, mime_type=None, suffix=None):
+        """Return the Rule for a FileRecord
+
+        mime_type and suffix describe the sniffed content, if the caller
+        has looked at it; suffix then replaces the file name's extension.
+        """
+        candidates = list(self.unkeyed)
+        candidates.extend(self.by_suffix.get(suffix if suffix is not None else record.suffix, ()))
+        if self.name_patterns:
+            candidates.extend(self._pattern_candidates(self.name_regex, self.name_patterns,
+                                                       record.name, record))
+        if mime_type is not None and self.mime_patterns:
+            candidates.extend(self._pattern_candidates(self.mime_regex, self.mime_patterns,
+                                                       mime_type, record))
+
+        if len(candidates) > 1:
+            candidates.sort(key=lambda rule: rule.index)
+        for rule in candidates:
+            if rule.accepts(record, self.now):
+                return rule
+        return self.fallback
+
+    def _pattern_candidates(self, regex, patterns, text, record):
+        """Rules whose patterns match text, via the combined regex when there is one
+
+        The combined regex only reports the first matching rule. If that
+        rule's limits turn the file down, later rules are tried one by one.
+        """
+        if regex is None:
+            return [rule for rule, compiled in patterns if _matches(compiled, text)]
+        match = regex.match(text)
+        if match is None:
+            return []
+        first = self.rules[int(match.lastgroup[1:])]
+        if first.accepts(record, self.now):
+            return [first]
+        return [rule for rule, compiled in patterns if rule.index > first.index and _matches(compiled, text)]
+
+
+def default_rule_specs(config):
+    """Rule specs equivalent to the classic size-then-extension sorting"""
+    folder_names = config.get('folder_names', {})
+    specs = []
+    if config.get('features', {}).get('sort_by_size', True):
+        thresholds = config['size_thresholds']
+        specs.append({'folder': 'empty_files', 'label': 'empty file', 'max_mb': 0})
+        specs.append({'folder': 'huge_files', 'label': 'huge file ({size_mb:.1f}MB)',
+                      'min_mb': thresholds['huge_mb']})
+        specs.append({'folder': 'large_files', 'label': 'large file ({size_mb:.1f}MB)',
+                      'min_mb': thresholds['large_mb']})
+    for key, label, extensions in DEFAULT_TYPE_RULES:
+        specs.append({'folder': folder_names.get(key, key), 'label': label, 'extensions': extensions})
+    return specs
+
+
+def _normalize_suffix(extension):
+    extension = extension.lower()
+    return extension if extension.startswith('.') else '.' + extension
+
+
+def _combine(patterns):
+    return "|".join(f"(?:{pattern})" for pattern in patterns)
+
+
+def _compile_each(rule, patterns):
+    """Compile a rule's patterns one by one, so a bad one is reported with its rule"""
+    compiled = []
+    for pattern in patterns:
+        try:
+            compiled.append(re.compile(pattern))
+        except re.error as e:
+            raise ValueError(f"Rule {rule.index} ({rule.folder}): invalid pattern {pattern!r}: {e}") from None
+    return compiled
+
+
+def _matches(compiled, text):
+    return any(pattern.match(text) for pattern in compiled)
+
+
+def _compile_groups(rule_patterns):
+    """One regex with a named group per rule; match.lastgroup names the rule
+
+    Returns None when there are no patterns or they cannot be combined:
+    capturing groups would clash (named) or be renumbered (backreferences),
+    and some patterns (global flags) only compile on their own.
+    """
+    if not rule_patterns:
+        return None
+    if any(pattern.groups for _, compiled in rule_patterns for pattern in compiled):
+        return None
+    try:
+        return re.compile("|".join(f"(?P<r{rule.index}>{_combine(pattern.pattern for pattern in compiled)})"
+                                   for rule, compiled in rule_patterns))
+    except re.error:
+        return None
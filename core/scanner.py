@@ -0,0 +1,116 @@
+"""
+Streaming directory scanner for Digital Janitor Pro
+Walks nested trees with os.scandir without building the full listing
+"""
+import fnmatch
+import os
+import re
+
+SYMLINK_POLICIES = ('skip', 'files', 'follow')
+
+
+class TreeScanner:
+    """Generator-based recursive walk over a directory tree
+
+    Only the stack of directories still to visit is held in memory, so the
+    walk stays flat in memory on trees with millions of entries. Files are
+    yielded as os.DirEntry objects; nothing beyond what scandir returns is
+    stat'd here.
+
+    Symlink policies:
+        skip   - ignore symlinks to files and directories
+        files  - treat symlinks to files as files, never descend into linked directories
+        follow - treat linked files as files and descend into linked directories
+    """
+
+    def __init__(self, root_dir, max_depth=None, exclude=(), symlinks='skip',
+                 skip_entry=None, enter_directory=None):
+        """
+        max_depth       - deepest directory level to descend into (0 = root only, None = unlimited)
+        exclude         - glob patterns matched against names and root-relative paths
+        skip_entry      - callable(entry, depth) returning True for entries to ignore
+        enter_directory - callable(entry, depth) returning False to not descend into a directory
+        """
+        if symlinks not in SYMLINK_POLICIES:
+            raise ValueError(f"Unknown symlink policy: {symlinks}")
+        self.root_dir = os.fspath(root_dir)
+        self.max_depth = max_depth
+        self.symlinks = symlinks
+        self.skip_entry = skip_entry
+        self.enter_directory = enter_directory
+        self.exclude_pattern = _compile_globs(exclude)
+
+    def _is_excluded(self, entry):
+        if self.exclude_pattern is None:
+            return False
+        if self.exclude_pattern.match(entry.name):
+            return True
+        relative = os.path.relpath(entry.path, self.root_dir).replace(os.sep, '/')
+        return self.exclude_pattern.match(relative) is not None
+
+    def iter_files(self):
+        """Yield a DirEntry for every file in the tree, depth first"""
+        follow = self.symlinks == 'follow'
+        visited = set()
+        if follow:
+            root_stat = os.stat(self.root_dir)
+            visited.add((root_stat.st_dev, root_stat.st_ino))
+
+        stack = [(self.root_dir, 0)]
+        while stack:
+            directory, depth = stack.pop()
+            try:
+                iterator = os.scandir(directory)
+            except OSError as e:
+                print(f"Error scanning {directory}: {e}")
+                continue
+
+            with iterator:
+                for entry in iterator:
+                    if self.skip_entry is not None and self.skip_entry(entry, depth):
+                        continue
+                    if self._is_excluded(entry):
+                        continue
+
+                    try:
+                        is_link = entry.is_symlink()
+                        if is_link and self.symlinks == 'skip':
+                            continue
+
+                        if entry.is_dir(follow_symlinks=follow):
+                            if self.max_depth is not None and depth >= self.max_depth:
+                                continue
+                            if self.enter_directory is not None and not self.enter_directory(entry, depth):
+                                continue
+                            if follow:
+                                # Guard against symlink loops
+                                dir_stat = entry.stat()
+                                key = (dir_stat.st_dev, dir_stat.st_ino)
+                                if key in visited:
+                                    continue
+                                visited.add(key)
+                            stack.append((entry.path, depth + 1))
+                        elif entry.is_file():
+                            yield entry
+                    except OSError as e:
+                        print(f"Error scanning {entry.path}: {e}")
+
+
+def _compile_globs(patterns):
+    """Combine glob patterns into a single compiled regex"""
+    patterns = list(patterns or ())
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in patterns))
+
+
+def iter_batches(items, batch_size):
+    """Group an iterable into lists of at most batch_size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,171 @@
+"""
+Content type detection for Digital Janitor Pro
+Recognises common formats from the magic numbers in a file's first bytes
+"""
+import struct
+
+# Bytes of a file's head looked at when sniffing
+SNIFF_BYTES = 8 * 1024
+
+# When to look at file contents (features.content_sniffing)
+SNIFF_MODES = ('off', 'unknown', 'all')
+
+# (offset, magic bytes, MIME type, extension)
+MAGIC_NUMBERS = (
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png', '.png'),
+    (0, b'\xff\xd8\xff', 'image/jpeg', '.jpg'),
+    (0, b'GIF87a', 'image/gif', '.gif'),
+    (0, b'GIF89a', 'image/gif', '.gif'),
+    (0, b'II*\x00', 'image/tiff', '.tif'),
+    (0, b'MM\x00*', 'image/tiff', '.tif'),
+    (0, b'%PDF-', 'application/pdf', '.pdf'),
+    (0, b'{\\rtf', 'application/rtf', '.rtf'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage', '.doc'),
+    (0, b'ID3', 'audio/mpeg', '.mp3'),
+    (0, b'fLaC', 'audio/flac', '.flac'),
+    (0, b'OggS', 'audio/ogg', '.ogg'),
+    (0, b'\x1aE\xdf\xa3', 'video/x-matroska', '.mkv'),
+    (0, b'\x1f\x8b', 'application/gzip', '.gz'),
+    (0, b'BZh', 'application/x-bzip2', '.bz2'),
+    (0, b'\xfd7zXZ\x00', 'application/x-xz', '.xz'),
+    (0, b"7z\xbc\xaf'\x1c", 'application/x-7z-compressed', '.7z'),
+    (0, b'Rar!\x1a\x07', 'application/vnd.rar', '.rar'),
+    (0, b'(\xb5/\xfd', 'application/zstd', '.zst'),
+    (0, b'SQLite format 3\x00', 'application/vnd.sqlite3', '.sqlite'),
+    (257, b'ustar', 'application/x-tar', '.tar'),
+)
+
+# RIFF containers by form type
+RIFF_TYPES = {
+    b'WEBP': ('image/webp', '.webp'),
+    b'WAVE': ('audio/wav', '.wav'),
+    b'AVI ': ('video/x-msvideo', '.avi'),
+}
+
+# ISO media (ftyp) brands that are not plain MP4 video
+FTYP_BRANDS = {
+    b'qt  ': ('video/quicktime', '.mov'),
+    b'heic': ('image/heic', '.heic'),
+    b'heix': ('image/heic', '.heic'),
+    b'mif1': ('image/heic', '.heic'),
+    b'avif': ('image/avif', '.avif'),
+    b'M4A ': ('audio/mp4', '.m4a'),
+}
+
+# Office Open XML formats by the folder their entries' names start with
+ZIP_FOLDERS = (
+    (b'word/', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', '.docx'),
+    (b'xl/', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
+    (b'ppt/', 'application/vnd.openxmlformats-officedocument.presentationml.presentation', '.pptx'),
+)
+
+# OpenDocument and EPUB by the content of their first, uncompressed 'mimetype' entry
+ZIP_MIMETYPES = {
+    b'application/vnd.oasis.opendocument.text': ('application/vnd.oasis.opendocument.text', '.odt'),
+    b'application/epub+zip': ('application/epub+zip', '.epub'),
+}
+
+# Zip local file header: signature, versions, flags, method, time, date, crc,
+# compressed size, size, name length, extra length
+ZIP_LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+
+# Unicode byte order marks that start with 0xFF, like an MPEG frame
+BYTE_ORDER_MARKS = (b'\xff\xfe',)
+
+
+def sniff_bytes(head):
+    """Return (mime_type, extension) for the first bytes of a file, or None if unknown"""
+    for offset, magic, mime_type, extension in MAGIC_NUMBERS:
+        if head.startswith(magic, offset):
+            return mime_type, extension
+
+    if head.startswith(b'RIFF') and head[8:12] in RIFF_TYPES:
+        return RIFF_TYPES[head[8:12]]
+    if head[4:8] == b'ftyp':
+        return FTYP_BRANDS.get(head[8:12], ('video/mp4', '.mp4'))
+    if head.startswith(b'PK\x03\x04'):
+        return _sniff_zip(head)
+    if head.startswith(b'BM') and len(head) >= 14 and head[6:10] == b'\x00\x00\x00\x00':
+        return 'image/bmp', '.bmp'
+    if _is_mpeg_frame(head):
+        return 'audio/mpeg', '.mp3'
+    return None
+
+
+def _is_mpeg_frame(head):
+    """True when head starts with a valid MPEG audio frame header (an MP3 without an ID3 tag)"""
+    if len(head) < 4 or head[0] != 0xFF or head.startswith(BYTE_ORDER_MARKS):
+        return False
+    version_layer, rates = head[1], head[2]
+    return (version_layer & 0xE0 == 0xE0           # frame sync
+            and version_layer & 0x18 != 0x08       # version 01 is reserved
+            and version_layer & 0x06 != 0          # layer 00 is reserved
+            and rates >> 4 not in (0x0, 0xF)       # free and bad bitrate
+            and rates & 0x0C != 0x0C)              # sample rate 11 is reserved
+
+
+def _sniff_zip(head):
+    """Tell zip-based documents from plain zips by the entries whose local headers are in head"""
+    for index, (name, data) in enumerate(_zip_entries(head)):
+        if index == 0 and name == b'mimetype' and data in ZIP_MIMETYPES:
+            return ZIP_MIMETYPES[data]
+        for folder, mime_type, extension in ZIP_FOLDERS:
+            if name.startswith(folder):
+                return mime_type, extension
+    return 'application/zip', '.zip'
+
+
+def _zip_entries(head):
+    """(name, stored bytes in head) of the leading zip entries, walking local header to local header
+
+    Stops at the end of head, or at an entry whose size is only given after its data.
+    """
+    offset = 0
+    while head.startswith(b'PK\x03\x04', offset) and offset + ZIP_LOCAL_HEADER.size <= len(head):
+        (_, _, flags, _, _, _, _, compressed_size, _,
+         name_length, extra_length) = ZIP_LOCAL_HEADER.unpack_from(head, offset)
+        name_start = offset + ZIP_LOCAL_HEADER.size
+        data_start = name_start + name_length + extra_length
+        yield head[name_start:name_start + name_length], head[data_start:data_start + compressed_size]
+        if flags & 0x08:
+            # Data descriptor: the size of this entry is not known from its header
+            return
+        offset = data_start + compressed_size
+
+
+def read_head(file_path, size=SNIFF_BYTES):
+    """First bytes of a file, or None when it cannot be read"""
+    try:
+        with open(file_path, 'rb', buffering=0) as f:
+            return f.read(size)
+    except OSError:
+        return None
+
+
+class ContentSniffer:
+    """Per-run cache of sniffed content types
+
+    Results are keyed by (device, inode, mtime), so a file is read at most
+    once per run however often it is classified, and a modified file is
+    sniffed again. When the head was already read for the partial hash it
+    is passed in and the file is not opened at all.
+    """
+
+    def __init__(self):
+        self.cache = {}
+        self.reads = 0
+
+    def sniff(self, record, head=None):
+        """Return (mime_type, extension) for a FileRecord, or None if not recognised"""
+        key = (record.dev, record.inode, record.mtime_ns)
+        if key in self.cache:
+            return self.cache[key]
+        if head is None:
+            if record.size == 0:
+                head = b''
+            else:
+                head = read_head(record.path)
+                self.reads += 1
+        result = sniff_bytes(head) if head else None
+        self.cache[key] = result
+        return result
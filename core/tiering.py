@@ -0,0 +1,549 @@
+"""
+Retention and tiering for Digital Janitor Pro
+Compresses, archives or moves cold month folders of the date tree, driven by config rules
+"""
+import datetime
+import gzip
+import os
+import shutil
+import sqlite3
+import stat
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from core.hash_index import INDEX_DIR_NAME
+from core.journal import Journal
+from core.mover import MoveEngine, TEMP_SUFFIX
+from core.planner import Operation, MOVE_FOLDER
+from core.verify import ExpectedFiles
+
+MONTH_INDEX_FILE_NAME = 'months.db'
+
+TIER_ACTIONS = ('compress', 'archive', 'move')
+
+# Archive formats and their tarfile modes (zip is written with zipfile)
+ARCHIVE_FORMATS = {'tar': 'w', 'tar.gz': 'w:gz', 'tar.bz2': 'w:bz2', 'tar.xz': 'w:xz', 'zip': None}
+
+# States of a month folder in the index
+LIVE = 'live'
+COMPRESSED = 'compressed'
+ARCHIVED = 'archived'
+MOVED = 'moved'
+
+# Files not worth compressing again
+COMPRESSED_SUFFIXES = frozenset((
+    '.gz', '.tgz', '.bz2', '.xz', '.zst', '.zip', '.7z', '.rar', '.jpg', '.jpeg', '.png', '.gif',
+    '.webp', '.heic', '.mp3', '.mp4', '.m4a', '.mkv', '.mov', '.avi', '.ogg', '.flac', '.docx',
+    '.xlsx', '.pptx', '.odt', '.pdf',
+))
+
+# Bytes per read while compressing or archiving
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def months_old(month, today=None):
+    """Whole months between a 'YYYY/MM' key and today's month"""
+    today = today or datetime.date.today()
+    year, month = (int(part) for part in month.split('/'))
+    return (today.year * 12 + today.month) - (year * 12 + month)
+
+
+class MonthIndex:
+    """Per-month, per-type-folder file counts and sizes, kept in .janitor/months.db
+
+    Organize runs add every file they file into YYYY/MM/type, so choosing
+    what to tier is a query instead of a walk over the archive. The
+    counts are hints: tiering works on the folder as it is on disk, and
+    rebuild() recounts the tree in one walk (done automatically the first
+    time the index is opened on an existing tree). Tiered folders keep
+    their row with the state and location they were tiered to.
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = Path(root_dir)
+        index_dir = self.root_dir / INDEX_DIR_NAME
+        index_dir.mkdir(exist_ok=True)
+        self.db_path = index_dir / MONTH_INDEX_FILE_NAME
+        self.is_new = not self.db_path.exists()
+        self.connection = sqlite3.connect(str(self.db_path))
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS months (
+                month TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                files INTEGER NOT NULL DEFAULT 0,
+                bytes INTEGER NOT NULL DEFAULT 0,
+                newest_mtime_ns INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL DEFAULT 'live',
+                location TEXT,
+                PRIMARY KEY (month, folder)
+            )
+        """)
+        self.connection.commit()
+
+    def add(self, path, size, mtime_ns=0):
+        """Count one more file filed at path (anything outside YYYY/MM/folder/ is ignored)"""
+        parts = Path(os.path.relpath(path, self.root_dir)).parts
+        if len(parts) < 4 or not _is_month(parts[0], parts[1]):
+            return
+        self.connection.execute("""
+            INSERT INTO months (month, folder, files, bytes, newest_mtime_ns) VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT (month, folder) DO UPDATE SET
+                files = files + 1,
+                bytes = bytes + excluded.bytes,
+                newest_mtime_ns = MAX(newest_mtime_ns, excluded.newest_mtime_ns),
+                state = 'live'
+        """, (f"{parts[0]}/{parts[1]}", parts[2], size, mtime_ns))
+
+    def rebuild(self):
+        """Recount the live part of the tree in one walk; returns the number of files counted"""
+        counted = 0
+        self.connection.execute("DELETE FROM months WHERE state = ?", (LIVE,))
+        for year_entry in _subdirectories(self.root_dir):
+            if not (year_entry.name.isdigit() and len(year_entry.name) == 4):
+                continue
+            for month_entry in _subdirectories(year_entry.path):
+                if not _is_month(year_entry.name, month_entry.name):
+                    continue
+                month = f"{year_entry.name}/{month_entry.name}"
+                for folder_entry in _subdirectories(month_entry.path):
+                    files, size, newest = _measure(folder_entry.path)
+                    counted += files
+                    self.connection.execute("""
+                        INSERT INTO months (month, folder, files, bytes, newest_mtime_ns) VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (month, folder) DO UPDATE SET
+                            files = excluded.files, bytes = excluded.bytes,
+                            newest_mtime_ns = excluded.newest_mtime_ns, state = 'live', location = NULL
+                    """, (month, folder_entry.name, files, size, newest))
+        self.connection.commit()
+        return counted
+
+    def live_folders(self):
+        """(month, folder, files, bytes) of every live folder, oldest month first"""
+        return self.connection.execute(
+            "SELECT month, folder, files, bytes FROM months WHERE state = ? ORDER BY month, folder", (LIVE,)
+        ).fetchall()
+
+    def mark(self, month, folder, state, location=None):
+        self.connection.execute("UPDATE months SET state = ?, location = ? WHERE month = ? AND folder = ?",
+                                (state, location, month, folder))
+
+    def drop(self, month, folder):
+        self.connection.execute("DELETE FROM months WHERE month = ? AND folder = ?", (month, folder))
+
+    def totals(self):
+        """{state: (folders, files, bytes)}"""
+        rows = self.connection.execute(
+            "SELECT state, COUNT(*), SUM(files), SUM(bytes) FROM months GROUP BY state").fetchall()
+        return {state: (folders, files or 0, size or 0) for state, folders, files, size in rows}
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+class TierRule:
+    """One 'tiering.rules' entry: which folders are cold and what happens to them"""
+
+    def __init__(self, older_than_months, action, folders=None, destination=None, archive_format='tar.gz',
+                 level=6):
+        if action not in TIER_ACTIONS:
+            raise ValueError(f"Unknown tiering action: {action}")
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format: {archive_format}")
+        if action == 'move' and not destination:
+            raise ValueError("A tiering rule that moves folders needs a destination")
+        self.older_than_months = older_than_months
+        self.action = action
+        self.folders = frozenset(folders) if folders else None
+        self.destination = Path(destination) if destination else None
+        self.archive_format = archive_format
+        self.level = level
+
+    @classmethod
+    def from_dict(cls, rule):
+        return cls(rule.get('older_than_months', 12), rule.get('action', 'archive'), rule.get('folders'),
+                   rule.get('destination'), rule.get('format', 'tar.gz'), rule.get('level', 6))
+
+    def matches(self, month, folder, today=None):
+        if self.folders is not None and folder not in self.folders:
+            return False
+        return months_old(month, today) > self.older_than_months
+
+    def describe(self):
+        scope = ", ".join(sorted(self.folders)) if self.folders else "whole months"
+        return f"{self.action} {scope} older than {self.older_than_months} months"
+
+
+class TierUnit:
+    """A folder to tier: a whole month (folder is None) or one type folder of a month"""
+    __slots__ = ('month', 'folder', 'rule', 'files', 'bytes', 'folders')
+
+    def __init__(self, month, folder, rule, files, size, folders):
+        self.month = month
+        self.folder = folder
+        self.rule = rule
+        self.files = files
+        self.bytes = size
+        self.folders = folders  # index rows this unit covers
+
+    @property
+    def relative(self):
+        return self.month if self.folder is None else f"{self.month}/{self.folder}"
+
+    def describe(self):
+        return f"{self.rule.action.upper()} {self.relative}/ ({self.files} files, {self.bytes / (1024 * 1024):.1f}MB)"
+
+
+class TierReport:
+    """What a tiering run did (or would do, for a dry run)"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.units = []       # (unit, location) done
+        self.failed = []      # (unit, error)
+        self.bytes_before = 0
+        self.bytes_after = 0
+
+    def to_dict(self):
+        return {
+            'dry_run': self.dry_run,
+            'tiered': [{'folder': unit.relative, 'action': unit.rule.action, 'files': unit.files,
+                        'bytes': unit.bytes, 'location': location} for unit, location in self.units],
+            'failed': [{'folder': unit.relative, 'error': str(error)} for unit, error in self.failed],
+            'bytes_before': self.bytes_before,
+            'bytes_after': self.bytes_after,
+        }
+
+    def lines(self):
+        verb = "Would tier" if self.dry_run else "Tiered"
+        lines = [f"{verb} {len(self.units)} folders ({self.bytes_before / (1024 * 1024):.1f}MB)"]
+        if not self.dry_run and self.units:
+            lines[0] += f", {self.bytes_after / (1024 * 1024):.1f}MB left in the tree"
+        lines.extend(f"   {unit.describe()}" + (f" -> {location}" if location else "")
+                     for unit, location in self.units)
+        lines.extend(f"   FAILED {unit.relative}/: {error}" for unit, error in self.failed)
+        return lines
+
+
+class Tierer:
+    """Applies the tiering rules to the cold folders of one organized root
+
+    Cold folders are chosen from the MonthIndex, first matching rule
+    first. Folders are tiered in parallel, workers at a time; 'compress'
+    also spreads the files of a folder over the workers. Archives are
+    streamed member by member into a temp file, synced and renamed into
+    place before the folder is removed, so an interruption never loses
+    files. Moved folders are journaled and come back with restore;
+    compressed and archived ones are opened with standard tools (gunzip,
+    tar, unzip). The verify expectations follow every change.
+    """
+
+    def __init__(self, root_dir, rules, logger=None, workers=4, mover=None, today=None):
+        self.root_dir = Path(root_dir)
+        self.rules = rules
+        self.logger = logger
+        self.workers = max(1, workers)
+        self.mover = mover if mover is not None else MoveEngine()
+        self.today = today
+        self.months = None
+        self.expected = None
+        self.journal = None
+
+    @classmethod
+    def from_config(cls, root_dir, config, logger=None, mover=None):
+        tiering = config.get('tiering', {})
+        rules = [TierRule.from_dict(rule) for rule in tiering.get('rules', [])]
+        return cls(root_dir, rules, logger, tiering.get('workers', 4),
+                   mover if mover is not None else MoveEngine.from_config(config))
+
+    def plan(self, months):
+        """TierUnits for the live folders some rule finds cold"""
+        by_month = {}
+        for month, folder, files, size in months.live_folders():
+            by_month.setdefault(month, []).append((folder, files, size))
+
+        units = []
+        for month, folders in by_month.items():
+            # One listing per month; folders gone since they were counted (restored or
+            # removed by hand) are dropped from the index
+            present = _folder_names(self.root_dir / month)
+            for folder, _, _ in folders:
+                if folder not in present:
+                    months.drop(month, folder)
+            folders = [entry for entry in folders if entry[0] in present]
+            remaining = list(folders)
+            for rule in self.rules:
+                if rule.folders is None:
+                    if remaining and len(remaining) == len(folders) and rule.matches(month, None, self.today):
+                        units.append(TierUnit(month, None, rule, sum(f[1] for f in remaining),
+                                              sum(f[2] for f in remaining), [f[0] for f in remaining]))
+                        remaining = []
+                    continue
+                for entry in list(remaining):
+                    if rule.matches(month, entry[0], self.today):
+                        units.append(TierUnit(month, entry[0], rule, entry[1], entry[2], [entry[0]]))
+                        remaining.remove(entry)
+        months.commit()
+        return units
+
+    def run(self, dry_run=False):
+        """Tier every cold folder and return a TierReport"""
+        report = TierReport(dry_run)
+        self.months = MonthIndex(self.root_dir)
+        try:
+            if self.months.is_new:
+                counted = self.months.rebuild()
+                self._log(f"Month index created, {counted} organized files counted")
+            units = self.plan(self.months)
+            if dry_run:
+                for unit in units:
+                    report.units.append((unit, None))
+                    report.bytes_before += unit.bytes
+                return report
+
+            self.expected = ExpectedFiles.open_existing(self.root_dir)
+            self.journal = Journal(self.root_dir, event='tier')
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                # Archives and moves run a folder per worker; compression runs a folder at a
+                # time from here, with its files spread over the same workers
+                targets = self._journal_moves(units)
+                futures = {id(unit): pool.submit(self._tier, unit, targets.get(id(unit))) for unit in units
+                           if unit.rule.action != 'compress'}
+                for unit in units:
+                    if unit.rule.action == 'compress':
+                        self._finish(report, unit, lambda: self._compress(unit, pool))
+                    else:
+                        self._finish(report, unit, futures[id(unit)].result)
+            # Month and year folders emptied by archives and moves, once no worker writes into them
+            for unit, _ in report.units:
+                for directory in (self.root_dir / unit.relative).parents:
+                    if directory == self.root_dir:
+                        break
+                    _remove_if_empty(directory)
+            return report
+        finally:
+            self.months.close()
+            if self.expected is not None:
+                self.expected.close()
+            if self.journal is not None:
+                self.journal.close()
+            if self.logger is not None:
+                self.logger.flush()
+
+    def _finish(self, report, unit, result):
+        """Collect one tiered folder's result and record it (driving thread only)"""
+        try:
+            location, size_after, compressed = result()
+        except OSError as e:
+            report.failed.append((unit, e))
+            self._log(f"FAILED {unit.describe()}: {e}", event="error", source=unit.relative, error=str(e))
+            return
+        report.units.append((unit, location))
+        report.bytes_before += unit.bytes
+        report.bytes_after += size_after
+        self._record(unit, location, compressed)
+        self._log(f"{unit.describe()} -> {location}", event="tiered", source=unit.relative,
+                  action=unit.rule.action, destination=location)
+
+    def _journal_moves(self, units):
+        """Choose the destination of every folder move and journal them all; returns {id(unit): target}
+
+        The journal is only written from the driving thread, before any
+        worker starts, so its sequence numbers stay unique for restore.
+        """
+        targets = {}
+        operations = []
+        for unit in units:
+            if unit.rule.action == 'move':
+                target = targets[id(unit)] = _free_path(unit.rule.destination / unit.relative)
+                operations.append(Operation(MOVE_FOLDER, self.root_dir / unit.relative, target))
+        self.journal.record(operations)
+        return targets
+
+    def _tier(self, unit, target=None):
+        """Archive or move (to target) one folder in a worker; returns (location, bytes left in the tree, [])"""
+        source = self.root_dir / unit.relative
+        if unit.rule.action == 'archive':
+            location = self._archive(source, unit)
+            inside = self.root_dir in Path(location).parents
+            return location, os.path.getsize(location) if inside else 0, []
+        return self._move(source, target), 0, []
+
+    def _compress(self, unit, pool):
+        """gzip every file of a folder in place; returns (folder, bytes left, [(path, (gz path, size, mtime_ns))])"""
+        source = self.root_dir / unit.relative
+        paths = []
+        for directory, _, names in os.walk(source):
+            paths.extend(os.path.join(directory, name) for name in names
+                         if os.path.splitext(name)[1].lower() not in COMPRESSED_SUFFIXES)
+        level = unit.rule.level
+        compressed = []
+        for path, result in zip(paths, pool.map(lambda path: _try(_gzip_file, path, level), paths)):
+            if isinstance(result, OSError):
+                # The file itself is untouched; the rest of the folder is still compressed
+                self._log(f"FAILED to compress {path}: {result}", event="error", source=path, error=str(result))
+            elif result is not None:
+                compressed.append((path, result))
+        return str(source), _measure(source)[1], compressed
+
+    def _archive(self, source, unit):
+        rule = unit.rule
+        extension = '.' + rule.archive_format
+        base = rule.destination if rule.destination is not None else self.root_dir
+        target = _free_path(base / unit.relative, extension)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp = target.with_name(f".{target.name}{TEMP_SUFFIX}")
+        try:
+            _write_archive(source, temp, rule.archive_format, rule.level, arcname=Path(unit.relative).name)
+            os.rename(temp, target)
+        except BaseException:
+            try:
+                os.unlink(temp)
+            except OSError:
+                pass
+            raise
+        shutil.rmtree(source)
+        return str(target)
+
+    def _move(self, source, target):
+        # Journaled like an organize move (see _journal_moves), so restore brings the folder back
+        target.parent.mkdir(parents=True, exist_ok=True)
+        self.mover.move(source, target)
+        return str(target)
+
+    def _record(self, unit, location, compressed):
+        """Update the month index and verify expectations for a tiered folder"""
+        state = {'compress': COMPRESSED, 'archive': ARCHIVED, 'move': MOVED}[unit.rule.action]
+        for folder in unit.folders:
+            self.months.mark(unit.month, folder, state, location)
+        self.months.commit()
+        if self.expected is None:
+            return
+        if unit.rule.action == 'compress':
+            for path, (gz_path, gz_size, mtime_ns) in compressed:
+                self.expected.discard(path)
+                self.expected.add(gz_path, gz_size, mtime_ns)
+        else:
+            self.expected.discard_prefix(unit.relative)
+            if unit.rule.action == 'archive' and self.root_dir in Path(location).parents:
+                archive_stat = os.stat(location)
+                self.expected.add(location, archive_stat.st_size, archive_stat.st_mtime_ns)
+        self.expected.commit()
+
+    def _log(self, message, **fields):
+        if self.logger is not None:
+            self.logger.log(message, **fields)
+
+
+def _gzip_file(path, level):
+    """Compress path to path.gz (keeping its times) and remove it; returns (gz path, size, mtime_ns)
+
+    Returns None, leaving the file alone, when compression would not make it smaller.
+    """
+    source_stat = os.stat(path)
+    target = path + '.gz'
+    temp = target + TEMP_SUFFIX
+    try:
+        with open(path, 'rb') as source, open(temp, 'wb') as raw:
+            with gzip.GzipFile(filename=os.path.basename(path), mode='wb', compresslevel=level,
+                               fileobj=raw, mtime=int(source_stat.st_mtime)) as compressed:
+                shutil.copyfileobj(source, compressed, STREAM_CHUNK_SIZE)
+            raw.flush()
+            os.fsync(raw.fileno())
+        compressed_size = os.path.getsize(temp)
+        if compressed_size >= source_stat.st_size:
+            os.unlink(temp)
+            return None
+        os.utime(temp, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        os.rename(temp, target)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+    os.unlink(path)
+    return target, compressed_size, source_stat.st_mtime_ns
+
+
+def _write_archive(source, target, archive_format, level, arcname):
+    """Stream the files below source into a tar or zip archive at target, then fsync it"""
+    if archive_format == 'zip':
+        with zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=level) as archive:
+            for directory, _, names in os.walk(source):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    archive.write(path, os.path.join(arcname, os.path.relpath(path, source)))
+    else:
+        mode = ARCHIVE_FORMATS[archive_format]
+        options = {'compresslevel': level} if archive_format in ('tar.gz', 'tar.bz2') else {}
+        with tarfile.open(target, mode, **options) as archive:
+            # tarfile copies each member in chunks, so no file is read into memory whole
+            archive.add(source, arcname=arcname)
+    with open(target, 'rb') as written:
+        os.fsync(written.fileno())
+
+
+def _try(func, *args):
+    """func(*args), or the OSError it raised"""
+    try:
+        return func(*args)
+    except OSError as e:
+        return e
+
+
+def _free_path(path, extension=''):
+    """path + extension, numbered (-2, -3, ...) when an earlier tiering run already used the name"""
+    candidate = Path(f"{path}{extension}")
+    counter = 2
+    while os.path.lexists(candidate):
+        candidate = Path(f"{path}-{counter}{extension}")
+        counter += 1
+    return candidate
+
+
+def _remove_if_empty(directory):
+    try:
+        os.rmdir(directory)
+    except OSError:
+        pass
+
+
+def _folder_names(path):
+    try:
+        return {entry.name for entry in _subdirectories(path)}
+    except OSError:
+        return set()
+
+
+def _is_month(year, month):
+    return year.isdigit() and len(year) == 4 and month.isdigit() and len(month) == 2
+
+
+def _subdirectories(path):
+    with os.scandir(path) as entries:
+        return [entry for entry in entries if entry.is_dir(follow_symlinks=False)]
+
+
+def _measure(path):
+    """(files, bytes, newest mtime_ns) below a folder, one stat per entry"""
+    files = size = newest = 0
+    stack = [os.fspath(path)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    entry_stat = entry.stat(follow_symlinks=False)
+                    if stat.S_ISDIR(entry_stat.st_mode):
+                        stack.append(entry.path)
+                    else:
+                        files += 1
+                        size += entry_stat.st_size
+                        newest = max(newest, entry_stat.st_mtime_ns)
+        except OSError:
+            continue
+    return files, size, newest
@@ -0,0 +1,344 @@
+"""
+Integrity verification for Digital Janitor Pro
+Records what every move should leave in the date tree and checks the tree against it
+"""
+import os
+import sqlite3
+import stat
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from core.file_operations import DEFAULT_HASH_ALGORITHM, HASH_BUFFER_SIZE, new_hasher
+from core.hash_index import INDEX_DIR_NAME
+
+VERIFY_FILE_NAME = 'verify.db'
+
+# quick: size and mtime only; full: re-hash files whose digest was recorded
+VERIFY_MODES = ('quick', 'full')
+
+# Kinds of expected entries
+FILE = 'f'
+DIRECTORY = 'd'
+
+# Problems a verify reports
+MISSING = 'missing'
+EXTRA = 'extra'
+MISMATCHED = 'mismatched'
+
+# Paths kept per problem kind in a report; all of them are logged
+REPORT_LIMIT = 1000
+
+_buffers = threading.local()
+
+
+class ExpectedFiles:
+    """What the organized tree should hold, kept in .janitor/verify.db
+
+    One row per file (or moved folder) the janitor put into the tree: its
+    root-relative path, and the size, mtime and (when known) digest the
+    file had before it was moved. Rows are written as moves are applied
+    and committed with the run's checkpoints; restore drops the rows of
+    whatever it moves back. Digests are dropped when a run uses another
+    hash algorithm, as in the hash index.
+    """
+
+    def __init__(self, root_dir, algorithm=DEFAULT_HASH_ALGORITHM):
+        self.root_dir = Path(root_dir)
+        index_dir = self.root_dir / INDEX_DIR_NAME
+        index_dir.mkdir(exist_ok=True)
+        self.db_path = index_dir / VERIFY_FILE_NAME
+        self.connection = sqlite3.connect(str(self.db_path))
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS expected (
+                path TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER,
+                digest TEXT
+            )
+        """)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'algorithm'").fetchone()
+        if algorithm is None:
+            # Opened for reading or restore: keep whatever algorithm the digests were made with
+            self.algorithm = row[0] if row else DEFAULT_HASH_ALGORITHM
+        else:
+            if row and row[0] != algorithm:
+                self.connection.execute("UPDATE expected SET digest = NULL")
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('algorithm', ?)",
+                                    (algorithm,))
+            self.algorithm = algorithm
+        self.connection.commit()
+
+    @classmethod
+    def open_existing(cls, root_dir):
+        """Open the expectations of root_dir, or return None if no run recorded any"""
+        if not (Path(root_dir) / INDEX_DIR_NAME / VERIFY_FILE_NAME).exists():
+            return None
+        return cls(root_dir, algorithm=None)
+
+    def _relative(self, path):
+        return Path(os.path.relpath(path, self.root_dir)).as_posix()
+
+    def add(self, path, size=None, mtime_ns=None, digest=None, kind=FILE):
+        """Expect path to hold a file of this size, mtime and digest (None = not checked)"""
+        self.connection.execute("INSERT OR REPLACE INTO expected (path, kind, size, mtime_ns, digest) "
+                                "VALUES (?, ?, ?, ?, ?)", (self._relative(path), kind, size, mtime_ns, digest))
+
+    def discard(self, path):
+        """Stop expecting anything at path (a root-relative or absolute path)"""
+        self.connection.execute("DELETE FROM expected WHERE path = ?", (self._relative(self.root_dir / path),))
+
+    def discard_prefix(self, path):
+        """Stop expecting path and everything below it"""
+        relative = self._relative(self.root_dir / path)
+        # '0' sorts right after '/', so the range holds exactly the paths below relative
+        self.connection.execute("DELETE FROM expected WHERE path = ? OR (path >= ? AND path < ?)",
+                                (relative, relative + '/', relative + '0'))
+
+    def lookup(self, relative_path):
+        """(kind, size, mtime_ns, digest) expected at a root-relative path, or None"""
+        return self.connection.execute("SELECT kind, size, mtime_ns, digest FROM expected WHERE path = ?",
+                                       (relative_path,)).fetchone()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM expected").fetchone()[0]
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+class IOBudget:
+    """Caps the combined read rate of all verify workers
+
+    Every read reserves its share of time on a single timeline, and the
+    worker sleeps until its slot starts, so the workers together never
+    read faster than bytes_per_second (None = unlimited).
+    """
+
+    def __init__(self, bytes_per_second=None):
+        self.rate = bytes_per_second or None
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def take(self, amount):
+        if self.rate is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + amount / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+class VerifyReport:
+    """Outcome of a verify: counts plus the first REPORT_LIMIT paths of each problem"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.counts = Counter()
+        self.problems = {MISSING: [], EXTRA: [], MISMATCHED: []}
+        self.checked = 0
+        self.unhashed = 0
+        self.bytes_hashed = 0
+        self.elapsed = 0.0
+
+    def add(self, kind, path, reason=None):
+        self.counts[kind] += 1
+        if len(self.problems[kind]) < REPORT_LIMIT:
+            self.problems[kind].append(path if reason is None else f"{path} ({reason})")
+
+    @property
+    def clean(self):
+        return not any(self.counts[kind] for kind in self.problems)
+
+    def to_dict(self):
+        return {
+            'mode': self.mode,
+            'checked': self.checked,
+            'missing': self.counts[MISSING],
+            'extra': self.counts[EXTRA],
+            'mismatched': self.counts[MISMATCHED],
+            'unhashed': self.unhashed,
+            'bytes_hashed': self.bytes_hashed,
+            'elapsed_seconds': round(self.elapsed, 6),
+            'problems': {kind: paths for kind, paths in self.problems.items() if paths},
+        }
+
+    def lines(self):
+        rate = self.bytes_hashed / (1024 * 1024) / self.elapsed if self.elapsed else 0.0
+        lines = [f"Verified {self.checked} expected items ({self.mode}) in {self.elapsed:.1f}s: "
+                 f"{self.counts[MISSING]} missing, {self.counts[MISMATCHED]} mismatched, "
+                 f"{self.counts[EXTRA]} extra"]
+        if self.mode == 'full':
+            lines.append(f"{self.bytes_hashed / (1024 * 1024):.1f}MB re-hashed ({rate:.1f}MB/s), "
+                         f"{self.unhashed} files had no recorded digest (size and mtime checked; "
+                         f"set verify.record_hashes to record one for every file)")
+        for kind, paths in self.problems.items():
+            for path in paths[:10]:
+                lines.append(f"   {kind.upper()}: {path}")
+            if self.counts[kind] > 10:
+                lines.append(f"   ... {self.counts[kind] - 10} more {kind} (see the log)")
+        return lines
+
+
+class TreeVerifier:
+    """Checks the organized YYYY/MM/type tree against the recorded expectations
+
+    Year folders are walked one directory per pool task (scandir plus one
+    stat per entry), so listing and stat calls run in parallel. Each file
+    found is looked up in the expectations: unknown files are extra, and
+    size (quick mode: also mtime) differences are mismatches. In full mode
+    files with a recorded digest are re-hashed in the pool, all workers
+    together reading at most io_budget bytes per second. Expected paths
+    never found are missing. Only the expectations database, a temp table
+    of paths seen and a bounded queue of hash tasks are held, so memory
+    stays flat on multi-TB trees.
+    """
+
+    def __init__(self, root_dir, expected, mode='quick', workers=4, io_budget=None, logger=None):
+        if mode not in VERIFY_MODES:
+            raise ValueError(f"Unknown verify mode: {mode}")
+        self.root_dir = Path(root_dir)
+        self.expected = expected
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.budget = IOBudget(io_budget)
+        self.logger = logger
+        self.report = VerifyReport(mode)
+        self._pending = deque()
+
+    def verify(self):
+        """Run the check and return the VerifyReport"""
+        started = time.perf_counter()
+        connection = self.expected.connection
+        connection.execute("CREATE TEMP TABLE IF NOT EXISTS seen (path TEXT PRIMARY KEY)")
+        connection.execute("DELETE FROM temp.seen")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            self._walk(pool)
+            while self._pending:
+                self._finish_hash()
+
+        rows = connection.execute("SELECT path FROM expected WHERE path NOT IN (SELECT path FROM temp.seen) "
+                                  "ORDER BY path")
+        for (path,) in rows:
+            self.report.checked += 1
+            self._problem(MISSING, path)
+        connection.execute("DELETE FROM temp.seen")
+        if self.logger is not None:
+            self.logger.flush()
+        self.report.elapsed = time.perf_counter() - started
+        return self.report
+
+    def _walk(self, pool):
+        listings = deque()
+        with os.scandir(self.root_dir) as entries:
+            for entry in entries:
+                if entry.name.isdigit() and len(entry.name) == 4 and entry.is_dir(follow_symlinks=False):
+                    listings.append(pool.submit(_list_directory, entry.path))
+        while listings:
+            directory, files, subdirectories, error = listings.popleft().result()
+            prefix = Path(os.path.relpath(directory, self.root_dir)).as_posix() + '/'
+            if error is not None:
+                self._log(f"Cannot list {prefix}: {error}", event="error")
+                continue
+            for name in subdirectories:
+                relative = prefix + name
+                expected = self.expected.lookup(relative)
+                if expected is not None and expected[0] == DIRECTORY:
+                    # A moved folder: its contents were never listed file by file
+                    self._seen(relative)
+                else:
+                    listings.append(pool.submit(_list_directory, os.path.join(directory, name)))
+            for name, stat_result in files:
+                self._check(pool, prefix + name, os.path.join(directory, name), stat_result)
+
+    def _check(self, pool, relative, path, stat_result):
+        expected = self.expected.lookup(relative)
+        if expected is None:
+            self._problem(EXTRA, relative)
+            return
+        self._seen(relative)
+        self.report.checked += 1
+        kind, size, mtime_ns, digest = expected
+        if kind == DIRECTORY:
+            self._problem(MISMATCHED, relative, "expected a folder")
+        elif size is not None and stat_result.st_size != size:
+            self._problem(MISMATCHED, relative, f"size {stat_result.st_size}, expected {size}")
+        elif self.mode == 'full' and digest is not None:
+            self._pending.append((relative, digest, pool.submit(self._hash, path, stat_result.st_size)))
+            if len(self._pending) >= self.workers * 4:
+                self._finish_hash()
+        else:
+            if self.mode == 'full':
+                self.report.unhashed += 1
+            if mtime_ns is not None and stat_result.st_mtime_ns != mtime_ns:
+                self._problem(MISMATCHED, relative, "modification time changed")
+
+    def _finish_hash(self):
+        relative, digest, future = self._pending.popleft()
+        try:
+            actual, size = future.result()
+        except OSError as e:
+            self._problem(MISMATCHED, relative, f"cannot be read: {e}")
+            return
+        self.report.bytes_hashed += size
+        if actual != digest:
+            self._problem(MISMATCHED, relative, "content differs")
+
+    def _hash(self, path, size):
+        """Digest of a file, reading within the IO budget"""
+        hasher = new_hasher(self.expected.algorithm)
+        buffer = getattr(_buffers, 'buffer', None)
+        if buffer is None:
+            buffer = _buffers.buffer = bytearray(HASH_BUFFER_SIZE)
+        view = memoryview(buffer)
+        total = 0
+        with open(path, 'rb', buffering=0) as f:
+            while True:
+                self.budget.take(min(len(buffer), max(size - total, 1)))
+                count = f.readinto(buffer)
+                if not count:
+                    break
+                hasher.update(view[:count])
+                total += count
+        return hasher.hexdigest(), total
+
+    def _seen(self, relative):
+        self.expected.connection.execute("INSERT OR IGNORE INTO temp.seen (path) VALUES (?)", (relative,))
+
+    def _problem(self, kind, path, reason=None):
+        self.report.add(kind, path, reason)
+        self._log(f"{kind.upper()}: {path}" + (f" ({reason})" if reason else ""), event=kind, source=path)
+
+    def _log(self, message, **fields):
+        if self.logger is not None:
+            self.logger.log(message, **fields)
+
+
+def _list_directory(directory):
+    """(directory, [(name, stat)], [subdirectory names], error) from one scandir and one lstat per entry"""
+    files = []
+    subdirectories = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    stat_result = entry.stat(follow_symlinks=False)
+                except OSError:
+                    # Removed while listing: reported as missing if it was expected
+                    continue
+                if stat.S_ISDIR(stat_result.st_mode):
+                    subdirectories.append(entry.name)
+                else:
+                    files.append((entry.name, stat_result))
+    except OSError as e:
+        return directory, files, subdirectories, e
+    return directory, files, subdirectories, None
@@ -0,0 +1,280 @@
+"""
+Watch mode for Digital Janitor Pro
+Reports new arrivals in the target folder via inotify, or by polling
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+WATCH_BACKENDS = ('auto', 'inotify', 'poll')
+
+
+class InotifyWatcher:
+    """Directory watcher built on Linux inotify through ctypes
+
+    wait() returns (path, removed) pairs for files that were created,
+    written, closed or moved in (removed=False) or deleted or moved away
+    (removed=True). With recursive=True new sub-directories are watched as
+    they appear, and files already inside a directory moved in are reported.
+    """
+
+    def __init__(self, root_dir, recursive=False, max_depth=None, enter_directory=None):
+        """enter_directory(path, depth) returns False for directories not to watch"""
+        self.root_dir = os.fspath(root_dir)
+        self.recursive = recursive
+        self.max_depth = max_depth
+        self.enter_directory = enter_directory
+        self._libc = _load_libc()
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise _ctypes_error()
+        self.watches = {}
+        self._add_tree(self.root_dir, 0, report=False)
+
+    def _add_watch(self, directory, depth):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise _ctypes_error(directory)
+        self.watches[wd] = (directory, depth)
+
+    def _add_tree(self, directory, depth, report=True):
+        """Watch a directory (and its sub-directories when recursive)
+
+        Returns the files found inside when report is True, since files
+        created before the watch was added produce no events.
+        """
+        found = []
+        stack = [(directory, depth)]
+        while stack:
+            current, current_depth = stack.pop()
+            try:
+                self._add_watch(current, current_depth)
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self._should_enter(entry.path, current_depth):
+                                stack.append((entry.path, current_depth + 1))
+                        elif report and entry.is_file(follow_symlinks=False):
+                            found.append((entry.path, False))
+            except OSError as e:
+                print(f"Error watching {current}: {e}")
+        return found
+
+    def _should_enter(self, path, depth):
+        if not self.recursive:
+            return False
+        if self.max_depth is not None and depth >= self.max_depth:
+            return False
+        return self.enter_directory is None or self.enter_directory(path, depth)
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds and return the file changes seen"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        changes = []
+        while True:
+            try:
+                data = os.read(self.fd, _READ_SIZE)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            changes.extend(self._parse(data))
+        return changes
+
+    def _parse(self, data):
+        changes = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            raw_name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length]
+            offset += _EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                changes.extend(self._rescan())
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            watched = self.watches.get(wd)
+            if watched is None or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                continue
+
+            directory, depth = watched
+            path = os.path.join(directory, os.fsdecode(raw_name.rstrip(b'\0')))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and self._should_enter(path, depth):
+                    changes.extend(self._add_tree(path, depth + 1))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                changes.append((path, True))
+            else:
+                changes.append((path, False))
+        return changes
+
+    def _rescan(self):
+        """Report every file in the watched directories after the event queue overflowed"""
+        changes = []
+        for directory, _depth in list(self.watches.values()):
+            try:
+                with os.scandir(directory) as entries:
+                    changes.extend((entry.path, False) for entry in entries
+                                   if entry.is_file(follow_symlinks=False))
+            except OSError:
+                continue
+        return changes
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """Fallback watcher that compares directory listings every poll_interval seconds
+
+    Only the watched directories are listed (one scandir each, no hashing);
+    a file is reported when it first appears or its size or mtime changes.
+    """
+
+    def __init__(self, root_dir, recursive=False, max_depth=None, enter_directory=None,
+                 poll_interval=2.0):
+        self.root_dir = os.fspath(root_dir)
+        self.recursive = recursive
+        self.max_depth = max_depth
+        self.enter_directory = enter_directory
+        self.poll_interval = poll_interval
+        self._next_poll = 0.0
+        self.snapshot = self._list()
+
+    def _list(self):
+        snapshot = {}
+        stack = [(self.root_dir, 0)]
+        while stack:
+            directory, depth = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive and (self.max_depth is None or depth < self.max_depth) and \
+                                    (self.enter_directory is None or self.enter_directory(entry.path, depth)):
+                                stack.append((entry.path, depth + 1))
+                        elif entry.is_file(follow_symlinks=False):
+                            entry_stat = entry.stat(follow_symlinks=False)
+                            snapshot[entry.path] = (entry_stat.st_size, entry_stat.st_mtime_ns)
+            except OSError:
+                continue
+        return snapshot
+
+    def wait(self, timeout):
+        delay = self._next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return []
+        if delay > 0:
+            time.sleep(delay)
+        self._next_poll = time.monotonic() + self.poll_interval
+
+        previous = self.snapshot
+        self.snapshot = self._list()
+        changes = [(path, False) for path, state in self.snapshot.items() if previous.get(path) != state]
+        changes.extend((path, True) for path in previous if path not in self.snapshot)
+        return changes
+
+    def close(self):
+        pass
+
+
+def create_watcher(root_dir, backend='auto', recursive=False, max_depth=None,
+                   enter_directory=None, poll_interval=2.0):
+    """Create an inotify watcher, falling back to polling where inotify is unavailable"""
+    if backend not in WATCH_BACKENDS:
+        raise ValueError(f"Unknown watch backend: {backend}")
+    if backend != 'poll':
+        try:
+            return InotifyWatcher(root_dir, recursive, max_depth, enter_directory)
+        except (OSError, AttributeError) as e:
+            if backend == 'inotify':
+                raise
+            print(f"inotify is not available ({e}), polling every {poll_interval}s instead")
+    return PollingWatcher(root_dir, recursive, max_depth, enter_directory, poll_interval)
+
+
+def iter_arrivals(watcher, debounce=1.0, batch_delay=1.0, batch_size=500, stop=None):
+    """Yield batches of files that have settled, until stop (a threading.Event) is set
+
+    A file is ready once no change has been seen for debounce seconds, so
+    files still being written are left alone. Ready files are collected
+    and yielded together once batch_size is reached or the oldest ready
+    file has waited batch_delay seconds.
+    """
+    pending = {}
+    ready = []
+    ready_since = None
+    while stop is None or not stop.is_set():
+        now = time.monotonic()
+        timeouts = [debounce]
+        if pending:
+            timeouts.append(max(0.0, min(pending.values()) + debounce - now))
+        if ready:
+            timeouts.append(max(0.0, ready_since + batch_delay - now))
+        for path, removed in watcher.wait(min(timeouts)):
+            if removed:
+                pending.pop(path, None)
+            else:
+                pending[path] = time.monotonic()
+
+        now = time.monotonic()
+        for path, seen in list(pending.items()):
+            if now - seen >= debounce:
+                del pending[path]
+                if not ready:
+                    ready_since = now
+                ready.append(path)
+
+        while len(ready) >= batch_size:
+            yield ready[:batch_size]
+            ready = ready[batch_size:]
+            ready_since = now
+        if ready and now - ready_since >= batch_delay:
+            yield ready
+            ready = []
+
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+def _ctypes_error(path=None):
+    code = ctypes.get_errno()
+    return OSError(code, os.strerror(code), path)
@@ -2,18 +2,46 @@
 """
 DIGITAL JANITOR PRO - Main Application Entry Point
 DATE-FIRST organization: Year/Month/Type structure
+
+Without target folders the janitor asks for one and confirms interactively.
+With targets it runs unattended in one process; several folders to organize
+share one worker pool:
+    python main.py --yes /srv/inbox/alice /srv/inbox/bob
+    python main.py restore --yes /srv/inbox/alice
+    python main.py verify --full --yes /srv/inbox/alice
+    python main.py tier --dry-run --yes /srv/inbox/alice
 """
 
-import datetime
+import argparse
+import json
+import sys
+from contextlib import nullcontext, redirect_stdout
 from pathlib import Path
 
-# Import our custom modules
-from utils.logger import write_to_log
-from config.config_manager import load_config, interactive_config_setup
-from core.organizer import FileOrganizer
+# Everything else is imported when a run needs it, so --help and checks start instantly
+
+COMMANDS = ("organize", "restore", "verify", "tier")
+CONFIG_FILE_NAME = 'janitor_config.json'
+
+# Replaced by the target folder's name in per-target output paths
+TARGET_NAME_FIELD = '{name}'
+
+
+def validate_target(root_dir):
+    """Return why root_dir cannot be a target folder, or None if it can"""
+    if not root_dir.exists():
+        return f"Path '{root_dir}' does not exist!"
+    if not root_dir.is_dir():
+        return f"Path '{root_dir}' is not a folder!"
+
+    # Check if it's current project directory
+    current_dir = Path.cwd()
+    if root_dir == current_dir or root_dir in current_dir.parents:
+        return f"Cannot organize project directory! Current dir: {current_dir}"
+    return None
 
 
-def get_target_directory():
+def get_target_directory(command="organize"):
     """Get and validate target directory from user"""
     while True:
         user_input = input('Please enter the full path to target folder: ').strip()
@@ -24,22 +52,25 @@ def get_target_directory():
             continue
 
         root_dir = Path(user_input)
-
-        # Check if exists
-        if not root_dir.exists():
-            print(f"Path '{user_input}' does not exist! Please try again.")
-            continue
-
-        # Check if it's current project directory
-        current_dir = Path.cwd()
-        if root_dir == current_dir or root_dir in current_dir.parents:
-            print(f"Cannot organize project directory! Current dir: {current_dir}")
-            print("Choose a different folder outside your project.")
+        problem = validate_target(root_dir)
+        if problem is not None:
+            print(problem)
+            print("Please choose a different folder.")
             continue
 
         # Safety confirmation
-        print(f"\nWill organize folder: {root_dir}")
-        print(f"Will create Year/Month/Type structure directly in this folder")
+        if command == "restore":
+            print(f"\nWill restore folder: {root_dir}")
+            print("Every journaled move will be undone, newest first")
+        elif command == "verify":
+            print(f"\nWill verify folder: {root_dir}")
+            print("The organized tree is checked against the recorded moves, nothing is changed")
+        elif command == "tier":
+            print(f"\nWill tier folder: {root_dir}")
+            print("Cold month folders are compressed, archived or moved as the tiering rules say")
+        else:
+            print(f"\nWill organize folder: {root_dir}")
+            print(f"Will create Year/Month/Type structure directly in this folder")
         confirm = input("Continue? (y/n): ").strip().lower()
 
         if confirm == 'y':
@@ -49,126 +80,552 @@ def get_target_directory():
             continue
 
 
-def main():
-    """Main application function"""
-    print("DIGITAL JANITOR PRO - DATE-FIRST File Organization")
-    print("=" * 60)
-
-    # Get target directory
-    root_dir = get_target_directory()
-
-    # Setup logging
-    log_file = root_dir / 'digital_janitor_log.txt'
-    write_to_log('=== DIGITAL JANITOR PRO STARTED (DATE-FIRST) ===', log_file)
-    write_to_log(f"Target directory: {root_dir}", log_file)
-
-    # Load or create configuration
-    config_file_path = root_dir / 'janitor_config.json'
-    config = load_config(config_file_path)
-    write_to_log(f"Config loaded: {config_file_path}", log_file)
-
-    # Optional configuration customization
-    if not config_file_path.exists() or input("\nCustomize settings? (y/n): ").strip().lower() == 'y':
-        config = interactive_config_setup(config_file_path)
-        write_to_log("User customized configuration", log_file)
-
-    # Create simple restore script for date structure
-    print("Generating restore script...")
-    restore_script_path = root_dir / 'restore_date_structure.py'
-    restore_code = f'''#!/usr/bin/env python3
-"""
-DIGITAL JANITOR PRO - DATE STRUCTURE RESTORE SCRIPT
-Generated: {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-Restores files from Year/Month/Type structure back to root directory.
-"""
-
-import shutil
-from pathlib import Path
+def parse_args(argv=None):
+    """Parse command line options
+
+    The first positional argument is the command when it is one of
+    COMMANDS; the rest are target folders.
+    """
+    parser = argparse.ArgumentParser(
+        description="Digital Janitor Pro - DATE-FIRST file organization",
+        epilog="Without targets the folder is asked for interactively. Output paths may "
+               "contain {name}, replaced by each target folder's name.")
+    parser.add_argument("targets", nargs="*", metavar="[COMMAND] TARGET",
+                        help="organize (default), restore, verify or tier, then the folders to work on")
+    parser.add_argument("-c", "--config", metavar="FILE",
+                        help=f"config file for every target (default: {CONFIG_FILE_NAME} in each target)")
+    parser.add_argument("-y", "--yes", action="store_true",
+                        help="do not ask for confirmation (required when stdin is not a terminal)")
+    parser.add_argument("--output-format", choices=["text", "json"], default="text",
+                        help="report per target as text, or as one JSON object per line")
+    parser.add_argument("--run", metavar="RUN_ID",
+                        help="with restore: only undo this run from the journal")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="hash files with N parallel workers (overrides features.workers, "
+                             "or verify.workers / tiering.workers for verify / tier)")
+    parser.add_argument("--recursive", action="store_true",
+                        help="organize files in nested folders too (same as scan.recursive)")
+    parser.add_argument("--log-format", choices=["text", "json"],
+                        help="write the log as text or JSON lines (overrides features.log_format)")
+    parser.add_argument("--duplicate-policy", choices=["move", "hardlink", "reflink", "delete"],
+                        help="move duplicates aside, or replace them with a hard link or reflink to the "
+                             "original, or delete them (overrides features.duplicate_policy)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and organize new files as they arrive")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted run from its last checkpoint")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only print the planned moves (or, with tier, the folders to tier), "
+                             "change nothing on disk")
+    parser.add_argument("--plan-format", choices=["text", "json", "csv"], default="text",
+                        help="format of the dry-run plan (default: text)")
+    parser.add_argument("--plan-output", metavar="FILE",
+                        help="write the dry-run plan to FILE instead of the screen")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write run metrics to FILE (overrides metrics.output)")
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"],
+                        help="json or a Prometheus textfile (overrides metrics.format)")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="profile the run with cProfile and save the stats to FILE")
+    parser.add_argument("--full", action="store_true",
+                        help="with verify: re-hash files whose digest was recorded (all files only with "
+                             "verify.record_hashes; the rest, and moved folders, keep the quick check)")
+    parser.add_argument("--io-budget", type=float, metavar="MB",
+                        help="with verify: read at most MB megabytes per second in total "
+                             "(overrides verify.io_budget_mb)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="trace memory allocations and report the peak and top allocation sites")
+    parser.add_argument("--parallel-roots", type=int, default=4, metavar="N",
+                        help="with several targets: organize N of them at a time (default: 4)")
+    parser.add_argument("--duplicate-scope", choices=["root", "global"], default="root",
+                        help="with several targets: look for duplicates within each folder (default) "
+                             "or across all of them")
+    args = parser.parse_intermixed_args(argv)
+
+    args.command = "organize"
+    if args.targets and args.targets[0] in COMMANDS:
+        args.command = args.targets.pop(0)
+
+    if len(args.targets) > 1:
+        if args.watch:
+            parser.error("--watch takes a single target")
+        # --profile covers the whole batch, so it needs no {name}
+        for option in ("plan_output", "metrics"):
+            value = getattr(args, option)
+            if value and TARGET_NAME_FIELD not in value:
+                parser.error(f"--{option.replace('_', '-')} needs {TARGET_NAME_FIELD} in its path "
+                             f"with several targets")
+    if args.run and args.command != "restore":
+        parser.error("--run only applies to restore")
+    if (args.full or args.io_budget is not None) and args.command != "verify":
+        parser.error("--full and --io-budget only apply to verify")
+    if args.parallel_roots < 1:
+        parser.error("--parallel-roots must be at least 1")
+    return args
+
+
+def target_path(template, root_dir):
+    """Output path for one target: {name} becomes the target folder's name"""
+    if not template:
+        return template
+    return template.replace(TARGET_NAME_FIELD, root_dir.name)
+
+
+def load_target_config(root_dir, args):
+    """Config for a target: --config, or its own config file (created with defaults if missing,
+    except for dry runs)"""
+    from config.config_manager import load_config
+
+    config_file_path = Path(args.config) if args.config else root_dir / CONFIG_FILE_NAME
+    if args.command in ("restore", "verify", "tier") and not config_file_path.exists():
+        return {}, config_file_path
+    # A dry run leaves the target untouched, config file included
+    return load_config(config_file_path, create=not args.dry_run), config_file_path
+
+
+def apply_overrides(config, args, root_dir):
+    """Command line options win over the config file"""
+    features = config.setdefault('features', {})
+    if args.log_format is not None:
+        features['log_format'] = args.log_format
+    if args.workers is not None:
+        features['workers'] = args.workers
+        if args.command == "verify":
+            config.setdefault('verify', {})['workers'] = args.workers
+        elif args.command == "tier":
+            config.setdefault('tiering', {})['workers'] = args.workers
+    if args.duplicate_policy is not None:
+        features['duplicate_policy'] = args.duplicate_policy
+    if args.recursive:
+        config.setdefault('scan', {})['recursive'] = True
+    metrics_config = config.setdefault('metrics', {})
+    if args.metrics is not None:
+        metrics_config['output'] = args.metrics
+    metrics_config['output'] = target_path(metrics_config.get('output'), root_dir)
+    if args.metrics_format is not None:
+        metrics_config['format'] = args.metrics_format
+
+
+def open_logger(root_dir, config):
+    """Logger for a target (nothing is written until the first entry is flushed)"""
+    from utils.logger import JanitorLogger, LOG_FILE_NAME, JSON_LOG_FILE_NAME
+
+    json_lines = config.get('features', {}).get('log_format', 'text') == 'json'
+    log_file = root_dir / (JSON_LOG_FILE_NAME if json_lines else LOG_FILE_NAME)
+    return JanitorLogger(log_file, json_lines=json_lines), log_file
+
+
+def run_dry_run(root_dir, config, logger, plan_format, plan_output):
+    """Print or export the move plan without touching the disk"""
+    from core.organizer import FileOrganizer
+    from core.planner import PlanWriter
+
+    print("\nPlanning DATE-FIRST organization (dry run, nothing will be changed)...\n")
+    organizer = FileOrganizer(root_dir, config, logger)
+    writer = PlanWriter(root_dir, plan_output, plan_format)
+    for plan in organizer.plan_files():
+        writer.write(plan)
+    summary = writer.close()
+
+    if plan_output or plan_format != 'text':
+        print("\n" + "\n".join(summary.lines()))
+    if plan_output:
+        print(f"Plan written to: {plan_output}")
+    return summary
+
+
+def run_restore(root_dir, config, logger, run_id=None):
+    """Undo journaled operations, newest first"""
+    from core.journal import JournalRestorer
+    from core.mover import MoveEngine
+
+    print("\nRestoring original structure from the journal...")
+    logger.log('=== DIGITAL JANITOR PRO RESTORE STARTED ===')
+    logger.log(f"Target directory: {root_dir}")
+    restorer = JournalRestorer(root_dir, logger, MoveEngine.from_config(config))
+    result = restorer.restore(run_id)
+    for line in result.lines():
+        logger.log(line)
+    logger.log('=== RESTORE COMPLETED ===')
+    logger.close()
+
+    print("\n" + "\n".join(result.lines()))
+    if result.missing or result.conflicts:
+        print("Run restore again after fixing these to finish; restored items are not touched twice.")
+    return result
+
+
+def log_run_header(root_dir, logger, args, config_file_path, customized=False):
+    """Log the start of an organize run and the options it was given"""
+    logger.log('=== DIGITAL JANITOR PRO STARTED (DATE-FIRST) ===')
+    logger.log(f"Target directory: {root_dir}")
+    logger.log(f"Config loaded: {config_file_path}")
+    if customized:
+        logger.log("User customized configuration")
+    if args.workers is not None:
+        logger.log(f"Workers set from command line: {args.workers}")
+    if args.recursive:
+        logger.log("Recursive scan enabled from command line")
+    if args.duplicate_policy is not None:
+        logger.log(f"Duplicate policy set from command line: {args.duplicate_policy}")
+    if args.watch:
+        logger.log("Watch mode enabled from command line")
+
+
+def write_metrics(metrics, config):
+    """Write a run's metrics to metrics.output, if set; returns the path written"""
+    metrics_config = config.get('metrics', {})
+    metrics_output = metrics_config.get('output')
+    if metrics_output:
+        metrics.write(metrics_output, metrics_config.get('format', 'json'))
+    return metrics_output
+
+
+def run_verify(root_dir, config, logger, full=False, io_budget_mb=None):
+    """Check the organized tree against the recorded moves; returns the VerifyReport, or None
+    when nothing was recorded"""
+    from core.verify import ExpectedFiles, TreeVerifier
+
+    verify_config = config.get('verify', {})
+    mode = 'full' if full else verify_config.get('mode', 'quick')
+    if io_budget_mb is None:
+        io_budget_mb = verify_config.get('io_budget_mb', 0)
+
+    expected = ExpectedFiles.open_existing(root_dir)
+    if expected is None:
+        print("\nNothing to verify: no run has recorded its moves in this folder yet.")
+        return None
+
+    print(f"\nVerifying organized files ({mode})...")
+    logger.log('=== DIGITAL JANITOR PRO VERIFY STARTED ===')
+    logger.log(f"Target directory: {root_dir}")
+    try:
+        verifier = TreeVerifier(root_dir, expected, mode, workers=verify_config.get('workers', 4),
+                                io_budget=int(io_budget_mb * 1024 * 1024) or None, logger=logger)
+        report = verifier.verify()
+    finally:
+        expected.close()
+    for line in report.lines()[:2]:
+        logger.log(line)
+    logger.log('=== VERIFY COMPLETED ===')
+    logger.close()
+
+    print("\n" + "\n".join(report.lines()))
+    return report
+
+
+def run_tier(root_dir, config, logger, dry_run=False):
+    """Compress, archive or move the cold month folders the tiering rules select; returns the
+    TierReport, or None when no rules are configured"""
+    from core.tiering import Tierer
+
+    tierer = Tierer.from_config(root_dir, config, logger)
+    if not tierer.rules:
+        print("\nNothing to tier: no tiering rules are configured (tiering.rules).")
+        return None
+
+    if dry_run:
+        print("\nPlanning tiering (dry run, nothing will be changed)...")
+    else:
+        print("\nTiering cold month folders...")
+        logger.log('=== DIGITAL JANITOR PRO TIERING STARTED ===')
+        logger.log(f"Target directory: {root_dir}")
+        for rule in tierer.rules:
+            logger.log(f"Rule: {rule.describe()}")
+    report = tierer.run(dry_run)
+    if not dry_run:
+        logger.log(report.lines()[0])
+        logger.log('=== TIERING COMPLETED ===')
+    logger.close()
 
-def restore_files():
-    """Restore all files from date structure to root"""
-    print("Starting restore process...")
-
-    root_dir = Path("{root_dir}")
-    restored_count = 0
-
-    # Go through all year directories
-    for year_dir in root_dir.iterdir():
-        if year_dir.is_dir() and year_dir.name.isdigit() and len(year_dir.name) == 4:
-            print(f"Processing year {{year_dir.name}}")
-
-            # Go through all month directories
-            for month_dir in year_dir.iterdir():
-                if month_dir.is_dir():
-                    print(f"  Processing month {{month_dir.name}}")
-
-                    # Go through all type directories
-                    for type_dir in month_dir.iterdir():
-                        if type_dir.is_dir():
-                            # Move all files back to root
-                            for file_item in type_dir.iterdir():
-                                if file_item.is_file():
-                                    destination = root_dir / file_item.name
-
-                                    # Handle name conflicts
-                                    counter = 1
-                                    while destination.exists():
-                                        stem = file_item.stem
-                                        suffix = file_item.suffix
-                                        destination = root_dir / f"{{stem}}_restored_{{counter}}{{suffix}}"
-                                        counter += 1
-
-                                    try:
-                                        shutil.move(file_item, destination)
-                                        print(f"    Restored: {{file_item.name}}")
-                                        restored_count += 1
-                                    except Exception as e:
-                                        print(f"    Error: {{e}}")
-
-    # Remove empty year directories
-    for year_dir in root_dir.iterdir():
-        if year_dir.is_dir() and year_dir.name.isdigit() and len(year_dir.name) == 4:
-            try:
-                if not any(year_dir.rglob('*')):  # If empty
-                    shutil.rmtree(year_dir)
-                    print(f"Removed empty year directory: {{year_dir.name}}")
-            except:
-                pass
-
-    print(f"\\nRestore complete! Restored {{restored_count}} files.")
+    print("\n" + "\n".join(report.lines()))
+    return report
 
-if __name__ == "__main__":
-    confirm = input("WARNING: This will restore all files to root directory. Continue? (y/n): ")
-    if confirm.lower() == 'y':
-        restore_files()
-    else:
-        print("Restore cancelled.")
-'''
 
-    with open(restore_script_path, 'w') as f:
-        f.write(restore_code)
+def run_organize(root_dir, config, logger, args, config_file_path, customized=False):
+    """Organize one folder (or watch it) and return the FileOrganizer"""
+    from core.organizer import FileOrganizer
+    from utils.metrics import Profiler
 
-    write_to_log(f"Restore script created: {restore_script_path}", log_file)
+    log_run_header(root_dir, logger, args, config_file_path, customized)
 
     # Initialize and run file organizer
     print("\nStarting DATE-FIRST file organization...")
-    organizer = FileOrganizer(root_dir, config, log_file)
-    organizer.organize_files()
+    organizer = FileOrganizer(root_dir, config, logger)
+    with Profiler(organizer.metrics, target_path(args.profile, root_dir), args.trace_memory) as profiler:
+        if args.watch:
+            watch = config.get('watch', {})
+            print("Watching for new files (press Ctrl+C to stop)...")
+            organizer.watch_files(organizer.create_watcher(),
+                                  debounce=watch.get('debounce_seconds', 1.0),
+                                  batch_delay=watch.get('batch_seconds', 1.0),
+                                  batch_size=watch.get('batch_size', 500))
+        else:
+            organizer.organize_files(resume=args.resume)
 
     # Final completion message
-    write_to_log("=== DATE-FIRST ORGANIZATION COMPLETED ===", log_file)
+    logger.log("=== DATE-FIRST ORGANIZATION COMPLETED ===")
+    logger.close()
+
+    metrics_output = write_metrics(organizer.metrics, config)
 
     print("\nORGANIZATION COMPLETE!")
     print("=" * 60)
+    print("\n".join(organizer.metrics.summary_lines()))
+    if profiler.report_lines:
+        print("\n".join(profiler.report_lines))
+    if metrics_output:
+        print(f"Metrics written to: {metrics_output}")
+    return organizer
+
+
+def print_organize_footer(organizer, log_file, config_file_path):
+    """Errors of the run and where to find the log, config and journal"""
+    from core.hash_index import INDEX_DIR_NAME
+    from core.journal import JOURNAL_FILE_NAME
+
+    errors = organizer.error_report()
+    if errors:
+        print(f"{len(errors)} files could not be organized:")
+        for name, reason in errors[:10]:
+            print(f"   {name}: {reason}")
+        if len(errors) > 10:
+            print(f"   ... see {log_file.name} for the rest")
     print(f"Log file: {log_file.name}")
     print(f"Config file: {config_file_path.name}")
-    print(f"Restore script: {restore_script_path.name}")
-    print("\nFiles organized by: Year/Month/Type structure")
-    print("Example: 2025/08/images/photo.jpg")
-    print("\nTO RESTORE ORIGINAL STRUCTURE:")
-    print(f"   cd {root_dir}")
-    print("   python restore_date_structure.py")
+    print(f"Journal: {INDEX_DIR_NAME}/{JOURNAL_FILE_NAME}")
+
+
+def run_target(root_dir, args, config, config_file_path, customized=False):
+    """Run the chosen command on one folder and return its report entry"""
+    apply_overrides(config, args, root_dir)
+    logger, log_file = open_logger(root_dir, config)
+    report = {'target': str(root_dir), 'command': args.command, 'status': 'ok'}
+
+    if args.command == "restore":
+        result = run_restore(root_dir, config, logger, args.run)
+        report['restore'] = result.to_dict()
+        if result.missing or result.conflicts:
+            report['status'] = 'incomplete'
+    elif args.command == "verify":
+        result = run_verify(root_dir, config, logger, args.full, args.io_budget)
+        if result is None:
+            report['status'] = 'failed'
+            report['error'] = "no recorded moves to verify"
+        else:
+            report['verify'] = result.to_dict()
+            if not result.clean:
+                report['status'] = 'errors'
+    elif args.command == "tier":
+        result = run_tier(root_dir, config, logger, args.dry_run)
+        if result is None:
+            report['status'] = 'failed'
+            report['error'] = "no tiering rules configured"
+        else:
+            report['tier'] = result.to_dict()
+            if result.failed:
+                report['status'] = 'errors'
+    elif args.dry_run:
+        summary = run_dry_run(root_dir, config, logger, args.plan_format,
+                              target_path(args.plan_output, root_dir))
+        report['command'] = 'dry-run'
+        report['plan'] = summary.to_dict()
+    else:
+        organizer = run_organize(root_dir, config, logger, args, config_file_path, customized)
+        print_organize_footer(organizer, log_file, config_file_path)
+        add_organize_report(report, organizer, log_file)
+    return report
+
+
+def add_organize_report(report, organizer, log_file):
+    """Fill a report entry from a finished organize run"""
+    errors = organizer.error_report()
+    report.update(operations=organizer.operations_done,
+                  duplicates=organizer.duplicate_count,
+                  reclaimed_bytes=organizer.metrics.counters['bytes_reclaimed'],
+                  errors=[{'file': name, 'reason': reason} for name, reason in errors],
+                  metrics=organizer.metrics.to_dict(),
+                  log_file=str(log_file))
+    if errors:
+        report['status'] = 'errors'
+
+
+def prepare_target(root_dir, args):
+    """Config for a batch target, or the report entry saying why it cannot run"""
+    problem = validate_target(root_dir)
+    if problem is not None:
+        print(problem)
+        return None, None, failed_report(root_dir, args, problem)
+    try:
+        config, config_file_path = load_target_config(root_dir, args)
+    except Exception as e:
+        print(f"FAILED {root_dir}: {e}")
+        return None, None, failed_report(root_dir, args, e)
+    if not sys.stdout.isatty():
+        # No \r progress lines in cron mail or redirected output
+        config.setdefault('transfer', {})['progress'] = False
+    return config, config_file_path, None
+
+
+def failed_report(root_dir, args, error):
+    return {'target': str(root_dir), 'command': args.command, 'status': 'failed', 'error': str(error)}
+
+
+def run_interactive(args):
+    """Ask for the folder and settings, then run on it"""
+    from config.config_manager import interactive_config_setup
+
+    print("DIGITAL JANITOR PRO - DATE-FIRST File Organization")
+    print("=" * 60)
+
+    # Get target directory
+    root_dir = get_target_directory(args.command)
+
+    # Load or create configuration
+    config, config_file_path = load_target_config(root_dir, args)
+
+    # Optional configuration customization
+    customized = False
+    if args.command == "organize" and not args.dry_run and (
+            not config_file_path.exists() or input("\nCustomize settings? (y/n): ").strip().lower() == 'y'):
+        config = interactive_config_setup(config_file_path)
+        customized = True
+
+    report = run_target(root_dir, args, config, config_file_path, customized)
+    if args.command == "organize" and not args.dry_run:
+        print("\nFiles organized by: Year/Month/Type structure")
+        print("Example: 2025/08/images/photo.jpg")
+        print("\nTO RESTORE ORIGINAL STRUCTURE:")
+        print("   python main.py restore")
+    return 0 if report['status'] == 'ok' else 1
+
+
+def run_batch(args):
+    """Run on every target folder without prompting; returns the exit code
+
+    A target that is invalid or fails is reported and the rest still run.
+    With --output-format json, stdout carries only one JSON object per
+    target and everything else is printed to stderr.
+    """
+    roots = [Path(target) for target in args.targets]
+    json_output = args.output_format == 'json'
+    report_stream = sys.stdout
+
+    if not args.yes:
+        if not sys.stdin.isatty():
+            print("Not running on a terminal: pass --yes to confirm the targets.", file=sys.stderr)
+            return 2
+        print(f"Will {args.command} {len(roots)} folder(s):")
+        for root_dir in roots:
+            print(f"   {root_dir}")
+        if input("Continue? (y/n): ").strip().lower() != 'y':
+            print("Operation cancelled.")
+            return 1
+
+    if args.command == "organize" and not args.dry_run and len(roots) > 1:
+        with redirect_stdout(sys.stderr) if json_output else nullcontext():
+            reports = run_scheduled(roots, args)
+    else:
+        reports = (run_one(root_dir, args, json_output) for root_dir in roots)
+
+    exit_code = 0
+    for report in reports:
+        if json_output:
+            report_stream.write(json.dumps(report, default=str) + "\n")
+            report_stream.flush()
+        if report['status'] != 'ok':
+            exit_code = 1
+    return exit_code
+
+
+def run_one(root_dir, args, json_output):
+    """Run the command on one batch target and return its report entry"""
+    with redirect_stdout(sys.stderr) if json_output else nullcontext():
+        print(f"\n{'=' * 60}\n{root_dir}")
+        config, config_file_path, report = prepare_target(root_dir, args)
+        if report is not None:
+            return report
+        try:
+            return run_target(root_dir, args, config, config_file_path)
+        except Exception as e:
+            print(f"FAILED {root_dir}: {e}")
+            return failed_report(root_dir, args, e)
+
+
+def run_scheduled(roots, args):
+    """Organize several folders over one shared worker pool
+
+    Returns a report entry per target, in order, followed by one for the
+    whole batch ('command': 'batch').
+    """
+    from core.batch import BatchScheduler
+    from utils.metrics import Profiler
+
+    reports = []
+    targets = []  # (report, root_dir, config, logger, log_file, config_file_path)
+    for root_dir in roots:
+        config, config_file_path, report = prepare_target(root_dir, args)
+        if report is None:
+            report = {'target': str(root_dir), 'command': args.command, 'status': 'ok'}
+            apply_overrides(config, args, root_dir)
+            logger, log_file = open_logger(root_dir, config)
+            log_run_header(root_dir, logger, args, config_file_path)
+            targets.append((report, root_dir, config, logger, log_file, config_file_path))
+        reports.append(report)
+
+    print(f"\nStarting DATE-FIRST file organization of {len(targets)} folders "
+          f"({args.parallel_roots} at a time, {args.duplicate_scope} duplicates)...")
+    scheduler = BatchScheduler([(root_dir, config, logger) for _, root_dir, config, logger, _, _ in targets],
+                               workers=args.workers, scope=args.duplicate_scope,
+                               parallel_roots=args.parallel_roots, resume=args.resume)
+    try:
+        with Profiler(scheduler.metrics, args.profile, args.trace_memory) as profiler:
+            batch = scheduler.run()
+    except Exception as e:
+        print(f"FAILED: {e}")
+        for report, root_dir, _, logger, _, _ in targets:
+            logger.close()
+            report.update(status='failed', error=str(e))
+        return reports
+
+    for (report, root_dir, config, logger, log_file, config_file_path), result in zip(targets, batch.results):
+        print(f"\n{'=' * 60}\n{root_dir}")
+        if result.error is not None:
+            logger.log(f"Run stopped: {result.error}", event="error", error=str(result.error))
+        else:
+            logger.log("=== DATE-FIRST ORGANIZATION COMPLETED ===")
+        logger.close()
+        if result.organizer is None:
+            print(f"FAILED {root_dir}: {result.error}")
+            report.update(status='failed', error=str(result.error))
+            continue
+        metrics_output = write_metrics(result.organizer.metrics, config)
+        print("\n".join(result.organizer.metrics.summary_lines()))
+        if metrics_output:
+            print(f"Metrics written to: {metrics_output}")
+        print_organize_footer(result.organizer, log_file, config_file_path)
+        add_organize_report(report, result.organizer, log_file)
+        if result.error is not None:
+            print(f"FAILED {root_dir}: {result.error}")
+            report.update(status='failed', error=str(result.error))
+
+    print(f"\n{'=' * 60}\nBATCH COMPLETE!")
+    print("\n".join(batch.lines()))
+    if profiler.report_lines:
+        print("\n".join(profiler.report_lines))
+    summary = batch.to_dict()
+    summary.update(command='batch', status='ok' if all(report['status'] == 'ok' for report in reports) else 'errors')
+    reports.append(summary)
+    return reports
+
+
+def main(argv=None):
+    """Main application function; returns the process exit code"""
+    args = parse_args(argv)
+    if not args.targets:
+        return run_interactive(args)
+    return run_batch(args)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,29 @@
+"""
+Shared fixtures for the test suite
+"""
+import pytest
+from config.config_manager import load_config
+from core.organizer import FileOrganizer
+
+
+def _organizer_config(root, scan=None, **features):
+    """Default settings for root (without progress output), with scan and features overridden"""
+    config = load_config(root / 'janitor_config.json')
+    config['transfer']['progress'] = False
+    config['scan'].update(scan or {})
+    config['features'].update(features)
+    return config
+
+
+@pytest.fixture
+def organize():
+    """organize(root, scan=None, resume=False, **features): run the organizer once and return it"""
+    def run(root, scan=None, resume=False, **features):
+        organizer = FileOrganizer(root, _organizer_config(root, scan, **features),
+                                  root / 'digital_janitor_log.txt')
+        try:
+            organizer.organize_files(resume=resume)
+        finally:
+            organizer.logger.close()
+        return organizer
+    return run
@@ -0,0 +1,78 @@
+"""
+Batch runs over several roots: per-root and global duplicate detection
+"""
+import pytest
+from config.config_manager import load_config
+from core.batch import BatchScheduler
+
+SHARED = b"same bytes in every root\n" * 64
+
+
+def make_roots(tmp_path, contents):
+    """contents maps a root name to {file name: bytes}"""
+    roots = []
+    for name, files in contents.items():
+        root = tmp_path / name
+        root.mkdir()
+        for file_name, content in files.items():
+            (root / file_name).write_bytes(content)
+        roots.append(root)
+    return roots
+
+
+def run_batch(roots, **kwargs):
+    entries = []
+    for root in roots:
+        config = load_config(root / 'janitor_config.json')
+        config['transfer']['progress'] = False
+        entries.append((root, config, root / 'digital_janitor_log.txt'))
+    report = BatchScheduler(entries, workers=4, **kwargs).run()
+    for result in report.results:
+        if result.organizer is not None:
+            result.organizer.logger.close()
+    return report
+
+
+def duplicates(root):
+    return sorted(path.name for path in root.glob('[0-9]*/*/duplicates/*'))
+
+
+def test_root_scope_keeps_each_root_to_itself(tmp_path):
+    first, second = make_roots(tmp_path, {'first': {'a.bin': SHARED}, 'second': {'b.bin': SHARED}})
+    report = run_batch([first, second], scope='root')
+    assert [result.status for result in report.results] == ['ok', 'ok']
+    assert duplicates(first) == [] and duplicates(second) == []
+
+
+def test_global_scope_finds_duplicates_across_roots(tmp_path):
+    first, second, third = make_roots(tmp_path, {
+        'first': {'a.bin': SHARED, 'own.bin': b'only in first'},
+        'second': {'b.bin': SHARED},
+        'third': {'c.bin': SHARED, 'd.bin': SHARED},
+    })
+    report = run_batch([first, second, third], scope='global')
+    assert [result.status for result in report.results] == ['ok', 'ok', 'ok']
+    # The root given first keeps the original
+    assert list(first.glob('[0-9]*/*/*/a.bin')) and duplicates(first) == []
+    assert duplicates(second) == ['b_duplicate_1.bin']
+    assert [name[0] for name in duplicates(third)] == ['c', 'd']
+    assert report.to_dict()['metrics']['counters']['duplicates'] == 3
+
+
+def test_global_scope_matches_roots_organized_in_earlier_waves(tmp_path):
+    roots = make_roots(tmp_path, {f"root{index}": {f"f{index}.bin": SHARED} for index in range(3)})
+    run_batch(roots, scope='global', parallel_roots=1)
+    assert [duplicates(root) for root in roots] == [[], ['f1_duplicate_1.bin'], ['f2_duplicate_1.bin']]
+
+
+def test_global_scope_matches_files_organized_by_an_earlier_batch(tmp_path):
+    first, second = make_roots(tmp_path, {'first': {'a.bin': SHARED}, 'second': {}})
+    run_batch([first, second], scope='global')
+    (second / 'late.bin').write_bytes(SHARED)
+    run_batch([first, second], scope='global')
+    assert duplicates(second) == ['late_duplicate_1.bin']
+
+
+def test_unknown_scope_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        BatchScheduler([], scope='everywhere')
@@ -0,0 +1,82 @@
+"""
+Duplicate detection: size buckets, partial hashes and full hashes
+"""
+import builtins
+import pytest
+from core.duplicates import DuplicateFinder
+from core.file_operations import FileRecord
+
+PARTIAL = 16
+
+
+def make_files(directory, contents):
+    records = []
+    for name, content in contents.items():
+        path = directory / name
+        path.write_bytes(content)
+        records.append(FileRecord.from_path(path))
+    return records
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Paths opened through open() while the test runs"""
+    paths = []
+    real_open = builtins.open
+
+    def tracking_open(file, *args, **kwargs):
+        paths.append(str(file))
+        return real_open(file, *args, **kwargs)
+    monkeypatch.setattr(builtins, 'open', tracking_open)
+    return paths
+
+
+def test_files_with_a_unique_size_are_never_opened(tmp_path, opened):
+    records = make_files(tmp_path, {'a': b'x' * 10, 'b': b'y' * 11, 'c': b'z' * 12})
+    finder = DuplicateFinder(partial_bytes=PARTIAL)
+    assert finder.find_duplicates(records) == {}
+    assert opened == []
+    assert finder.metrics.counters['files_hashed'] == 0
+
+
+def test_identical_files_are_duplicates_of_the_first_one(tmp_path):
+    content = b'same' * 100
+    records = make_files(tmp_path, {'first': content, 'second': content, 'third': content,
+                                    'other': b'diff' * 100})
+    duplicates = DuplicateFinder(partial_bytes=PARTIAL).find_duplicates(records)
+    assert duplicates == {tmp_path / 'second': tmp_path / 'first', tmp_path / 'third': tmp_path / 'first'}
+
+
+def test_different_partial_hashes_skip_the_full_hash(tmp_path):
+    records = make_files(tmp_path, {'a': b'a' * 100, 'b': b'b' * 100})
+    finder = DuplicateFinder(partial_bytes=PARTIAL)
+    assert finder.find_duplicates(records) == {}
+    assert finder.metrics.counters['files_hashed'] == 2
+    assert finder.full_hashes == {}
+
+
+def test_partial_hash_collision_is_settled_by_the_full_hash(tmp_path):
+    # Same head and tail, different middle
+    edge = b'e' * PARTIAL
+    records = make_files(tmp_path, {'a': edge + b'1' * 50 + edge, 'b': edge + b'2' * 50 + edge})
+    finder = DuplicateFinder(partial_bytes=PARTIAL)
+    assert finder.find_duplicates(records) == {}
+    assert finder.partial_hashes[tmp_path / 'a'] == finder.partial_hashes[tmp_path / 'b']
+    assert finder.full_hashes[tmp_path / 'a'] != finder.full_hashes[tmp_path / 'b']
+    assert finder.metrics.counters['files_hashed'] == 4
+
+
+def test_small_files_are_not_read_twice(tmp_path):
+    # Head and tail cover the whole file, so the partial hash is the full hash
+    records = make_files(tmp_path, {'a': b'small', 'b': b'small'})
+    finder = DuplicateFinder(partial_bytes=PARTIAL)
+    assert finder.find_duplicates(records) == {tmp_path / 'b': tmp_path / 'a'}
+    assert finder.metrics.counters['files_hashed'] == 2
+
+
+def test_worker_pool_gives_the_same_result(tmp_path):
+    contents = {f"f{index}": bytes([index % 3]) * 200 for index in range(12)}
+    records = make_files(tmp_path, contents)
+    serial = DuplicateFinder(partial_bytes=PARTIAL).find_duplicates(records)
+    pooled = DuplicateFinder(partial_bytes=PARTIAL, workers=4).find_duplicates(records)
+    assert serial == pooled and len(serial) == 9
@@ -0,0 +1,59 @@
+"""
+The persistent hash index across runs
+"""
+from core.file_operations import FileRecord
+from core.hash_index import HashIndex
+
+CONTENT = b"indexed content\n" * 64
+
+
+def add_file(root, name):
+    (root / name).write_bytes(CONTENT)
+
+
+def duplicates(root):
+    return sorted(path.name for path in root.glob('[0-9]*/*/duplicates/*'))
+
+
+def test_digests_are_reused_by_later_runs(tmp_path, organize):
+    root = tmp_path / 'root'
+    root.mkdir()
+    add_file(root, 'a.bin')
+    add_file(root, 'b.bin')
+    first = organize(root)
+    assert first.metrics.counters['files_hashed'] == 2
+
+    add_file(root, 'c.bin')
+    second = organize(root)
+    # Only the new arrival is read; the organized original's digest comes from the index
+    assert second.metrics.counters['files_hashed'] == 1
+    assert duplicates(root) == ['b_duplicate_1.bin', 'c_duplicate_1.bin']
+
+
+def test_digests_are_dropped_when_the_algorithm_changes(tmp_path, organize):
+    root = tmp_path / 'root'
+    root.mkdir()
+    add_file(root, 'a.bin')
+    organize(root)
+    index = HashIndex(root)
+    index.store(FileRecord.from_path(next(root.glob('[0-9]*/*/*/a.bin'))), digest='md5-digest', organized=True)
+    index.close()
+
+    add_file(root, 'c.bin')
+    later = organize(root, hash_algorithm='sha256')
+    # The original is read again instead of trusting its md5 digest
+    assert later.metrics.counters['files_hashed'] == 2
+    assert duplicates(root) == ['c_duplicate_1.bin']
+
+
+def test_a_changed_file_is_not_trusted(tmp_path):
+    path = tmp_path / 'a.bin'
+    path.write_bytes(CONTENT)
+    index = HashIndex(tmp_path)
+    try:
+        index.store(FileRecord.from_path(path), partial='p', digest='d', organized=True)
+        assert index.get_hashes(FileRecord.from_path(path)) == ('p', 'd')
+        path.write_bytes(CONTENT + b'more')
+        assert index.get_hashes(FileRecord.from_path(path)) == (None, None)
+    finally:
+        index.close()
@@ -0,0 +1,52 @@
+"""
+Restore and the indexes it keeps in step
+"""
+import os
+from core.file_operations import FileRecord
+from core.hash_index import HashIndex, IndexGroup
+from core.journal import JournalRestorer
+
+JAN_2024 = 1705276800
+CONTENT = "same content\n" * 100
+
+
+def test_restored_files_are_no_longer_duplicate_originals(tmp_path, organize):
+    root = tmp_path / 'root'
+    root.mkdir()
+    (root / 'a.txt').write_text(CONTENT)
+    (root / 'b.txt').write_text(CONTENT)
+    for name in ('a.txt', 'b.txt'):
+        os.utime(root / name, (JAN_2024, JAN_2024))
+    organize(root)
+
+    JournalRestorer(root).restore()
+    index = HashIndex.open_existing(root)
+    try:
+        assert list(index.files_with_size(len(CONTENT))) == []
+        # The original's digest stays cached under its restored path
+        rows = index.connection.execute("SELECT path, digest FROM files").fetchall()
+    finally:
+        index.close()
+    assert len(rows) == 1
+    path, digest = rows[0]
+    assert path in ('a.txt', 'b.txt') and digest is not None
+
+
+def test_index_group_unorganizes_in_the_owning_root(tmp_path):
+    roots = [tmp_path / 'one', tmp_path / 'two']
+    for root in roots:
+        root.mkdir()
+    indexes = [HashIndex(root) for root in roots]
+    try:
+        filed = roots[1] / '2024' / '01' / 'text_files' / 'a.txt'
+        filed.parent.mkdir(parents=True)
+        filed.write_text(CONTENT)
+        record = FileRecord.from_path(filed)
+        group = IndexGroup(indexes)
+        group.store(record, organized=True)
+        group.unorganize(record.dev, record.inode, roots[1] / 'a.txt')
+        assert list(group.files_with_size(len(CONTENT))) == []
+        assert indexes[1].connection.execute("SELECT path FROM files").fetchall() == [('a.txt',)]
+    finally:
+        for index in indexes:
+            index.close()
@@ -0,0 +1,75 @@
+"""
+Command line: exit codes and per-target reports
+"""
+import io
+import json
+import sys
+import pytest
+import main
+
+
+@pytest.fixture
+def target(tmp_path):
+    root = tmp_path / 'target'
+    root.mkdir()
+    (root / 'notes.txt').write_text('notes')
+    (root / 'photo.jpg').write_bytes(b'\xff\xd8' + b'jpeg' * 100)
+    return root
+
+
+def json_reports(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_successful_run_exits_0(target):
+    assert main.main(['--yes', str(target)]) == 0
+    assert not (target / 'notes.txt').exists()
+
+
+def test_missing_target_exits_1_and_the_others_still_run(tmp_path, target, capsys):
+    missing = tmp_path / 'missing'
+    assert main.main(['--yes', '--output-format', 'json', str(missing), str(target)]) == 1
+    reports = json_reports(capsys)
+    # Several targets are scheduled together and end with a summary of the batch
+    assert [(report['command'], report['status']) for report in reports] == [
+        ('organize', 'failed'), ('organize', 'ok'), ('batch', 'errors')]
+    assert reports[0]['target'] == str(missing)
+    assert not (target / 'notes.txt').exists()
+
+
+def test_unconfirmed_batch_without_a_terminal_exits_2(target, monkeypatch):
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(''))
+    assert main.main([str(target)]) == 2
+    assert (target / 'notes.txt').exists()
+
+
+def test_cancelled_batch_exits_1(target, monkeypatch):
+    monkeypatch.setattr(sys.stdin, 'isatty', lambda: True, raising=False)
+    monkeypatch.setattr('builtins.input', lambda prompt='': 'n')
+    assert main.main([str(target)]) == 1
+    assert (target / 'notes.txt').exists()
+
+
+def test_usage_errors_exit_2(target):
+    with pytest.raises(SystemExit) as exit_info:
+        main.main(['--run', 'abc', str(target)])
+    assert exit_info.value.code == 2
+
+
+def test_verify_exits_1_when_an_organized_file_changed(target, capsys):
+    assert main.main(['--yes', str(target)]) == 0
+    assert main.main(['verify', '--yes', str(target)]) == 0
+
+    next(target.glob('[0-9]*/*/*/notes.txt')).write_text('changed notes')
+    capsys.readouterr()
+    assert main.main(['verify', '--yes', '--output-format', 'json', str(target)]) == 1
+    assert json_reports(capsys)[0]['status'] == 'errors'
+
+
+def test_verify_without_recorded_moves_exits_1(target):
+    assert main.main(['verify', '--yes', str(target)]) == 1
+
+
+def test_dry_run_exits_0_and_changes_nothing(target):
+    assert main.main(['--yes', '--dry-run', str(target)]) == 0
+    assert (target / 'notes.txt').exists() and (target / 'photo.jpg').exists()
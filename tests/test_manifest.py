@@ -0,0 +1,48 @@
+"""
+Backup manifests taken before a run and checked by restore
+"""
+import os
+from core.journal import JournalRestorer
+from core.manifest import ManifestReader, run_manifest_dir
+
+JAN_2024 = 1705276800
+
+
+def make_tree(tmp_path):
+    root = tmp_path / 'root'
+    for relative in ('notes.txt', 'photo.jpg', 'temp_downloads/partial.dat'):
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(relative)
+        os.utime(path, (JAN_2024, JAN_2024))
+    return root
+
+
+def test_no_manifest_by_default(tmp_path, organize):
+    root = make_tree(tmp_path)
+    organize(root)
+    assert not run_manifest_dir(root).exists()
+
+
+def test_manifest_records_the_tree_before_the_run(tmp_path, organize):
+    root = make_tree(tmp_path)
+    organizer = organize(root, backup_manifest='gzip')
+    manifests = list(run_manifest_dir(root).iterdir())
+    assert [path.name for path in manifests] == [f"{organizer.executor.journal.run_id}.jsonl.gz"]
+
+    with ManifestReader(manifests[0]) as reader:
+        files = {entry.path for entry in reader if entry.type == 'f'}
+    assert files == {'notes.txt', 'photo.jpg', 'temp_downloads/partial.dat'}
+
+
+def test_restore_reports_files_that_differ_from_the_manifest(tmp_path, organize):
+    root = make_tree(tmp_path)
+    organize(root, backup_manifest='none')
+    organized = next(root.glob('2024/01/*/notes.txt'))
+    organized.write_text('edited after the run')
+
+    result = JournalRestorer(root).restore()
+    assert result.restored == 2
+    # The deleted temp folder is reported as deleted, not as changed
+    assert result.deleted == ['temp_downloads']
+    assert result.changed == ['notes.txt']
@@ -0,0 +1,99 @@
+"""
+The move engine: rename, cross-device copy fallback and bandwidth limit
+"""
+import errno
+import os
+import time
+import pytest
+from core import mover
+from core.mover import MoveEngine, RENAMED, COPIED, TEMP_SUFFIX
+
+MTIME_NS = 1705276800 * 10 ** 9
+CONTENT = bytes(range(256)) * 4096  # 1MB
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'src' / 'file.bin'
+    path.parent.mkdir()
+    path.write_bytes(CONTENT)
+    os.utime(path, ns=(MTIME_NS, MTIME_NS))
+    (tmp_path / 'dst').mkdir()
+    return path
+
+
+def assert_moved(source, destination):
+    assert not source.exists()
+    assert destination.read_bytes() == CONTENT
+    assert os.stat(destination).st_mtime_ns == MTIME_NS
+    assert not list(destination.parent.glob('*' + TEMP_SUFFIX))
+
+
+def test_same_device_is_a_rename(tmp_path, source):
+    engine = MoveEngine()
+    destination = tmp_path / 'dst' / 'file.bin'
+    assert engine.move(source, destination) == RENAMED
+    assert_moved(source, destination)
+
+
+def test_another_device_is_copied_then_the_source_removed(tmp_path, source):
+    engine = MoveEngine(chunk_size=64 * 1024)
+    destination = tmp_path / 'dst' / 'file.bin'
+    # A source_dev that differs from the destination's takes the copy path
+    assert engine.move(source, destination, source_dev=-1) == COPIED
+    assert_moved(source, destination)
+    assert engine.copied == 1 and engine.copied_bytes == len(CONTENT)
+
+
+def test_a_rename_refused_with_exdev_falls_back_to_copying(tmp_path, source, monkeypatch):
+    real_rename = os.rename
+
+    def rename(src, dst):
+        if os.fspath(src) == os.fspath(source):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        return real_rename(src, dst)
+    monkeypatch.setattr(os, 'rename', rename)
+
+    destination = tmp_path / 'dst' / 'file.bin'
+    assert MoveEngine().move(source, destination) == COPIED
+    assert_moved(source, destination)
+
+
+def test_kernel_copy_failure_falls_back_to_reads(tmp_path, source, monkeypatch):
+    def refuse(in_fd, out_fd, offset, count):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+    monkeypatch.setattr(mover, '_kernel_copy', refuse)
+
+    destination = tmp_path / 'dst' / 'file.bin'
+    assert MoveEngine(chunk_size=100_000).move(source, destination, source_dev=-1) == COPIED
+    assert_moved(source, destination)
+
+
+def test_a_failed_copy_keeps_the_source_and_leaves_no_temp_file(tmp_path, source, monkeypatch):
+    def fail(in_fd, out_fd, offset, count):
+        raise OSError(errno.EIO, "I/O error")
+    monkeypatch.setattr(mover, '_kernel_copy', fail)
+
+    destination = tmp_path / 'dst' / 'file.bin'
+    with pytest.raises(OSError):
+        MoveEngine().move(source, destination, source_dev=-1)
+    assert source.read_bytes() == CONTENT
+    assert list((tmp_path / 'dst').iterdir()) == []
+
+
+def test_folders_are_copied_whole(tmp_path, source):
+    (source.parent / 'nested').mkdir()
+    (source.parent / 'nested' / 'inner.txt').write_text('inner')
+    destination = tmp_path / 'dst' / 'src'
+    assert MoveEngine().move(source.parent, destination, source_dev=-1) == COPIED
+    assert (destination / 'file.bin').read_bytes() == CONTENT
+    assert (destination / 'nested' / 'inner.txt').read_text() == 'inner'
+    assert not source.parent.exists()
+
+
+def test_bandwidth_limit_slows_cross_device_copies(tmp_path, source):
+    limit = 4 * len(CONTENT)  # 0.25s for the file
+    engine = MoveEngine(chunk_size=len(CONTENT) // 8, bandwidth_limit=limit)
+    started = time.monotonic()
+    engine.move(source, tmp_path / 'dst' / 'file.bin', source_dev=-1)
+    assert time.monotonic() - started >= 0.2
@@ -0,0 +1,70 @@
+"""
+Temp folder handling and failures while organizing
+"""
+import os
+import time
+from core.checkpoint import Checkpoint, INTERRUPTED
+
+NOW = time.time()
+JAN_2024 = 1705276800
+
+
+def make_tree(tmp_path):
+    root = tmp_path / 'root'
+    for relative in ('temp_downloads/partial.dat', 'c/templates/base.html', 'c/attempts/run.log'):
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(relative)
+    return root
+
+
+def organized_names(root):
+    return {path.name for path in root.glob('[0-9][0-9][0-9][0-9]/*/*/*')}
+
+
+def test_only_root_level_temp_folders_are_deleted(tmp_path, organize):
+    root = make_tree(tmp_path)
+    organize(root, scan={'recursive': True})
+    assert not (root / 'temp_downloads').exists()
+    assert organized_names(root) == {'base.html', 'run.log'}
+
+
+def test_temp_folders_are_kept_when_deletion_is_off(tmp_path, organize):
+    root = make_tree(tmp_path)
+    organize(root, scan={'recursive': True}, delete_temp_folder=False)
+    assert organized_names(root) == {'base.html', 'run.log', 'partial.dat'}
+
+
+def test_a_directory_that_cannot_be_created_only_fails_its_own_moves(tmp_path, organize):
+    root = tmp_path / 'root'
+    root.mkdir()
+    # A plain file where the 2024 year folder would go
+    (root / '2024').write_text('not a folder')
+    os.utime(root / '2024', (NOW, NOW))
+    for name, mtime in (('old.txt', JAN_2024), ('new.txt', NOW)):
+        (root / name).write_text(name)
+        os.utime(root / name, (mtime, mtime))
+
+    organizer = organize(root)
+    assert [name for name, _ in organizer.error_report()] == [str(root / 'old.txt')]
+    assert len(list(root.glob('[0-9][0-9][0-9][0-9]/*/*/new.txt'))) == 1
+
+
+def test_resume_reports_the_errors_of_the_interrupted_run(tmp_path, organize):
+    root = tmp_path / 'root'
+    (root / '.janitor').mkdir(parents=True)
+    still_there = tmp_path / 'locked.txt'
+    still_there.write_text('locked')
+    (root / 'retried.txt').write_text('retried')
+    Checkpoint(root).save({'operations_done': 5, 'duplicate_count': 0, 'errors': [
+        [str(still_there), 'Permission denied'],
+        [str(root / 'retried.txt'), 'Permission denied'],
+        ['unreadable.bin', 'SKIPPED file (stat error): unreadable.bin'],
+    ]}, INTERRUPTED)
+
+    organizer = organize(root, resume=True)
+    assert organizer.error_report() == [
+        (str(still_there), 'Permission denied'),
+        ('unreadable.bin', 'SKIPPED file (stat error): unreadable.bin'),
+    ]
+    assert Checkpoint.load(root)['errors'] == [list(error) for error in organizer.error_report()]
@@ -0,0 +1,161 @@
+"""
+Duplicate policies (hardlink, reflink, delete) and restoring what they did
+"""
+import errno
+import os
+import pytest
+from core.journal import JournalRestorer
+from core.planner import Operation, MOVE_DUPLICATE
+from core.reclaim import FICLONE, SpaceReclaimer
+from core.mover import RENAMED
+
+CONTENT = b"duplicate content\n" * 4096
+
+# 2024-01-15 and 2024-01-20, both filed into 2024/01
+ORIGINAL_MTIME_NS = 1705276800 * 10 ** 9
+DUPLICATE_MTIME_NS = 1705708800 * 10 ** 9
+
+
+def make_file(path, mtime_ns, content=CONTENT):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def restore(root):
+    result = JournalRestorer(root).restore()
+    assert not result.missing and not result.conflicts
+    return result
+
+
+def reflinks_supported(directory):
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    source = directory / 'probe'
+    source.write_bytes(b'probe')
+    try:
+        with open(source, 'rb') as src, open(directory / 'probe.clone', 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        return False
+    finally:
+        for name in ('probe', 'probe.clone'):
+            try:
+                os.unlink(directory / name)
+            except OSError:
+                pass
+
+
+def assert_restored_independently(root):
+    original = root / 'original.bin'
+    duplicate = root / 'duplicate.bin'
+    original_stat = os.stat(original)
+    duplicate_stat = os.stat(duplicate)
+    assert original.read_bytes() == CONTENT
+    assert duplicate.read_bytes() == CONTENT
+    assert original_stat.st_ino != duplicate_stat.st_ino
+    assert original_stat.st_nlink == duplicate_stat.st_nlink == 1
+    assert original_stat.st_mtime_ns == ORIGINAL_MTIME_NS
+    assert duplicate_stat.st_mtime_ns == DUPLICATE_MTIME_NS
+    assert not (root / '2024').exists()
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / 'root'
+    make_file(root / 'original.bin', ORIGINAL_MTIME_NS)
+    make_file(root / 'duplicate.bin', DUPLICATE_MTIME_NS)
+    return root
+
+
+def test_hardlink_then_restore_gives_each_file_its_own_inode(tree, organize):
+    organizer = organize(tree, duplicate_policy='hardlink')
+    assert organizer.metrics.counters['duplicates_hardlink'] == 1
+    linked = list((tree / '2024' / '01' / 'duplicates').iterdir())
+    assert len(linked) == 1 and os.stat(linked[0]).st_nlink == 2
+
+    restore(tree)
+    assert_restored_independently(tree)
+
+
+def test_reflink_then_restore(tree, organize):
+    if not reflinks_supported(tree):
+        pytest.skip("file system cannot reflink")
+    organizer = organize(tree, duplicate_policy='reflink')
+    assert organizer.metrics.counters['duplicates_reflink'] == 1
+
+    restore(tree)
+    assert_restored_independently(tree)
+
+
+def test_reflink_falls_back_to_moving_when_unsupported(tree, organize):
+    if reflinks_supported(tree):
+        pytest.skip("file system can reflink")
+    organizer = organize(tree, duplicate_policy='reflink')
+    assert organizer.metrics.counters['duplicates_kept'] == 1
+
+    restore(tree)
+    assert_restored_independently(tree)
+
+
+def test_delete_then_restore_recreates_the_duplicate(tree, organize):
+    organizer = organize(tree, duplicate_policy='delete')
+    assert organizer.metrics.counters['duplicates_delete'] == 1
+    assert not (tree / '2024' / '01' / 'duplicates').exists()
+
+    restore(tree)
+    assert_restored_independently(tree)
+
+
+def test_restore_finds_a_link_whose_method_was_not_journaled(tree, organize):
+    organize(tree, duplicate_policy='hardlink')
+    journal = tree / '.janitor' / 'journal.jsonl'
+    lines = journal.read_text().splitlines(keepends=True)
+    journal.write_text("".join(line for line in lines if '"applied"' not in line))
+
+    restore(tree)
+    assert_restored_independently(tree)
+
+
+@pytest.mark.parametrize('policy', ['delete', 'hardlink'])
+def test_symlink_and_its_target_are_not_reclaimed(tmp_path, organize, policy):
+    root = tmp_path / 'root'
+    make_file(root / 'b' / 'real.bin', ORIGINAL_MTIME_NS)
+    (root / 'a').mkdir()
+    os.symlink(root / 'b' / 'real.bin', root / 'a' / 'alink.bin')
+
+    organize(root, scan={'recursive': True, 'symlinks': 'files'}, duplicate_policy=policy)
+    real = [path for path in root.rglob('real.bin') if not path.is_symlink()]
+    assert len(real) == 1 and real[0].read_bytes() == CONTENT
+
+
+def test_reclaimer_keeps_a_duplicate_whose_original_is_a_symlink_to_it(tmp_path):
+    duplicate = tmp_path / 'duplicate.bin'
+    make_file(duplicate, DUPLICATE_MTIME_NS)
+    original = tmp_path / 'original.bin'
+    os.symlink(duplicate, original)
+    destination = tmp_path / 'duplicates' / 'duplicate.bin'
+
+    op = Operation(MOVE_DUPLICATE, duplicate, destination, original=original)
+    assert SpaceReclaimer('delete').apply(op) == RENAMED
+    assert destination.read_bytes() == CONTENT
+
+
+def test_reclaimer_keeps_a_duplicate_that_is_a_hard_link_of_its_original(tmp_path):
+    original = tmp_path / 'original.bin'
+    make_file(original, ORIGINAL_MTIME_NS)
+    duplicate = tmp_path / 'duplicate.bin'
+    try:
+        os.link(original, duplicate)
+    except OSError as e:
+        if e.errno in (errno.EPERM, errno.EOPNOTSUPP):
+            pytest.skip("file system cannot hard link")
+        raise
+    destination = tmp_path / 'duplicates' / 'duplicate.bin'
+
+    op = Operation(MOVE_DUPLICATE, duplicate, destination, original=original)
+    assert SpaceReclaimer('delete').apply(op) == RENAMED
+    assert original.read_bytes() == CONTENT and destination.exists()
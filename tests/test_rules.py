@@ -0,0 +1,80 @@
+"""
+Rule set classification: precedence and regex patterns
+"""
+from types import SimpleNamespace
+import pytest
+from core.file_operations import FileRecord
+from core.rules import RuleSet, SECONDS_PER_DAY
+
+NOW = 1_700_000_000
+MB = 1024 * 1024
+
+
+def record(name, size=100, age_days=0):
+    mtime = NOW - age_days * SECONDS_PER_DAY
+    stat_result = SimpleNamespace(st_size=size, st_mtime=mtime, st_mtime_ns=int(mtime * 10 ** 9),
+                                  st_ino=1, st_dev=1)
+    return FileRecord(name, stat_result)
+
+
+def folder(rules, name, **kwargs):
+    return rules.classify(record(name, **kwargs)).folder
+
+
+def test_first_matching_rule_wins_whatever_its_kind():
+    rules = RuleSet([
+        {'folder': 'old', 'min_age_days': 365},
+        {'folder': 'big', 'min_mb': 10},
+        {'folder': 'reports', 'glob': ['report_*']},
+        {'folder': 'invoices', 'regex': [r'inv-\d+\.pdf']},
+        {'folder': 'pdfs', 'extensions': ['pdf']},
+    ], now=NOW)
+    assert folder(rules, 'report_2024.pdf', age_days=400) == 'old'
+    assert folder(rules, 'report_2024.pdf', size=20 * MB) == 'big'
+    assert folder(rules, 'report_2024.pdf') == 'reports'
+    assert folder(rules, 'inv-42.pdf') == 'invoices'
+    assert folder(rules, 'notes.PDF') == 'pdfs'
+
+
+def test_extension_rule_before_a_pattern_rule_wins():
+    rules = RuleSet([
+        {'folder': 'pdfs', 'extensions': ['.pdf']},
+        {'folder': 'reports', 'glob': ['report_*']},
+    ], now=NOW)
+    assert folder(rules, 'report_2024.pdf') == 'pdfs'
+    assert folder(rules, 'report_2024.txt') == 'reports'
+
+
+def test_limits_turn_a_matching_rule_down_and_later_rules_are_tried():
+    rules = RuleSet([
+        {'folder': 'small_reports', 'glob': ['report_*'], 'max_mb': 1},
+        {'folder': 'recent', 'regex': [r'report_.*'], 'max_age_days': 30},
+    ], now=NOW)
+    assert folder(rules, 'report_a.txt') == 'small_reports'
+    assert folder(rules, 'report_a.txt', size=2 * MB) == 'recent'
+    assert folder(rules, 'report_a.txt', size=2 * MB, age_days=60) == 'other_files'
+
+
+def test_fallback_rule_takes_what_no_rule_matches():
+    rules = RuleSet([{'folder': 'pdfs', 'extensions': ['.pdf']}],
+                    fallback={'folder': 'misc', 'label': 'misc file'}, now=NOW)
+    assert folder(rules, 'photo.jpg') == 'misc'
+    assert RuleSet([], now=NOW).classify(record('photo.jpg')).folder == 'other_files'
+
+
+def test_patterns_with_capturing_groups_are_matched_per_rule():
+    rules = RuleSet([
+        {'folder': 'twice', 'regex': [r'(?P<word>\w+)-(?P=word)\.txt']},
+        {'folder': 'doubled', 'regex': [r'(\w)\1\.txt', r'(?P<word>x+)\.txt']},
+        {'folder': 'loud', 'regex': [r'(?i)LOUD.*']},
+    ], now=NOW)
+    assert folder(rules, 'abc-abc.txt') == 'twice'
+    assert folder(rules, 'aa.txt') == 'doubled'
+    assert folder(rules, 'xxx.txt') == 'doubled'
+    assert folder(rules, 'loud.txt') == 'loud'
+    assert folder(rules, 'abc-abd.txt') == 'other_files'
+
+
+def test_invalid_pattern_names_its_rule():
+    with pytest.raises(ValueError, match=r"Rule 1 \(broken\)"):
+        RuleSet([{'folder': 'fine', 'glob': ['*.txt']}, {'folder': 'broken', 'regex': ['(']}])
@@ -0,0 +1,57 @@
+"""
+Content sniffing of files whose extension does not tell their type
+"""
+import io
+import zipfile
+from core.rules import RuleSet
+from core.sniffer import sniff_bytes
+
+
+def zip_head(*entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+    return buffer.getvalue()[:8192]
+
+
+def test_utf16_text_is_not_mpeg_audio():
+    assert sniff_bytes("[settings]\nname = value\n".encode('utf-16')) is None
+
+
+def test_mpeg_frame_needs_valid_bitrate_and_sample_rate():
+    assert sniff_bytes(bytes([0xFF, 0xFB, 0x90, 0x64]) + bytes(64)) == ('audio/mpeg', '.mp3')
+    assert sniff_bytes(bytes([0xFF, 0xFB, 0xF0, 0x64]) + bytes(64)) is None
+    assert sniff_bytes(bytes([0xFF, 0xFB, 0x0C, 0x64]) + bytes(64)) is None
+    assert sniff_bytes(bytes([0xFF, 0xFB, 0x9C, 0x64]) + bytes(64)) is None
+
+
+def test_office_document_is_found_by_its_entry_names():
+    head = zip_head(('[Content_Types].xml', '<Types/>'), ('_rels/.rels', '<Relationships/>'),
+                    ('word/document.xml', '<document/>'))
+    assert sniff_bytes(head)[1] == '.docx'
+
+
+def test_epub_is_found_by_its_mimetype_entry():
+    assert sniff_bytes(zip_head(('mimetype', 'application/epub+zip'), ('OEBPS/content.opf', '')))[1] == '.epub'
+
+
+def test_plain_zip_mentioning_a_marker_stays_a_zip():
+    head = zip_head(('notes.txt', 'see word/document.xml and mimetypeapplication/epub+zip'))
+    assert sniff_bytes(head) == ('application/zip', '.zip')
+
+
+def test_unknown_mode_classifies_each_file_once(tmp_path, organize, monkeypatch):
+    root = tmp_path / 'root'
+    root.mkdir()
+    (root / 'notes.txt').write_text('notes')
+    (root / 'photo').write_bytes(b'\x89PNG\r\n\x1a\n' + b'\x00' * 64)
+    (root / 'blob').write_bytes(b'\x00' * 64)
+    calls = []
+    classify = RuleSet.classify
+    monkeypatch.setattr(RuleSet, 'classify', lambda self, record, *args: calls.append(record.name)
+                        or classify(self, record, *args))
+
+    organize(root, content_sniffing='unknown')
+    assert sorted(calls) == ['blob', 'notes.txt', 'photo', 'photo']
+    assert {path.parent.name for path in root.glob('[0-9]*/*/*/*')} >= {'images', 'text_files'}
@@ -0,0 +1,42 @@
+"""
+Tiering cold months and restoring moved folders
+"""
+import datetime
+import os
+from core.journal import JournalRestorer, read_journal
+from core.tiering import Tierer, TierRule
+
+
+def make_month(root, year, month, names):
+    mtime = datetime.datetime(year, month, 15).timestamp()
+    for name in names:
+        path = root / name
+        path.write_text(name * 100)
+        os.utime(path, (mtime, mtime))
+
+
+def test_moved_folders_are_journaled_once_each_and_restored(tmp_path, organize):
+    root = tmp_path / 'root'
+    root.mkdir()
+    cold = tmp_path / 'cold'
+    cold.mkdir()
+    (cold / 'keep.txt').write_text('not the janitor\'s')
+    for month in range(1, 7):
+        make_month(root, 2024, month, [f"photo{month}.jpg", f"notes{month}.txt"])
+
+    organize(root)
+
+    rule = TierRule(6, 'move', folders=['images'], destination=cold)
+    report = Tierer(root, [rule], workers=4, today=datetime.date(2026, 1, 1)).run()
+    assert len(report.units) == 6 and not report.failed
+    assert not list(root.glob('2024/*/images'))
+
+    operations, _ = read_journal(root)
+    keys = [(entry['run'], entry['seq']) for entry in operations]
+    assert len(keys) == len(set(keys))
+
+    result = JournalRestorer(root).restore()
+    assert not result.missing and not result.conflicts
+    assert sorted(path.name for path in root.glob('*.jpg')) == [f"photo{month}.jpg" for month in range(1, 7)]
+    # Folders outside the root are never cleaned up by restore
+    assert (cold / 'keep.txt').exists() and (cold / '2024').is_dir()
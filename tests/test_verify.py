@@ -0,0 +1,92 @@
+"""
+Verify: the organized tree checked against the recorded moves
+"""
+import hashlib
+import os
+import pytest
+from core.verify import ExpectedFiles, TreeVerifier, DIRECTORY, MISSING, EXTRA, MISMATCHED
+
+MONTH = '2024/01/text_files'
+MTIME_NS = 1705276800 * 10 ** 9
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """A date tree of three files, each expected with its size, mtime and digest"""
+    folder = tmp_path / MONTH
+    folder.mkdir(parents=True)
+    expected = ExpectedFiles(tmp_path, 'sha256')
+    for name in ('a.txt', 'b.txt', 'c.txt'):
+        path = folder / name
+        content = f"contents of {name}\n".encode()
+        path.write_bytes(content)
+        os.utime(path, ns=(MTIME_NS, MTIME_NS))
+        expected.add(path, len(content), MTIME_NS, hashlib.sha256(content).hexdigest())
+    expected.commit()
+    yield tmp_path, expected
+    expected.close()
+
+
+def verify(tree, mode='quick'):
+    root, expected = tree
+    report = TreeVerifier(root, expected, mode, workers=2).verify()
+    return {kind: sorted(path.split(' (')[0] for path in report.problems[kind])
+            for kind in (MISSING, EXTRA, MISMATCHED)}
+
+
+def clean():
+    return {MISSING: [], EXTRA: [], MISMATCHED: []}
+
+
+def test_untouched_tree_is_clean(tree):
+    assert verify(tree) == clean()
+    assert verify(tree, 'full') == clean()
+
+
+def test_missing_extra_and_mismatched_files_are_reported(tree):
+    root, _ = tree
+    os.unlink(root / MONTH / 'a.txt')
+    (root / MONTH / 'stray.txt').write_text('not organized by the janitor')
+    (root / MONTH / 'b.txt').write_text('grown since it was organized')
+    assert verify(tree) == {MISSING: [f"{MONTH}/a.txt"], EXTRA: [f"{MONTH}/stray.txt"],
+                            MISMATCHED: [f"{MONTH}/b.txt"]}
+
+
+def test_quick_mode_catches_a_changed_mtime(tree):
+    root, _ = tree
+    os.utime(root / MONTH / 'c.txt', ns=(MTIME_NS, MTIME_NS + 10 ** 9))
+    assert verify(tree)[MISMATCHED] == [f"{MONTH}/c.txt"]
+
+
+def test_full_mode_catches_changed_content_of_the_same_size(tree):
+    root, _ = tree
+    path = root / MONTH / 'c.txt'
+    path.write_bytes(path.read_bytes().upper())
+    os.utime(path, ns=(MTIME_NS, MTIME_NS))
+    assert verify(tree) == clean()
+    assert verify(tree, 'full')[MISMATCHED] == [f"{MONTH}/c.txt"]
+
+
+def test_moved_folders_are_checked_as_a_whole(tree):
+    root, expected = tree
+    folder = root / '2024/01/folders/project'
+    (folder / 'src').mkdir(parents=True)
+    (folder / 'src' / 'main.py').write_text('print()')
+    expected.add(folder, kind=DIRECTORY)
+    assert verify(tree) == clean()
+
+    os.rename(folder, root / '2024/01/folders/renamed')
+    assert verify(tree) == {MISSING: ['2024/01/folders/project'],
+                            EXTRA: ['2024/01/folders/renamed/src/main.py'], MISMATCHED: []}
+
+
+def test_an_organized_tree_verifies_clean(tmp_path, organize):
+    (tmp_path / 'notes.txt').write_text('notes')
+    (tmp_path / 'copy.txt').write_text('notes')
+    organize(tmp_path)
+    expected = ExpectedFiles.open_existing(tmp_path)
+    try:
+        report = TreeVerifier(tmp_path, expected).verify()
+    finally:
+        expected.close()
+    assert report.clean and report.checked == 2
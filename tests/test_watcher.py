@@ -0,0 +1,109 @@
+"""
+Watch mode: watcher backends, debounced batches and organizing arrivals
+"""
+import os
+import threading
+import time
+import pytest
+from config.config_manager import load_config
+from core.organizer import FileOrganizer
+from core.watcher import InotifyWatcher, PollingWatcher, iter_arrivals
+
+
+class ScriptedWatcher:
+    """Replays a list of event lists, one per wait(), then reports nothing"""
+
+    def __init__(self, script):
+        self.script = list(script)
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, 0.01))
+        return self.script.pop(0) if self.script else []
+
+
+def collect(watcher, stop, limit, **kwargs):
+    batches = []
+    for batch in iter_arrivals(watcher, stop=stop, **kwargs):
+        batches.append(batch)
+        if sum(len(batch) for batch in batches) >= limit:
+            stop.set()
+    return batches
+
+
+def test_arrivals_are_batched_once_settled_and_removals_dropped():
+    stop = threading.Event()
+    watcher = ScriptedWatcher([[('a', False), ('b', False)], [('a', False), ('b', True)], [('c', False)]])
+    timer = threading.Timer(1.0, stop.set)
+    timer.start()
+    try:
+        batches = collect(watcher, stop, 2, debounce=0.05, batch_delay=0.05, batch_size=10)
+    finally:
+        timer.cancel()
+    assert sorted(path for batch in batches for path in batch) == ['a', 'c']
+
+
+def test_full_batches_are_yielded_at_batch_size():
+    stop = threading.Event()
+    watcher = ScriptedWatcher([[(str(index), False) for index in range(5)]])
+    # The fifth file would wait batch_delay for company; full batches go at once
+    batches = collect(watcher, stop, 4, debounce=0.01, batch_delay=60, batch_size=2)
+    assert [len(batch) for batch in batches] == [2, 2]
+
+
+def test_polling_watcher_reports_new_changed_and_removed_files(tmp_path):
+    (tmp_path / 'old.txt').write_text('old')
+    watcher = PollingWatcher(tmp_path, poll_interval=0)
+    assert watcher.wait(1) == []
+
+    (tmp_path / 'new.txt').write_text('new')
+    (tmp_path / 'old.txt').write_text('changed, longer')
+    assert sorted(watcher.wait(1)) == [(str(tmp_path / 'new.txt'), False), (str(tmp_path / 'old.txt'), False)]
+
+    os.unlink(tmp_path / 'new.txt')
+    assert watcher.wait(1) == [(str(tmp_path / 'new.txt'), True)]
+
+
+def test_inotify_watcher_follows_new_subdirectories(tmp_path):
+    try:
+        watcher = InotifyWatcher(tmp_path, recursive=True)
+    except (OSError, AttributeError):
+        pytest.skip("inotify is not available")
+    try:
+        (tmp_path / 'sub').mkdir()
+        watcher.wait(0.5)
+        (tmp_path / 'sub' / 'inner.txt').write_text('inner')
+        (tmp_path / 'top.txt').write_text('top')
+        seen = set()
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline and len(seen) < 2:
+            seen.update(path for path, removed in watcher.wait(0.2) if not removed)
+    finally:
+        watcher.close()
+    assert {str(tmp_path / 'sub' / 'inner.txt'), str(tmp_path / 'top.txt')} <= seen
+
+
+def test_watch_mode_organizes_files_that_arrive(tmp_path):
+    root = tmp_path / 'root'
+    root.mkdir()
+    (root / 'before.txt').write_text('before')
+    config = load_config(root / 'janitor_config.json')
+    config['transfer']['progress'] = False
+    organizer = FileOrganizer(root, config, root / 'digital_janitor_log.txt')
+    stop = threading.Event()
+    watcher = PollingWatcher(root, poll_interval=0.05)
+    thread = threading.Thread(target=organizer.watch_files, args=(watcher,),
+                              kwargs={'debounce': 0.05, 'batch_delay': 0.05, 'stop': stop})
+    thread.start()
+    try:
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not list(root.glob('[0-9]*/*/*/before.txt')):
+            time.sleep(0.02)
+        (root / 'after.txt').write_text('after')
+        while time.monotonic() < deadline and not list(root.glob('[0-9]*/*/*/after.txt')):
+            time.sleep(0.02)
+    finally:
+        stop.set()
+        thread.join(5)
+        organizer.logger.close()
+    assert not (root / 'before.txt').exists() and not (root / 'after.txt').exists()
+    assert len(list(root.glob('[0-9]*/*/text_files/*.txt'))) == 2
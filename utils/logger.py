@@ -1,9 +1,16 @@
 """
 Logging utilities for Digital Janitor Pro
 """
+import atexit
 import datetime
+import json
+import threading
+import time
 from pathlib import Path
 
+LOG_FILE_NAME = 'digital_janitor_log.txt'
+JSON_LOG_FILE_NAME = 'digital_janitor_log.jsonl'
+
 
 def write_to_log(message, log_file_path):
     """Write message to log file with timestamp"""
@@ -12,3 +19,93 @@ def write_to_log(message, log_file_path):
 
     with open(log_file_path, "a") as log_file:
         log_file.write(log_entry)
+
+
+class JanitorLogger:
+    """Buffered log writer
+
+    Entries are collected in memory and appended to the log file once the
+    buffer reaches buffer_size characters or flush_interval seconds have
+    passed since the last flush. The buffer is also flushed on close and
+    at interpreter exit, including exits caused by an unhandled exception.
+
+    With json_lines=True every entry is written as one JSON object per
+    line, with any extra keyword fields passed to log() included.
+    """
+
+    def __init__(self, log_file_path, json_lines=False, buffer_size=64 * 1024, flush_interval=2.0):
+        self.path = Path(log_file_path)
+        self.json_lines = json_lines
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+
+        self._entries = []
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = None
+
+        # strftime is only called once per second
+        self._stamp_second = None
+        self._stamp_text = None
+
+        atexit.register(self.close)
+
+    def _timestamp(self):
+        now = int(time.time())
+        if now != self._stamp_second:
+            self._stamp_second = now
+            moment = datetime.datetime.fromtimestamp(now)
+            if self.json_lines:
+                self._stamp_text = moment.isoformat()
+            else:
+                self._stamp_text = moment.strftime("%Y-%m-%d %H:%M:%S")
+        return self._stamp_text
+
+    def log(self, message, **fields):
+        """Queue a log entry, flushing when the buffer is full or stale"""
+        with self._lock:
+            timestamp = self._timestamp()
+            if self.json_lines:
+                record = {"time": timestamp, "message": message}
+                record.update(fields)
+                entry = json.dumps(record, default=str) + "\n"
+            else:
+                entry = f"{timestamp}: {message}\n"
+
+            self._entries.append(entry)
+            self._buffered += len(entry)
+
+            if (self._buffered >= self.buffer_size or
+                    time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+
+    def flush(self):
+        """Write all buffered entries to the log file"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._entries:
+            return
+        if self._file is None:
+            self._file = open(self.path, "a")
+        self._file.write("".join(self._entries))
+        self._file.flush()
+        self._entries = []
+        self._buffered = 0
+
+    def close(self):
+        """Flush remaining entries and close the log file"""
+        with self._lock:
+            self._flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
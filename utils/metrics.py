@@ -0,0 +1,253 @@
+"""
+Run metrics for Digital Janitor Pro
+Counters and per-phase wall time, an end-of-run summary, JSON / Prometheus export
+and opt-in profiling
+"""
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+# Phases of a run, in the order they are reported; index, expected and months
+# are the writes to hash_index.db, verify.db and months.db
+PHASES = ('scan', 'hash', 'classify', 'mkdir', 'move', 'verify', 'log', 'journal', 'index', 'expected', 'months')
+
+METRICS_FORMATS = ('json', 'prometheus')
+
+# Counters and their Prometheus help text
+COUNTERS = {
+    'files_scanned': 'Files found by the scan',
+    'stat_calls': 'stat calls made on files',
+    'dir_listings': 'Destination directories listed',
+    'files_hashed': 'Files read for a partial or full hash',
+    'bytes_hashed': 'Bytes read for hashing',
+    'files_sniffed': 'Files opened only to detect their content type',
+    'duplicates': 'Duplicate files found',
+    'moves_rename': 'Moves done with a rename',
+    'moves_copy': 'Moves copied across file systems',
+    'bytes_copied': 'Bytes copied across file systems',
+    'folders_moved': 'Folders moved',
+    'folders_deleted': 'Temp folders deleted',
+    'duplicates_hardlink': 'Duplicates replaced by a hard link to their original',
+    'duplicates_reflink': 'Duplicates replaced by a reflink clone of their original',
+    'duplicates_delete': 'Duplicates deleted',
+    'duplicates_kept': 'Duplicates moved because they could not be verified, linked or cloned',
+    'bytes_verified': 'Bytes of duplicates compared with their originals',
+    'bytes_reclaimed': 'Disk space freed by linking, cloning or deleting duplicates',
+    'operations_failed': 'Operations that failed',
+    'files_skipped': 'Files skipped because they could not be read',
+}
+
+
+class Metrics:
+    """Counters and per-phase wall time of one run
+
+    Phase times are exclusive: a phase entered inside another (logging a
+    move) pauses the outer one, so the phases add up to the time spent
+    in them. Counters and phases are only updated from the thread that
+    drives the run; worker results are counted once they are collected,
+    so no locking is needed and the cost per update is a dict increment.
+    """
+
+    def __init__(self):
+        self.counters = Counter()
+        self.categories = Counter()
+        self.phase_seconds = defaultdict(float)
+        self.gauges = {}
+        self._stack = []
+        self._resumed = 0.0
+        self._started = None
+        self.elapsed = 0.0
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def count_category(self, folder):
+        """One more file classified into folder"""
+        self.categories[folder] += 1
+
+    @contextmanager
+    def phase(self, name):
+        """Charge the time spent in the with block to a phase"""
+        now = time.perf_counter()
+        if self._stack:
+            self.phase_seconds[self._stack[-1]] += now - self._resumed
+        self._stack.append(name)
+        self._resumed = now
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.phase_seconds[self._stack.pop()] += now - self._resumed
+            self._resumed = now
+
+    def timed(self, name, iterable):
+        """Yield from iterable, charging the time spent producing items to a phase"""
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def start(self):
+        self._started = time.perf_counter()
+
+    def stop(self):
+        if self._started is not None:
+            self.elapsed += time.perf_counter() - self._started
+            self._started = None
+
+    def merge(self, other):
+        """Add another run's counters and phase times to these
+
+        elapsed is left alone; phase times of runs that overlapped can add
+        up to more than it.
+        """
+        self.counters.update(other.counters)
+        self.categories.update(other.categories)
+        for name, seconds in other.phase_seconds.items():
+            self.phase_seconds[name] += seconds
+        for name, value in other.gauges.items():
+            self.gauges[name] = max(value, self.gauges.get(name, value))
+
+    def phases(self):
+        """{phase: seconds} for every phase, plus 'other' for the untimed rest of the run"""
+        phases = {name: self.phase_seconds.get(name, 0.0) for name in PHASES}
+        for name, seconds in self.phase_seconds.items():
+            phases.setdefault(name, seconds)
+        phases['other'] = max(0.0, self.elapsed - sum(phases.values()))
+        return phases
+
+    def to_dict(self):
+        return {
+            'elapsed_seconds': round(self.elapsed, 6),
+            'phases': {name: round(seconds, 6) for name, seconds in self.phases().items()},
+            'counters': dict(sorted(self.counters.items())),
+            'categories': dict(sorted(self.categories.items())),
+            'gauges': dict(sorted(self.gauges.items())),
+        }
+
+    def summary_lines(self):
+        """Human readable end-of-run summary"""
+        counters = self.counters
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases().items() if seconds >= 0.005)
+        moved = counters['moves_rename'] + counters['moves_copy']
+        lines = [
+            f"Run time {self.elapsed:.2f}s: {phases or 'no timed phases'}",
+            f"Files: {counters['files_scanned']} scanned, {moved} moved "
+            f"({counters['moves_rename']} renamed, {counters['moves_copy']} copied), "
+            f"{counters['duplicates']} duplicates",
+            f"I/O: {counters['bytes_hashed'] / (1024 * 1024):.1f}MB hashed in {counters['files_hashed']} reads, "
+            f"{counters['stat_calls']} stat calls, {counters['dir_listings']} directory listings",
+        ]
+        reclaimed = [f"{counters['duplicates_' + method]} {label}"
+                     for method, label in (('hardlink', 'hardlinked'), ('reflink', 'reflinked'),
+                                           ('delete', 'deleted'), ('kept', 'kept'))
+                     if counters['duplicates_' + method]]
+        if reclaimed:
+            lines.append(f"Reclaimed: {counters['bytes_reclaimed'] / (1024 * 1024):.1f}MB "
+                         f"({', '.join(reclaimed)} duplicates)")
+        if self.categories:
+            lines.append("Categories: " + ", ".join(f"{folder} {count}"
+                                                    for folder, count in self.categories.most_common()))
+        if 'peak_memory_bytes' in self.gauges:
+            lines.append(f"Peak traced memory: {self.gauges['peak_memory_bytes'] / (1024 * 1024):.1f}MB")
+        return lines
+
+    def write(self, path, metrics_format='json'):
+        """Write the metrics to a file, replacing it atomically
+
+        The prometheus format suits node_exporter's textfile collector,
+        which must never see a half-written file.
+        """
+        if metrics_format not in METRICS_FORMATS:
+            raise ValueError(f"Unknown metrics format: {metrics_format}")
+        if metrics_format == 'json':
+            text = json.dumps(self.to_dict(), indent=2) + "\n"
+        else:
+            text = self.to_prometheus()
+        path = Path(path)
+        temp = path.with_name(path.name + '.tmp')
+        with open(temp, 'w') as metrics_file:
+            metrics_file.write(text)
+        os.replace(temp, path)
+
+    def to_prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP janitor_run_seconds Wall time of the run",
+            "# TYPE janitor_run_seconds gauge",
+            f"janitor_run_seconds {self.elapsed:.6f}",
+            "# HELP janitor_phase_seconds Wall time spent in each phase of the run",
+            "# TYPE janitor_phase_seconds gauge",
+        ]
+        lines.extend(f'janitor_phase_seconds{{phase="{name}"}} {seconds:.6f}'
+                     for name, seconds in self.phases().items())
+        for name in sorted(set(COUNTERS) | set(self.counters)):
+            lines.append(f"# HELP janitor_{name}_total {COUNTERS.get(name, name)}")
+            lines.append(f"# TYPE janitor_{name}_total counter")
+            lines.append(f"janitor_{name}_total {self.counters[name]}")
+        lines.append("# HELP janitor_category_files Files organized into each type folder")
+        lines.append("# TYPE janitor_category_files gauge")
+        lines.extend(f'janitor_category_files{{category="{_escape_label(folder)}"}} {count}'
+                     for folder, count in sorted(self.categories.items()))
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f"# TYPE janitor_{name} gauge")
+            lines.append(f"janitor_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class Profiler:
+    """Opt-in cProfile and tracemalloc around a run
+
+    With profile_path the run is profiled and the stats are saved there
+    (readable with pstats or snakeviz); with trace_memory the peak traced
+    memory is recorded as a gauge and the top allocation sites are kept
+    in report_lines. Neither is even imported when left off.
+    """
+
+    def __init__(self, metrics, profile_path=None, trace_memory=False, top=15):
+        self.metrics = metrics
+        self.profile_path = profile_path
+        self.trace_memory = trace_memory
+        self.top = top
+        self.report_lines = []
+        self._profile = None
+
+    def __enter__(self):
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+        if self.profile_path:
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._profile is not None:
+            import io
+            import pstats
+            self._profile.disable()
+            self._profile.dump_stats(self.profile_path)
+            output = io.StringIO()
+            pstats.Stats(self._profile, stream=output).sort_stats('cumulative').print_stats(self.top)
+            self.report_lines.append(f"Profile saved to {self.profile_path}")
+            self.report_lines.extend(line for line in output.getvalue().splitlines() if line.strip())
+            self._profile = None
+        if self.trace_memory:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            self.metrics.gauges['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.report_lines.append(f"Top {self.top} allocation sites:")
+            self.report_lines.extend(f"   {stat}" for stat in snapshot.statistics('lineno')[:self.top])
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')